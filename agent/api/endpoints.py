@@ -1,16 +1,53 @@
 import os
 import asyncio
+import time
 from json import JSONDecodeError
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import ValidationError
 
 from agent.models.schemas import QuizRequest
 from agent.core.worker import solve_quiz_task
+from agent.core.scheduler import JobScheduler, JobFailed, QueueFullError
+from agent.core.job_store import Job, request_fingerprint
+from agent.core.metrics import span, render_metrics, register_stats_gauge, get_trace
+from agent.core.deadline import Deadline
+from agent.core.log import get_logger
+from agent.core.warmup import get_readiness
+
+log = get_logger("SUPERVISOR")
 
 router = APIRouter()
 SECRET_KEY = os.environ.get("SECRET_KEY")
 TASK_TIMEOUT = 180.0  # 3 minutes as per requirements
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "30"))
+
+
+async def run_with_timeout(job: Job):
+    data = job.data
+    # The budget starts when the request arrived (stored with the job), so time spent
+    # queued, and by a worker that crashed mid-chain, counts
+    deadline = Deadline(TASK_TIMEOUT, started_at=data.get("received_at"))
+    try:
+        log.info(f"Starting task chain {data.get('url')} with {deadline.remaining():.0f}s left.")
+        async with span("supervisor", url=data.get("url")):
+            # Hard stop; inside, the deadline makes the solver submit before this fires
+            outcome = await asyncio.wait_for(
+                solve_quiz_task(data, deadline, resume=job.progress, checkpoint=job.checkpoint),
+                timeout=deadline.remaining()
+            )
+    except asyncio.TimeoutError:
+        log.error(f"CRITICAL: Task chain timed out after {TASK_TIMEOUT}s!")
+        raise
+    job.progress["outcome"] = outcome
+    if not outcome["completed"]:
+        # Not "done", so a repeat of this request is solved again rather than served from this job
+        raise JobFailed(outcome["reason"])
+
+
+scheduler = JobScheduler(run_with_timeout)
+register_stats_gauge("agent_jobs", "Jobs running and waiting in the scheduler.", lambda: scheduler.stats)
 
 
 @router.get("/")
@@ -21,16 +58,27 @@ def read_root():
 
 @router.get("/health")
 def read_health():
-    """For the uptime monitor."""
+    """Liveness, for the uptime monitor: the process is up and serving requests."""
     return {"status": "ok"}
 
 
+@router.get("/ready")
+def read_ready():
+    """Readiness: 200 once the browser and sandbox pools are warm, 503 (with per-component status) until then."""
+    readiness = get_readiness()
+    return JSONResponse(readiness.to_dict(), status_code=200 if readiness.ready else 503)
+
+
 @router.post("/quiz")
-async def handle_quiz_request(request: Request, background_tasks: BackgroundTasks):
+async def handle_quiz_request(request: Request):
     """
     Entry point for quiz tasks.
     - Returns 400 when payload is not valid JSON.
     - Returns 422 when JSON is valid but fails schema validation.
+    - Returns 429 (with Retry-After) when the job queue is full: the server is healthy
+      but at capacity, so clients back off and retry; 503 stays for "not ready".
+    - A repeat of a request (same email and URL) that is still being solved, or was
+      solved within JOB_DEDUPE_WINDOW_SECONDS, returns that job's ID instead of a new job.
     """
 
     if not SECRET_KEY:
@@ -52,15 +100,48 @@ async def handle_quiz_request(request: Request, background_tasks: BackgroundTask
     if quiz_request.secret != SECRET_KEY:
         raise HTTPException(status_code=403, detail="Invalid secret.")
 
-    task_data = quiz_request.model_dump()
-
-    async def run_with_timeout(data):
-        try:
-            print(f"[SUPERVISOR] Starting task chain {data.get('url')} with {TASK_TIMEOUT}s timeout.")
-            await asyncio.wait_for(solve_quiz_task(data), timeout=TASK_TIMEOUT)
-        except asyncio.TimeoutError:
-            print(f"[SUPERVISOR] ❌ CRITICAL: Task chain timed out after {TASK_TIMEOUT}s!")
+    # The secret is not stored with the job; the submission reads it from SECRET_KEY
+    task_data = quiz_request.model_dump(exclude={"secret"})
+    task_data["received_at"] = time.time()
 
-    background_tasks.add_task(run_with_timeout, data=task_data)
+    try:
+        job, created = await scheduler.submit(task_data, fingerprint=request_fingerprint(quiz_request.email, quiz_request.url))
+    except QueueFullError as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        ) from exc
 
-    return {"status": "Job accepted. Processing in background."}
\ No newline at end of file
+    if created:
+        return {"status": "Job accepted. Processing in background.", "job_id": job.id}
+    if job.status == "done":
+        return {"status": "Already solved. Returning the previous outcome.", "job_id": job.id,
+                "deduplicated": True, "job": job.to_dict()}
+    log.info(f"Duplicate request for {quiz_request.url}; attached to job {job.id}.")
+    return {"status": "Duplicate request. Attached to the job already processing it.", "job_id": job.id,
+            "deduplicated": True}
+
+
+@router.get("/jobs/{job_id}")
+def read_job(job_id: str):
+    """Reports queued/running/done state and timings for a job."""
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text exposition of phase timings, job counters and pool/cache stats."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/debug/jobs/{job_id}/trace")
+def read_job_trace(job_id: str):
+    """Per-phase span timeline recorded for a recent job."""
+    trace = get_trace(job_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found.")
+    return trace.to_dict()
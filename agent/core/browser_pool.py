@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+
+from agent.core.metrics import register_stats_gauge
+from agent.core.log import get_logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser
+
+log = get_logger("POOL")
+
+# Warm browsers kept alive between jobs
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))
+# Hard ceiling on concurrently running browsers (bounds memory under load)
+BROWSER_POOL_MAX = int(os.environ.get("BROWSER_POOL_MAX", "4"))
+# Recycle a browser after it has served this many jobs
+BROWSER_MAX_JOBS = int(os.environ.get("BROWSER_MAX_JOBS", "25"))
+
+BROWSER_LAUNCH_ARGS = ['--no-sandbox']
+
+
+class _PooledBrowser:
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.jobs = 0
+
+
+class BrowserPool:
+    """
+    Keeps a set of warm headless Chromium instances.
+    Each job borrows one browser and gets its own isolated BrowserContext/Page.
+    Browsers are recycled after `max_jobs` jobs or when they crash, and never
+    more than `max_size` browsers run at once (extra jobs wait for a free one).
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_size: int = BROWSER_POOL_MAX,
+                 max_jobs: int = BROWSER_MAX_JOBS):
+        self.size = max(0, size)
+        self.max_size = max(1, max_size, self.size)
+        self.max_jobs = max(1, max_jobs)
+        self._playwright = None
+        self._idle: list[_PooledBrowser] = []
+        self._total = 0  # browsers alive or being launched
+        self._in_use = 0
+        self._cond = asyncio.Condition()
+        # Serialises start(): a background warm-up and the first job may both call it
+        self._start_lock = asyncio.Lock()
+        self._closing = False
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "total": self._total,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "max": self.max_size,
+        }
+
+    async def start(self):
+        """Starts Playwright and launches the warm browsers."""
+        async with self._start_lock:
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            self._closing = False
+            log.info(f"Starting browser pool (warm={self.size}, max={self.max_size}, recycle_after={self.max_jobs})")
+            await self._top_up()
+
+    async def stop(self):
+        """Closes every browser and stops Playwright."""
+        self._closing = True
+        async with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        await asyncio.gather(*(self._close(entry) for entry in idle), return_exceptions=True)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        log.info("Browser pool stopped.")
+
+    async def _launch(self) -> _PooledBrowser:
+        browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+        return _PooledBrowser(browser)
+
+    async def _close(self, entry: _PooledBrowser):
+        try:
+            await entry.browser.close()
+        except Exception as e:
+            log.warning(f"Error closing browser: {e}")
+
+    async def _top_up(self):
+        """Launches browsers until the warm floor is reached."""
+        async with self._cond:
+            missing = max(0, self.size - self._total)
+            self._total += missing
+        results = await asyncio.gather(*(self._launch() for _ in range(missing)), return_exceptions=True)
+        async with self._cond:
+            for result in results:
+                if isinstance(result, BaseException):
+                    log.error(f"Failed to launch warm browser: {result}")
+                    self._total -= 1
+                else:
+                    self._idle.append(result)
+            self._cond.notify_all()
+
+    async def _acquire(self) -> _PooledBrowser:
+        if self._closing:
+            raise RuntimeError("Browser pool is shutting down.")
+        if self._playwright is None:
+            await self.start()
+
+        async with self._cond:
+            while True:
+                while self._idle:
+                    entry = self._idle.pop()
+                    if entry.browser.is_connected():
+                        self._in_use += 1
+                        return entry
+                    # Crashed while idle: drop it and free its slot
+                    self._total -= 1
+                    asyncio.create_task(self._close(entry))
+                if self._total < self.max_size:
+                    self._total += 1
+                    self._in_use += 1
+                    break
+                await self._cond.wait()
+
+        try:
+            return await self._launch()
+        except BaseException:
+            async with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    async def _release(self, entry: _PooledBrowser, crashed: bool):
+        entry.jobs += 1
+        recycle = crashed or self._closing or entry.jobs >= self.max_jobs or not entry.browser.is_connected()
+
+        async with self._cond:
+            self._in_use -= 1
+            if not recycle and len(self._idle) >= self.size:
+                # Above the warm floor: let the spike capacity go
+                recycle = True
+            if recycle:
+                self._total -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+        if recycle:
+            await self._close(entry)
+            if not self._closing and self._total < self.size:
+                asyncio.create_task(self._top_up())
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """
+        Yields a fresh Page in a new BrowserContext on a pooled browser.
+        The context is closed when the block exits; the browser goes back to the pool.
+        """
+        entry = await self._acquire()
+        crashed = False
+        context = None
+        try:
+            context = await entry.browser.new_context(**context_options)
+            page = await context.new_page()
+            yield page
+        except BaseException:
+            crashed = not entry.browser.is_connected()
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    crashed = True
+            await self._release(entry, crashed)
+
+
+_browser_pool = None
+
+
+async def start_browser_pool() -> BrowserPool:
+    """Creates and warms the app-wide browser pool (called from the app lifespan)."""
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool()
+    await _browser_pool.start()
+    return _browser_pool
+
+
+async def stop_browser_pool():
+    """Shuts down the app-wide browser pool."""
+    global _browser_pool
+    if _browser_pool is not None:
+        await _browser_pool.stop()
+        _browser_pool = None
+
+
+async def get_browser_pool() -> BrowserPool:
+    """Returns the app-wide pool, starting it on first use if the lifespan did not."""
+    if _browser_pool is None:
+        return await start_browser_pool()
+    return _browser_pool
+
+
+register_stats_gauge("agent_browser_pool", "Browser pool usage.", lambda: _browser_pool and _browser_pool.stats)
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+# Seconds held back so a final answer can still be submitted
+DEADLINE_SUBMIT_RESERVE = float(os.environ.get("DEADLINE_SUBMIT_RESERVE", "10"))
+# Below this much usable time the solver asks the LLM to submit its best answer now
+DEADLINE_URGENT_SECONDS = float(os.environ.get("DEADLINE_URGENT_SECONDS", "25"))
+# A wrong answer is only retried when at least this much usable time is left
+DEADLINE_MIN_ATTEMPT_SECONDS = float(os.environ.get("DEADLINE_MIN_ATTEMPT_SECONDS", "30"))
+# Budget used when a caller does not pass a deadline (the quiz's 3-minute limit)
+DEFAULT_BUDGET_SECONDS = 180.0
+# Smallest timeout handed out, so an exhausted budget fails fast instead of with 0
+_MIN_TIMEOUT = 0.5
+
+
+class Deadline:
+    """
+    Execution budget of one job, passed from the supervisor down to the tools.
+    `timeout(cap)` caps a step's timeout to the time left minus the submission
+    reserve; `submit_timeout(cap)` may spend the reserve.
+    `started_at` (a time.time() timestamp) counts time already spent, e.g. queued.
+    """
+
+    def __init__(self, seconds: float, started_at: Optional[float] = None,
+                 submit_reserve: float = DEADLINE_SUBMIT_RESERVE, urgent_seconds: float = DEADLINE_URGENT_SECONDS):
+        self.budget = seconds
+        self.submit_reserve = submit_reserve
+        self.urgent_seconds = urgent_seconds
+        spent = max(0.0, time.time() - started_at) if started_at else 0.0
+        self.expires_at = time.monotonic() + seconds - spent
+
+    def remaining(self) -> float:
+        """Seconds until the hard deadline."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def usable(self) -> float:
+        """Seconds left for work other than the final submission."""
+        return max(0.0, self.remaining() - self.submit_reserve)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def exhausted(self) -> bool:
+        """True once only the submission reserve is left."""
+        return self.usable() <= 0
+
+    @property
+    def urgent(self) -> bool:
+        """True when the solver should stop exploring and submit its best answer."""
+        return self.usable() <= self.urgent_seconds
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Timeout for a non-submission step: at most `cap` and never into the reserve."""
+        left = self.usable()
+        if cap is not None:
+            left = min(cap, left)
+        return max(_MIN_TIMEOUT, left)
+
+    def submit_timeout(self, cap: Optional[float] = None) -> float:
+        """Timeout for the submission itself, which may use the reserve."""
+        left = self.remaining()
+        if cap is not None:
+            left = min(cap, left)
+        return max(_MIN_TIMEOUT, left)
+
+    def can_attempt(self, expected_seconds: float = 0.0) -> bool:
+        """Whether another attempt, expected to take `expected_seconds`, fits in the budget."""
+        return self.usable() >= max(DEADLINE_MIN_ATTEMPT_SECONDS, expected_seconds)
+
+    async def run(self, awaitable, cap: Optional[float] = None):
+        """Awaits `awaitable` with `timeout(cap)`; raises asyncio.TimeoutError when it runs over."""
+        return await asyncio.wait_for(awaitable, timeout=self.timeout(cap))
+
+
+def step_timeout(deadline: Optional[Deadline], cap: Optional[float]) -> Optional[float]:
+    """`cap` capped by the deadline, or `cap` itself (None: no timeout) when running without one."""
+    return deadline.timeout(cap) if deadline is not None else cap
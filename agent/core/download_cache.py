@@ -0,0 +1,324 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+
+from agent.core.http_client import get_http_client
+from agent.core.metrics import register_stats_gauge
+from agent.core.log import get_logger
+
+log = get_logger("CACHE")
+
+DOWNLOAD_DIR = os.environ.get("DOWNLOAD_DIR", "downloads")
+# Total bytes of cached files kept on disk before least-recently-used ones are evicted
+DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get("DOWNLOAD_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Largest single download accepted; bigger files are aborted mid-stream
+DOWNLOAD_MAX_BYTES = int(os.environ.get("DOWNLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Entries fetched this recently are reused without a conditional GET
+DOWNLOAD_FRESH_SECONDS = float(os.environ.get("DOWNLOAD_FRESH_SECONDS", "30"))
+
+_INDEX_FILE = ".cache_index.json"
+_EXTRACT_DIR = ".extract"
+
+
+class DownloadError(Exception):
+    """Raised when a download fails or exceeds the size limit."""
+
+
+class CacheEntry:
+    """Metadata for one cached URL."""
+
+    def __init__(self, url: str, sha256: str, path: str, size: int, content_type: str = "",
+                 etag: Optional[str] = None, last_modified: Optional[str] = None, fetched_at: float = 0.0):
+        self.url = url
+        self.sha256 = sha256
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CacheEntry":
+        return cls(**data)
+
+
+def local_filename(url: str, sha256: str) -> str:
+    """Readable, content-addressed file name: <name>_<hash><ext>."""
+    original_filename = os.path.basename(urlparse(url).path) or "downloaded_file"
+    name, ext = os.path.splitext(original_filename)
+    if not ext:
+        ext = ".txt"  # Default extension
+    return f"{name}_{sha256[:12]}{ext}"
+
+
+class DownloadCache:
+    """
+    Disk cache for downloaded files.
+    - URLs map to entries carrying ETag/Last-Modified validators for conditional GETs.
+    - File bodies are stored once per content hash; extractions (PDF text, CSV
+      summaries, parsed tables) are stored per content hash so an identical body
+      is never re-parsed.
+    - Files are evicted least-recently-used once their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str = DOWNLOAD_DIR, max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: dict[str, CacheEntry] = {}
+        # sha256 -> (path, size), ordered from least to most recently used
+        self._blobs: "OrderedDict[str, tuple[str, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.extraction_hits = 0
+        os.makedirs(self.extract_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def extract_dir(self) -> str:
+        """Directory of per-content-hash extractions (evicted with their file)."""
+        return os.path.join(self.directory, _EXTRACT_DIR)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._blobs.values())
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "extraction_hits": self.extraction_hits,
+            "entries": len(self._entries),
+            "files": len(self._blobs),
+            "bytes": self.total_bytes,
+        }
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, _INDEX_FILE)
+
+    def _load(self):
+        try:
+            with open(self._index_path()) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for sha256, path, size in data.get("blobs", []):
+            if os.path.exists(path):
+                self._blobs[sha256] = (path, size)
+        for raw in data.get("entries", []):
+            entry = CacheEntry.from_dict(raw)
+            if entry.sha256 in self._blobs:
+                self._entries[entry.url] = entry
+
+    def _save(self):
+        data = {
+            "blobs": [[sha256, path, size] for sha256, (path, size) in self._blobs.items()],
+            "entries": [entry.to_dict() for entry in self._entries.values()],
+        }
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._index_path())
+
+    def _touch(self, sha256: str):
+        if sha256 in self._blobs:
+            self._blobs.move_to_end(sha256)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Returns the cached entry for a URL if its file is still on disk."""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        if entry.sha256 not in self._blobs or not os.path.exists(entry.path):
+            self._entries.pop(url, None)
+            self._blobs.pop(entry.sha256, None)
+            return None
+        return entry
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> dict:
+        """Request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def mark_not_modified(self, entry: CacheEntry) -> CacheEntry:
+        """Records a 304 response: the cached body is still valid."""
+        self.hits += 1
+        self.revalidated += 1
+        entry.fetched_at = time.time()
+        self._touch(entry.sha256)
+        self._save()
+        return entry
+
+    def mark_fresh(self, entry: CacheEntry) -> CacheEntry:
+        """Records a hit served without contacting the server."""
+        self.hits += 1
+        self._touch(entry.sha256)
+        return entry
+
+    def temp_path(self) -> str:
+        """A fresh path inside the cache directory for a download in progress."""
+        return os.path.join(self.directory, f".partial_{uuid.uuid4().hex}")
+
+    def store_file(self, url: str, tmp_path: str, sha256: str, size: int, headers) -> CacheEntry:
+        """Moves a fully downloaded temp file into the cache and returns its entry."""
+        if sha256 in self._blobs:
+            # Same bytes as something already cached (e.g. a retry without validators)
+            self.hits += 1
+            os.remove(tmp_path)
+            path, size = self._blobs[sha256]
+            self._touch(sha256)
+        else:
+            self.misses += 1
+            path = os.path.join(self.directory, local_filename(url, sha256))
+            os.replace(tmp_path, path)
+            self._blobs[sha256] = (path, size)
+
+        entry = CacheEntry(
+            url=url,
+            sha256=sha256,
+            path=path,
+            size=size,
+            content_type=headers.get("content-type", "").lower(),
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            fetched_at=time.time(),
+        )
+        self._entries[url] = entry
+        self._evict()
+        self._save()
+        return entry
+
+    def _extraction_path(self, sha256: str, key: str) -> str:
+        safe_key = hashlib.md5(key.encode()).hexdigest()[:12]
+        return os.path.join(self.directory, _EXTRACT_DIR, f"{sha256}_{safe_key}.txt")
+
+    def get_extraction(self, sha256: str, key: str) -> Optional[str]:
+        """Returns a previously stored extraction of the file with this content hash."""
+        try:
+            with open(self._extraction_path(sha256, key), encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return None
+        self.extraction_hits += 1
+        self._touch(sha256)
+        return text
+
+    def put_extraction(self, sha256: str, key: str, text: str):
+        with open(self._extraction_path(sha256, key), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _evict(self):
+        total = self.total_bytes
+        while total > self.max_bytes and len(self._blobs) > 1:
+            sha256, (path, size) = self._blobs.popitem(last=False)
+            total -= size
+            for url in [u for u, e in self._entries.items() if e.sha256 == sha256]:
+                del self._entries[url]
+            extract_dir = self.extract_dir
+            for name in os.listdir(extract_dir):
+                if name.startswith(sha256):
+                    os.remove(os.path.join(extract_dir, name))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            log.debug(f"Evicted {path} ({size} bytes)")
+
+
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def _retrieve_exception(task: asyncio.Future):
+    # Keeps asyncio quiet when nobody is left awaiting a failed shared download
+    if not task.cancelled():
+        task.exception()
+
+
+async def fetch_to_cache(url: str, timeout: float = 15.0, max_bytes: int = DOWNLOAD_MAX_BYTES) -> CacheEntry:
+    """
+    Downloads `url` into the cache, streaming chunks straight to disk while
+    hashing them. A cached copy is revalidated with a conditional GET first,
+    unless it was fetched within DOWNLOAD_FRESH_SECONDS. Concurrent calls for
+    the same URL share one download (so an early-started fetch is reused).
+    Raises DownloadError on HTTP errors or when the body exceeds `max_bytes`.
+    """
+    cache = get_download_cache()
+    entry = cache.lookup(url)
+    if entry is not None and time.time() - entry.fetched_at < DOWNLOAD_FRESH_SECONDS:
+        return cache.mark_fresh(entry)
+
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_download(url, timeout, max_bytes))
+        _inflight[url] = task
+        task.add_done_callback(lambda _: _inflight.pop(url, None))
+        task.add_done_callback(_retrieve_exception)
+    # Shielded so one cancelled caller does not abort the download for the others
+    return await asyncio.shield(task)
+
+
+async def _download(url: str, timeout: float, max_bytes: int) -> CacheEntry:
+    cache = get_download_cache()
+    entry = cache.lookup(url)
+    client = get_http_client()
+
+    async with client.stream("GET", url, headers=cache.conditional_headers(entry), timeout=timeout) as response:
+        if response.status_code == 304 and entry is not None:
+            log.info(f"Not modified, using cached copy {entry.path}")
+            return cache.mark_not_modified(entry)
+        if response.status_code != 200:
+            raise DownloadError(f"Failed to download. Status: {response.status_code}")
+
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise DownloadError(f"File is {declared} bytes, over the {max_bytes} byte limit.")
+
+        tmp_path = cache.temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise DownloadError(f"Download aborted after {size} bytes (limit {max_bytes}).")
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return cache.store_file(url, tmp_path, digest.hexdigest(), size, response.headers)
+
+
+_download_cache = None
+
+
+def get_download_cache() -> DownloadCache:
+    """Get or create the process-wide download cache."""
+    global _download_cache
+    if _download_cache is None:
+        _download_cache = DownloadCache()
+    return _download_cache
+
+
+register_stats_gauge("agent_download_cache", "Download cache counters and size.", lambda: _download_cache and _download_cache.stats)
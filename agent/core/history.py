@@ -0,0 +1,108 @@
+import os
+
+from agent.core.page_compactor import estimate_tokens
+
+# Tokens of conversation sent per LLM call (pinned task prompt included)
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "24000"))
+# Most recent messages that are always kept word for word
+HISTORY_KEEP_RECENT = int(os.environ.get("HISTORY_KEEP_RECENT", "6"))
+# Size that stale tool outputs and page snapshots are cut down to first
+STALE_OUTPUT_TOKENS = int(os.environ.get("STALE_OUTPUT_TOKENS", "200"))
+
+# Summary lines kept; older ones are collapsed into a count
+HISTORY_MAX_SUMMARY_LINES = 30
+
+# Message kinds whose bodies go stale quickly and are shrunk first
+_STALE_KINDS = ("page", "tool")
+
+
+class ConversationHistory:
+    """
+    Message history for one solver task, kept under a token budget.
+    The system message and original task prompt are pinned. When the budget is
+    exceeded, old page snapshots and tool outputs are truncated first, then the
+    oldest turns are folded into a short summary; the last few messages are
+    always sent verbatim.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, keep_recent: int = HISTORY_KEEP_RECENT):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.pinned: list[dict] = []
+        self.messages: list[dict] = []
+        self.summary: list[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.pinned or self.messages)
+
+    def pin(self, role: str, content: str):
+        """Adds a message that is never truncated or summarised (system prompt, task)."""
+        self.pinned.append({"role": role, "content": content})
+
+    def add(self, role: str, content: str, kind: str = "message"):
+        """
+        Appends a turn. `kind` is "page", "tool", "assistant", "error" or "message";
+        page and tool bodies are the first to be shrunk once they are old.
+        """
+        self.messages.append({"role": role, "content": content, "kind": kind, "tokens": estimate_tokens(content)})
+
+    def _summary_message(self) -> dict:
+        lines = self.summary[-HISTORY_MAX_SUMMARY_LINES:]
+        omitted = len(self.summary) - len(lines)
+        if omitted:
+            lines = [f"- ({omitted} earlier steps omitted)"] + lines
+        return {"role": "user", "content": "Summary of earlier steps:\n" + "\n".join(lines)}
+
+    def token_count(self) -> int:
+        total = sum(estimate_tokens(m["content"]) for m in self.pinned)
+        total += sum(m["tokens"] for m in self.messages)
+        if self.summary:
+            total += estimate_tokens(self._summary_message()["content"])
+        return total
+
+    def _shrink(self, message: dict, max_tokens: int):
+        max_chars = max_tokens * 4
+        content = message["content"]
+        if len(content) <= max_chars:
+            return
+        message["content"] = f"{content[:max_chars]}\n[... {len(content) - max_chars} chars of stale output dropped ...]"
+        message["tokens"] = estimate_tokens(message["content"])
+
+    @staticmethod
+    def _summarise(message: dict) -> str:
+        first_line = message["content"].strip().split("\n", 1)[0]
+        if message["kind"] == "assistant":
+            return f"- Action: {first_line[:200]}"
+        if message["kind"] == "page":
+            return f"- Viewed page ({len(message['content'])} chars)."
+        return f"- {message['kind'].capitalize()}: {first_line[:160]}"
+
+    def _enforce_budget(self):
+        old = max(0, len(self.messages) - self.keep_recent)
+
+        # 1. Shrink stale page snapshots and tool outputs, oldest first
+        for message in self.messages[:old]:
+            if self.token_count() <= self.token_budget:
+                return
+            if message["kind"] in _STALE_KINDS:
+                self._shrink(message, STALE_OUTPUT_TOKENS)
+
+        # 2. Fold the oldest turns into the summary
+        while self.token_count() > self.token_budget and len(self.messages) > self.keep_recent:
+            self.summary.append(self._summarise(self.messages.pop(0)))
+
+        # 3. Recent outputs are still too large: shrink all but the newest message
+        for message in self.messages[:-1]:
+            if self.token_count() <= self.token_budget:
+                return
+            if message["kind"] in _STALE_KINDS:
+                self._shrink(message, STALE_OUTPUT_TOKENS * 4)
+
+    def render(self) -> list[dict]:
+        """Returns the message list to send to the LLM, within the token budget."""
+        self._enforce_budget()
+        rendered = list(self.pinned)
+        if self.summary:
+            rendered.append(self._summary_message())
+        rendered.extend({"role": m["role"], "content": m["content"]} for m in self.messages)
+        return rendered
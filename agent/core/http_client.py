@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from agent.core.log import get_logger
+
+if TYPE_CHECKING:
+    import httpx
+
+log = get_logger("HTTP")
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "0").lower() in ("1", "true", "yes")
+# Default used when a call does not pass its own timeout
+HTTP_DEFAULT_TIMEOUT = float(os.environ.get("HTTP_DEFAULT_TIMEOUT", "15"))
+
+_http_client = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get or create the app-wide pooled HTTP client.
+    Connections are kept alive and reused across tool calls; callers pass
+    their own `timeout=` per request.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        http2 = HTTP2_ENABLED and _http2_available()
+        if HTTP2_ENABLED and not http2:
+            log.warning("HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1.")
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            timeout=HTTP_DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Closes the shared client (called from the app lifespan on shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
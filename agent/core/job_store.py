@@ -0,0 +1,402 @@
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from agent.core.log import get_logger
+
+log = get_logger("JOBS")
+
+# "sqlite:///<path>" (shared by every worker process on the host) or "memory://" (this process only)
+JOB_STORE_URL = os.environ.get("JOB_STORE_URL", "sqlite:///" + os.path.join(".cache", "jobs.sqlite3"))
+# A claimed job whose lease is not renewed within this many seconds is handed to another worker
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "30"))
+# Claims after which a job that keeps losing its worker is marked failed
+JOB_MAX_CLAIMS = int(os.environ.get("JOB_MAX_CLAIMS", "3"))
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def request_fingerprint(email: str, url: str) -> str:
+    """
+    Identifies a quiz request by its email and URL, ignoring case in the email,
+    scheme and host, default ports, the fragment, a trailing slash and query order.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    normalised = urlunsplit((scheme, host, parts.path.rstrip("/") or "/", query, ""))
+    return hashlib.sha256(f"{email.strip().lower()}\n{normalised}".encode()).hexdigest()
+
+
+class Job:
+    """
+    One quiz chain. `progress` is the chain checkpoint (current URL, attempt)
+    a worker saves as it goes, so another worker can resume it. The time budget
+    needs no checkpoint: it runs from `data["received_at"]`.
+    """
+
+    def __init__(self, data: dict, job_id: Optional[str] = None, status: str = "queued", error: Optional[str] = None,
+                 progress: Optional[dict] = None, created_at: Optional[float] = None,
+                 started_at: Optional[float] = None, finished_at: Optional[float] = None,
+                 worker_id: Optional[str] = None, lease_expires: Optional[float] = None, claims: int = 0,
+                 fingerprint: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.data = data
+        self.status = status
+        self.error = error
+        self.progress = progress or {}
+        self.created_at = created_at or time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.worker_id = worker_id
+        self.lease_expires = lease_expires
+        self.claims = claims
+        # Requests with the same fingerprint are served by this job while it runs
+        self.fingerprint = fingerprint
+        # Set when another worker took the job over; this worker must stop writing to it
+        self.lease_lost = False
+        self.store: Optional["JobStore"] = None
+
+    async def checkpoint(self, **progress) -> bool:
+        """Merges `progress` into the chain checkpoint and saves it; False if the lease was lost."""
+        self.progress.update(progress)
+        if self.store is None:
+            return True
+        if not await self.store.call(self.store.checkpoint, self):
+            self.lease_lost = True
+        return not self.lease_lost
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        queued_until = self.started_at or self.finished_at or now
+        run_until = self.finished_at or now
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "url": self.data.get("url"),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": round(queued_until - self.created_at, 3),
+            "run_seconds": round(run_until - self.started_at, 3) if self.started_at else None,
+            "progress": {key: value for key, value in self.progress.items() if key != "task_hint"},
+            "claims": self.claims,
+            "worker_id": self.worker_id,
+        }
+
+
+class JobStore(ABC):
+    """
+    Where jobs live between submission and completion.
+    Workers `claim` a job with a lease, renew it with `heartbeat` while the
+    chain runs, and `finish` or `release` it. Writes from a worker whose lease
+    was taken over return False and change nothing.
+    Methods are synchronous; the scheduler runs them through `call`.
+    """
+
+    # Whether calls wait on I/O or locks (and so must run off the event loop)
+    blocking = False
+
+    async def call(self, method: Callable, *args):
+        """Runs a store method in a thread for blocking backends, inline otherwise."""
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    @abstractmethod
+    def add(self, job: Job) -> Job:
+        """
+        Stores `job` unless a queued or running job has the same fingerprint;
+        returns whichever job holds the fingerprint.
+        """
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def find(self, fingerprint: str, done_since: float) -> Optional[Job]:
+        """The queued or running job with this fingerprint, else one that finished "done" after `done_since`."""
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Job]:
+        """Takes the oldest queued job, or a running one whose lease expired."""
+        ...
+
+    @abstractmethod
+    def heartbeat(self, job: Job, lease_seconds: float = JOB_LEASE_SECONDS) -> bool:
+        ...
+
+    @abstractmethod
+    def checkpoint(self, job: Job) -> bool:
+        ...
+
+    @abstractmethod
+    def finish(self, job: Job) -> bool:
+        """Records the final status and error of a job."""
+        ...
+
+    @abstractmethod
+    def release(self, job: Job) -> bool:
+        """Puts a job back in the queue (e.g. on shutdown) keeping its checkpoint."""
+        ...
+
+    @abstractmethod
+    def count(self, status: str) -> int:
+        ...
+
+    @abstractmethod
+    def prune(self, finished_before: float):
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """Jobs kept in this process only: nothing survives a restart or is shared with other workers."""
+
+    def __init__(self):
+        self._jobs: dict[str, Job] = {}
+
+    def add(self, job: Job) -> Job:
+        if job.fingerprint:
+            active = self.find(job.fingerprint, time.time())
+            if active is not None:
+                return active
+        job.store = self
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def find(self, fingerprint: str, done_since: float) -> Optional[Job]:
+        matches = [job for job in self._jobs.values() if job.fingerprint == fingerprint]
+        for job in matches:
+            if job.status in ("queued", "running"):
+                return job
+        done = [job for job in matches if job.status == "done" and job.finished_at and job.finished_at >= done_since]
+        return max(done, key=lambda j: j.finished_at) if done else None
+
+    def _owned(self, job: Job) -> bool:
+        return self._jobs.get(job.id) is job and job.status == "running"
+
+    def claim(self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Job]:
+        now = time.time()
+        for job in sorted(self._jobs.values(), key=lambda j: j.created_at):
+            expired = job.status == "running" and job.lease_expires is not None and job.lease_expires < now
+            if job.status != "queued" and not expired:
+                continue
+            if expired and job.claims >= JOB_MAX_CLAIMS:
+                job.status, job.error, job.finished_at = "failed", f"Abandoned after {job.claims} claims.", now
+                continue
+            job.status = "running"
+            job.worker_id = worker_id
+            job.lease_expires = now + lease_seconds
+            job.claims += 1
+            job.started_at = job.started_at or now
+            return job
+        return None
+
+    def heartbeat(self, job: Job, lease_seconds: float = JOB_LEASE_SECONDS) -> bool:
+        if not self._owned(job):
+            return False
+        job.lease_expires = time.time() + lease_seconds
+        return True
+
+    def checkpoint(self, job: Job) -> bool:
+        return self._owned(job)
+
+    def finish(self, job: Job) -> bool:
+        job.finished_at = job.finished_at or time.time()
+        job.lease_expires = None
+        return True
+
+    def release(self, job: Job) -> bool:
+        job.status = "queued"
+        job.worker_id = None
+        job.lease_expires = None
+        job.claims = max(0, job.claims - 1)
+        return True
+
+    def count(self, status: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def prune(self, finished_before: float):
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and job.finished_at < finished_before]:
+            del self._jobs[job_id]
+
+
+_COLUMNS = ("id", "data", "status", "error", "progress", "created_at", "started_at", "finished_at",
+            "worker_id", "lease_expires", "claims", "fingerprint")
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs in a local SQLite database (WAL mode), shared by every process that
+    opens the same file. Claims are a single UPDATE ... RETURNING statement, so
+    two workers never take the same job. Every call may wait on another
+    process's write lock, so the store is `blocking`.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, data TEXT, status TEXT, error TEXT, progress TEXT,"
+            " created_at REAL, started_at REAL, finished_at REAL,"
+            " worker_id TEXT, lease_expires REAL, claims INTEGER DEFAULT 0, fingerprint TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "fingerprint" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN fingerprint TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        # At most one queued or running job per fingerprint, enforced across processes
+        self._db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_fingerprint ON jobs (fingerprint)"
+            " WHERE status IN ('queued', 'running')"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint, finished_at)")
+        self._db.commit()
+
+    def _job(self, row) -> Job:
+        values = dict(zip(_COLUMNS, row))
+        values["job_id"] = values.pop("id")
+        values["data"] = json.loads(values["data"])
+        values["progress"] = json.loads(values["progress"] or "{}")
+        job = Job(**values)
+        job.store = self
+        return job
+
+    def _write(self, sql: str, params: tuple) -> int:
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor.rowcount
+
+    def add(self, job: Job) -> Job:
+        job.store = self
+        try:
+            self._write(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                (job.id, json.dumps(job.data), job.status, job.error, json.dumps(job.progress), job.created_at,
+                 job.started_at, job.finished_at, job.worker_id, job.lease_expires, job.claims, job.fingerprint),
+            )
+        except sqlite3.IntegrityError:
+            # Another request (possibly in another process) got there first
+            with self._lock:
+                self._db.rollback()
+            active = self.find(job.fingerprint, time.time())
+            if active is None:
+                # It finished in between: store this one after all
+                return self.add(job)
+            return active
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def find(self, fingerprint: str, done_since: float) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE fingerprint = ?"
+                " AND (status IN ('queued', 'running') OR (status = 'done' AND finished_at >= ?))"
+                " ORDER BY status = 'done', finished_at DESC LIMIT 1",
+                (fingerprint, done_since),
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def claim(self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Abandoned after ' || claims || ' claims.',"
+                " finished_at = ?, lease_expires = NULL"
+                " WHERE status = 'running' AND lease_expires < ? AND claims >= ?",
+                (now, now, JOB_MAX_CLAIMS),
+            )
+            row = self._db.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, lease_expires = ?, claims = claims + 1,"
+                " started_at = COALESCE(started_at, ?)"
+                " WHERE id = (SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)"
+                " ORDER BY created_at LIMIT 1)"
+                f" RETURNING {', '.join(_COLUMNS)}",
+                (worker_id, now + lease_seconds, now, now),
+            ).fetchone()
+            self._db.commit()
+        return self._job(row) if row else None
+
+    def heartbeat(self, job: Job, lease_seconds: float = JOB_LEASE_SECONDS) -> bool:
+        job.lease_expires = time.time() + lease_seconds
+        return self._write(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (job.lease_expires, job.id, job.worker_id),
+        ) == 1
+
+    def checkpoint(self, job: Job) -> bool:
+        return self._write(
+            "UPDATE jobs SET progress = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (json.dumps(job.progress), job.id, job.worker_id),
+        ) == 1
+
+    def finish(self, job: Job) -> bool:
+        job.finished_at = job.finished_at or time.time()
+        return self._write(
+            "UPDATE jobs SET status = ?, error = ?, progress = ?, finished_at = ?, lease_expires = NULL"
+            " WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (job.status, job.error, json.dumps(job.progress), job.finished_at, job.id, job.worker_id),
+        ) == 1
+
+    def release(self, job: Job) -> bool:
+        return self._write(
+            "UPDATE jobs SET status = 'queued', worker_id = NULL, lease_expires = NULL, claims = MAX(claims - 1, 0)"
+            " WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (job.id, job.worker_id),
+        ) == 1
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def prune(self, finished_before: float):
+        self._write("DELETE FROM jobs WHERE finished_at < ?", (finished_before,))
+
+
+def create_job_store(url: str = JOB_STORE_URL) -> JobStore:
+    """Builds the store named by a JOB_STORE_URL."""
+    log.info(f"Using job store {url}")
+    if url.startswith("memory:"):
+        return MemoryJobStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
+
+
+def new_worker_id() -> str:
+    """Identifies this process in job leases."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
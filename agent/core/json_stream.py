@@ -0,0 +1,87 @@
+import json
+
+
+class IncrementalJSONObject:
+    """
+    Scans streamed text for the first top-level JSON object.
+    `complete` becomes True as soon as the object's closing brace arrives, and
+    top-level string fields (e.g. "tool", "url") are exposed in `fields` as
+    soon as their values have been fully received.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.start = -1
+        self.end = -1
+        self.fields: dict[str, str] = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._key = None
+        self._expect_value = False
+
+    @property
+    def complete(self) -> bool:
+        return self.end != -1
+
+    @property
+    def text(self) -> str:
+        """The object text once complete, otherwise everything received so far."""
+        if self.complete:
+            return self.buffer[self.start:self.end + 1]
+        return self.buffer
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        if self.complete:
+            return
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._top_level_string(buffer[self._string_start:pos + 1])
+                continue
+
+            if char == '"':
+                if self.start != -1:
+                    self._in_string = True
+                    self._string_start = pos
+            elif char in "{[":
+                if self.start == -1:
+                    if char != "{":
+                        continue
+                    self.start = pos
+                self._depth += 1
+            elif char in "}]" and self.start != -1:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = pos
+                    self._pos = pos + 1
+                    return
+            elif self._depth == 1:
+                if char == ":":
+                    self._expect_value = True
+                elif char == ",":
+                    self._key = None
+                    self._expect_value = False
+        self._pos = len(buffer)
+
+    def _top_level_string(self, literal: str):
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            return
+        if self._expect_value and self._key is not None:
+            self.fields[self._key] = value
+            self._expect_value = False
+        else:
+            self._key = value
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from agent.core.metrics import span, record_llm_call, register_stats_gauge
+from agent.core.page_compactor import estimate_tokens
+from agent.core.log import get_logger
+
+log = get_logger("LLM-CACHE")
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+def _normalise_content(content):
+    if isinstance(content, str):
+        return re.sub(r"\s+", " ", content).strip()
+    # Multi-part (vision) content: keep structure, normalise text parts
+    return [
+        {**part, "text": _normalise_content(part["text"])} if isinstance(part, dict) and "text" in part else part
+        for part in content or []
+    ]
+
+
+def cache_key(model: str, messages: list[dict], params: dict) -> str:
+    """Stable key for a completion request: model, whitespace-normalised messages and parameters."""
+    normalised = [{"role": m.get("role"), "content": _normalise_content(m.get("content"))} for m in messages]
+    blob = json.dumps({"model": model, "messages": normalised, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed (SQLite) cache of LLM completion texts.
+    Entries expire after `ttl` seconds; beyond `max_entries` the least recently
+    used ones are evicted. Methods block on SQLite (and its file lock), so async
+    callers run them with `asyncio.to_thread`, like the job store.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+            " created_at REAL, accessed_at REAL)"
+        )
+        self._db.commit()
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, model, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def delete(self, key: str):
+        """Drops an entry, e.g. when the cached response turned out to be unusable."""
+        with self._lock:
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _evict(self, now: float):
+        self._db.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key IN ("
+            " SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+_llm_cache = None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Returns the process-wide cache, or None when LLM_CACHE_ENABLED is off."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = LLMCache()
+    return _llm_cache
+
+
+register_stats_gauge("agent_llm_cache", "LLM response cache counters.", lambda: _llm_cache and _llm_cache.stats)
+
+
+async def create_completion(client, model: str, messages: list[dict], **params) -> str:
+    """Plain non-streaming completion call; returns the response text."""
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    return response.choices[0].message.content
+
+
+async def _timed_completion(completion_fn, client, model: str, messages: list[dict], **params) -> str:
+    """Runs one real LLM call inside an "llm" span and records its token and payload sizes."""
+    prompt = json.dumps(messages, default=str)
+    async with span("llm", model=model) as s:
+        text = await completion_fn(client, model, messages, **params)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(text or "")
+        s.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, prompt_bytes=len(prompt))
+    record_llm_call(model, prompt_tokens, completion_tokens, len(prompt), len((text or "").encode("utf-8")))
+    return text
+
+
+async def cached_chat_completion(client, model: str, messages: list[dict], bypass: bool = False,
+                                 completion_fn=None, **params) -> tuple[str, Optional[str]]:
+    """
+    Calls `client.chat.completions.create` through the response cache.
+    Returns (response_text, cache_key); the key is None when caching is off or
+    bypassed. Pass `bypass=True` for steps whose answer must not be replayed.
+    `completion_fn(client, model, messages, **params)` replaces the plain
+    non-streaming call on a miss (e.g. a streaming consumer).
+    """
+    completion_fn = completion_fn or create_completion
+    cache = get_llm_cache()
+    if cache is None:
+        return await _timed_completion(completion_fn, client, model, messages, **params), None
+    if bypass:
+        cache.bypassed += 1
+        return await _timed_completion(completion_fn, client, model, messages, **params), None
+
+    key = cache_key(model, messages, params)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        log.info(f"Hit ({cache.stats['hit_rate']:.0%} hit rate)")
+        return cached, key
+
+    text = await _timed_completion(completion_fn, client, model, messages, **params)
+    if text:
+        await asyncio.to_thread(cache.put, key, model, text)
+    return text, key
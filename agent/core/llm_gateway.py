@@ -0,0 +1,226 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from agent.core.deadline import Deadline
+from agent.core.metrics import label_key, register_gauge, LLM_RETRIES, LLM_HEDGES
+from agent.core.log import get_logger
+
+log = get_logger("LLM-GATEWAY")
+
+# Strong model: used for every step without a fast model, and for escalated steps with one
+LLM_MODEL = os.environ.get("LLM_MODEL", "google/gemini-2.5-pro")
+# Faster, cheaper model tried first on ordinary steps; empty disables the cascade
+LLM_FAST_MODEL = os.environ.get("LLM_FAST_MODEL", "")
+# Retries of one call on 429, 5xx and connection errors
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+# Backoff before retry n is drawn uniformly from [0, min(max, base * 2**n)] seconds
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "8"))
+# A duplicate request is sent once a call has run longer than this latency percentile
+# of its model; whichever answers first wins (0 disables hedging)
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.9"))
+# Lower bound on the hedge delay, so quick calls are not duplicated on noise
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "2"))
+# Calls of a model observed before its latency drives hedging and routing
+LLM_LATENCY_MIN_SAMPLES = int(os.environ.get("LLM_LATENCY_MIN_SAMPLES", "10"))
+# Recent call latencies kept per model
+LLM_LATENCY_WINDOW = int(os.environ.get("LLM_LATENCY_WINDOW", "200"))
+# Upper bound on one LLM call including retries (further capped by the job deadline)
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT", "60"))
+
+CompletionFn = Callable[..., Awaitable[str]]
+
+
+class ModelLatency:
+    """Sliding window of one model's successful call latencies."""
+
+    def __init__(self, window: int = LLM_LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    @property
+    def known(self) -> bool:
+        return len(self._samples) >= LLM_LATENCY_MIN_SAMPLES
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency below which a fraction `q` of recent calls finished; None until enough calls were seen."""
+        if not self.known:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    # Includes APITimeoutError
+    return isinstance(exc, openai.APIConnectionError)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """The server's Retry-After in seconds, when it sent a numeric one."""
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(retry: int, exc: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff, raised to the server's Retry-After when it asks for longer."""
+    ceiling = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** retry)
+    delay = random.uniform(0, ceiling)
+    requested = _retry_after(exc) if exc is not None else None
+    if requested is not None:
+        delay = max(delay, min(requested, LLM_RETRY_MAX_DELAY))
+    return delay
+
+
+class LLMGateway:
+    """
+    Front door for the solver's LLM calls.
+    - Cascade: ordinary steps go to `fast_model`; the caller escalates to
+      `strong_model` after invalid output or a wrong answer.
+    - Hedging: a call running past the model's LLM_HEDGE_PERCENTILE latency gets a
+      duplicate request, and the first answer wins.
+    - Retries: 429, 5xx and connection errors are retried with jittered backoff.
+    Observed per-model latencies drive both the hedge delay and the routing.
+    """
+
+    def __init__(self, strong_model: str = LLM_MODEL, fast_model: str = LLM_FAST_MODEL):
+        self.strong_model = strong_model
+        self.fast_model = fast_model or None
+        self._latency: dict[str, ModelLatency] = {}
+
+    def latency(self, model: str) -> ModelLatency:
+        if model not in self._latency:
+            self._latency[model] = ModelLatency()
+        return self._latency[model]
+
+    def choose_model(self, escalated: bool = False, deadline: Optional[Deadline] = None) -> str:
+        """
+        The strong model when escalated or without a fast model, the fast one otherwise.
+        The fast model is skipped while it is not actually faster, and a model whose
+        typical (p90) latency no longer fits the deadline gives way to the other one.
+        """
+        if self.fast_model is None:
+            return self.strong_model
+        fast, strong = self.latency(self.fast_model), self.latency(self.strong_model)
+        model = self.strong_model if escalated else self.fast_model
+        if not escalated and fast.known and strong.known and fast.percentile(0.5) >= strong.percentile(0.5):
+            model = self.strong_model
+        if deadline is not None:
+            other = self.fast_model if model == self.strong_model else self.strong_model
+            expected, alternative = self.latency(model).percentile(0.9), self.latency(other).percentile(0.9)
+            if expected is not None and alternative is not None and expected > deadline.usable() > alternative:
+                log.info(f"{model} p90 latency {expected:.1f}s exceeds the {deadline.usable():.0f}s left; using {other}.")
+                model = other
+        return model
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds after which a duplicate request is sent; None while hedging is off or latency unknown."""
+        if LLM_HEDGE_PERCENTILE <= 0:
+            return None
+        threshold = self.latency(model).percentile(LLM_HEDGE_PERCENTILE)
+        return None if threshold is None else max(LLM_HEDGE_MIN_DELAY, threshold)
+
+    async def _timed(self, completion_fn: CompletionFn, client, model: str, messages: list, params: dict) -> str:
+        stats = self.latency(model)
+        stats.calls += 1
+        started = time.monotonic()
+        try:
+            text = await completion_fn(client, model, messages, **params)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.failures += 1
+            raise
+        stats.observe(time.monotonic() - started)
+        return text
+
+    async def _hedged(self, completion_fn: CompletionFn, client, model: str, messages: list, params: dict) -> str:
+        primary = asyncio.ensure_future(self._timed(completion_fn, client, model, messages, params))
+        hedge = None
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay(model)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    log.info(f"{model} call running past {delay:.1f}s; sending a hedged request.")
+                    hedge = asyncio.ensure_future(self._timed(completion_fn, client, model, messages, params))
+                    tasks.add(hedge)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedge is not None:
+                            LLM_HEDGES.inc(model=model, winner="hedge" if task is hedge else "primary")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def complete(self, completion_fn: CompletionFn, client, model: str, messages: list,
+                       deadline: Optional[Deadline] = None, **params) -> str:
+        """Runs `completion_fn(client, model, messages, **params)` with hedging and retries."""
+        retry = 0
+        while True:
+            try:
+                return await self._hedged(completion_fn, client, model, messages, params)
+            except Exception as e:
+                if retry >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = backoff_delay(retry, e)
+                if deadline is not None and delay >= deadline.usable():
+                    raise
+                retry += 1
+                LLM_RETRIES.inc(model=model, reason=str(getattr(e, "status_code", None) or type(e).__name__))
+                log.warning(f"{model} call failed ({e}); retry {retry}/{LLM_MAX_RETRIES} in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+    def wrap(self, completion_fn: CompletionFn, deadline: Optional[Deadline] = None) -> CompletionFn:
+        """`completion_fn` routed through the gateway, for `cached_chat_completion(completion_fn=...)`."""
+        async def gateway_completion(client, model: str, messages: list, **params) -> str:
+            return await self.complete(completion_fn, client, model, messages, deadline=deadline, **params)
+        return gateway_completion
+
+    def latency_quantiles(self) -> dict:
+        """Gauge values: p50/p90/p99 latency per model with enough samples."""
+        values = {}
+        for model, stats in self._latency.items():
+            for q in (0.5, 0.9, 0.99):
+                value = stats.percentile(q)
+                if value is not None:
+                    values[label_key(model=model, quantile=str(q))] = round(value, 3)
+        return values
+
+
+_llm_gateway = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
+
+
+register_gauge("agent_llm_latency_seconds", "Recent LLM call latency quantiles per model.",
+               lambda: _llm_gateway.latency_quantiles() if _llm_gateway else {})
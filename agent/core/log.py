@@ -0,0 +1,178 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import reprlib
+import sys
+import time
+from typing import Optional
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line) or "text" (human-readable, for local runs)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+# Longest message or field value written; the rest is replaced by a marker
+LOG_MAX_FIELD_CHARS = int(os.environ.get("LOG_MAX_FIELD_CHARS", "2000"))
+# Fraction of DEBUG records kept (INFO and above are never sampled)
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+# Records waiting for the writer thread; further records are dropped, never blocking
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+_job_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("log_job_id", default=None)
+_task_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("log_task_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a component tag such as "SOLVER" or "TOOL"."""
+    return logging.getLogger(f"agent.{name.lower()}")
+
+
+def bind_job(job_id: Optional[str]) -> contextvars.Token:
+    """Tags records of the current task (and tasks it spawns) with `job_id`."""
+    return _job_id.set(job_id)
+
+
+def unbind_job(token: contextvars.Token):
+    _job_id.reset(token)
+
+
+def bind_task(task_id: Optional[str]) -> contextvars.Token:
+    return _task_id.set(task_id)
+
+
+def unbind_task(token: contextvars.Token):
+    _task_id.reset(token)
+
+
+def _bounded_repr(limit: int) -> reprlib.Repr:
+    bounded = reprlib.Repr()
+    bounded.maxstring = bounded.maxother = limit
+    bounded.maxlist = bounded.maxdict = bounded.maxtuple = bounded.maxset = 20
+    bounded.maxlevel = 4
+    return bounded
+
+
+_repr = _bounded_repr(LOG_MAX_FIELD_CHARS // 2)
+
+
+def truncate(value, limit: int = LOG_MAX_FIELD_CHARS):
+    """
+    Caps strings at `limit` characters. Containers are rendered with a bounded
+    repr, so a huge payload costs the same to log as a small one.
+    """
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = value if isinstance(value, str) else _repr.repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS and key not in ("job_id", "task_id")}
+
+
+class _ContextFilter(logging.Filter):
+    """Runs in the logging coroutine's context: attaches ids and drops unsampled DEBUG records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and random.random() >= LOG_DEBUG_SAMPLE_RATE:
+            return False
+        record.job_id = _job_id.get()
+        record.task_id = _task_id.get()
+        return True
+
+
+class _TruncatingQueueHandler(logging.handlers.QueueHandler):
+    """Caps the message and extra fields before enqueuing, and drops records instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+        record = logging.makeLogRecord(vars(record))
+        record.msg = truncate(message, LOG_MAX_FIELD_CHARS * 4 if record.exc_info else LOG_MAX_FIELD_CHARS)
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        for key, value in _extra_fields(record).items():
+            setattr(record, key, truncate(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name.removeprefix("agent."),
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "job_id", None):
+            payload["job_id"] = record.job_id
+        if getattr(record, "task_id", None):
+            payload["task_id"] = record.task_id
+        payload.update(_extra_fields(record))
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        tag = record.name.removeprefix("agent.").upper()
+        job = f" job={record.job_id[:8]}" if getattr(record, "job_id", None) else ""
+        fields = "".join(f" {key}={value}" for key, value in _extra_fields(record).items())
+        clock = time.strftime("%H:%M:%S", time.localtime(record.created))
+        return f"{clock} [{tag}]{job} {record.getMessage()}{fields}"
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_TruncatingQueueHandler] = None
+
+
+def setup_logging():
+    """Routes all "agent.*" loggers through a bounded queue to a background writer thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JSONFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _queue_handler = _TruncatingQueueHandler(log_queue)
+    _queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger("agent")
+    root.setLevel(LOG_LEVEL)
+    root.handlers = [_queue_handler]
+    root.propagate = False
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flushes queued records and stops the writer thread."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    if _queue_handler.dropped:
+        sys.stderr.write(f"[LOG] Dropped {_queue_handler.dropped} records (queue full).\n")
+    root = logging.getLogger("agent")
+    root.handlers = []
+    root.propagate = True
+    _listener = None
+    _queue_handler = None
@@ -0,0 +1,257 @@
+import contextvars
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# Number of recent job traces kept for the debug endpoint
+TRACE_MAX_JOBS = int(os.environ.get("TRACE_MAX_JOBS", "100"))
+# Spans recorded per job trace before further ones are dropped
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "2000"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+
+
+def label_key(**labels) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _label_key(labels: dict) -> tuple:
+    return label_key(**labels)
+
+
+def _format_labels(key: tuple, extra: Optional[dict] = None) -> str:
+    items = list(key) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    escaped = (
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in items
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+        return lines
+
+
+class Gauge:
+    """A gauge set directly or computed at scrape time by `callback` (returns {label_key(...): value})."""
+
+    def __init__(self, name: str, description: str, callback: Optional[Callable[[], dict]] = None):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        values = dict(self._values)
+        if self.callback is not None:
+            try:
+                values.update(self.callback())
+            except Exception:
+                pass
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def snapshot(self) -> dict:
+        """{labels: (sum, count)} for summaries such as the benchmark report."""
+        return {key: (series[-2], series[-1]) for key, series in self._series.items()}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {series[i]}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, object]" = OrderedDict()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.register(Histogram("agent_span_seconds", "Duration of instrumented phases (supervisor, task, loop, see/think/act, tools, LLM calls)."))
+JOBS_TOTAL = registry.register(Counter("agent_jobs_total", "Finished jobs by final status."))
+JOBS_REJECTED = registry.register(Counter("agent_jobs_rejected_total", "Jobs rejected because the queue was full."))
+JOBS_DEDUPLICATED = registry.register(Counter("agent_jobs_deduplicated_total", "Duplicate /quiz requests served by an existing job, by outcome (attached/cached)."))
+TIMEOUTS_TOTAL = registry.register(Counter("agent_timeouts_total", "Timeouts by scope."))
+LLM_TOKENS = registry.register(Counter("agent_llm_tokens_total", "LLM tokens by direction (estimated when the provider does not report usage)."))
+LLM_PAYLOAD_BYTES = registry.register(Counter("agent_llm_payload_bytes_total", "Bytes of prompt sent to and response received from the LLM."))
+LLM_RETRIES = registry.register(Counter("agent_llm_retries_total", "LLM calls retried after a 429, 5xx or connection error, by model and reason."))
+LLM_HEDGES = registry.register(Counter("agent_llm_hedged_total", "LLM calls that got a hedged duplicate request, by model and which request answered first."))
+LLM_ESCALATIONS = registry.register(Counter("agent_llm_escalations_total", "Solver steps moved from the fast to the strong model, by reason."))
+TOOL_CALLS = registry.register(Counter("agent_tool_calls_total", "Tool calls by tool and outcome."))
+
+
+def register_gauge(name: str, description: str, callback: Callable[[], dict]) -> Gauge:
+    """Registers a gauge computed at scrape time (e.g. pool or cache stats)."""
+    return registry.register(Gauge(name, description, callback))
+
+
+def register_stats_gauge(name: str, description: str, stats_fn: Callable[[], Optional[dict]]) -> Gauge:
+    """Exposes the numeric fields of a component's `stats` dict as `name{stat="..."}`."""
+    def collect() -> dict:
+        stats = stats_fn() or {}
+        return {label_key(stat=k): v for k, v in stats.items() if isinstance(v, (int, float))}
+    return register_gauge(name, description, collect)
+
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, sent_bytes: int, received_bytes: int):
+    LLM_TOKENS.inc(prompt_tokens, model=model, direction="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, direction="completion")
+    LLM_PAYLOAD_BYTES.inc(sent_bytes, direction="sent")
+    LLM_PAYLOAD_BYTES.inc(received_bytes, direction="received")
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+class JobTrace:
+    """Ordered list of spans recorded for one job."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: list[dict] = []
+        self.dropped = 0
+
+    def add(self, name: str, start: float, duration: float, depth: int, attrs: dict):
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append({
+            "name": name,
+            "start": round(start - self._origin, 4),
+            "duration": round(duration, 4),
+            "depth": depth,
+            **({"attrs": attrs} if attrs else {}),
+        })
+
+    def to_dict(self) -> dict:
+        # Spans are recorded when they end; report them in start order
+        spans = sorted(self.spans, key=lambda item: item["start"])
+        return {"job_id": self.job_id, "started_at": self.started_at, "dropped_spans": self.dropped, "spans": spans}
+
+
+_traces: "OrderedDict[str, JobTrace]" = OrderedDict()
+_current_trace: contextvars.ContextVar[Optional[JobTrace]] = contextvars.ContextVar("agent_trace", default=None)
+_span_depth: contextvars.ContextVar[int] = contextvars.ContextVar("agent_span_depth", default=0)
+
+
+def start_trace(job_id: str) -> JobTrace:
+    """Starts recording spans of the current task (and tasks it spawns) under `job_id`."""
+    trace = JobTrace(job_id)
+    _traces[job_id] = trace
+    while len(_traces) > TRACE_MAX_JOBS:
+        _traces.popitem(last=False)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace():
+    """Stops attributing spans of the current task to a job."""
+    _current_trace.set(None)
+
+
+def get_trace(job_id: str) -> Optional[JobTrace]:
+    return _traces.get(job_id)
+
+
+class span:
+    """
+    Times a block, records it in `agent_span_seconds{span=...}` and in the
+    current job trace. Usable as `with span(...)` or `async with span(...)`;
+    attributes can be added while the span is open via `set(...)`.
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._start = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._token = _span_depth.set(_span_depth.get() + 1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        depth = _span_depth.get() - 1
+        _span_depth.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        SPAN_SECONDS.observe(duration, span=self.name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.name, self._start, duration, depth, self.attrs)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
@@ -0,0 +1,162 @@
+import difflib
+import os
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+# Upper bound on tokens spent on page content per prompt (~4 chars per token)
+PAGE_TOKEN_BUDGET = int(os.environ.get("PAGE_TOKEN_BUDGET", "6000"))
+# Similarity above which only a diff against the previous snapshot is sent
+PAGE_DIFF_THRESHOLD = float(os.environ.get("PAGE_DIFF_THRESHOLD", "0.6"))
+
+CHARS_PER_TOKEN = 4
+
+# Elements whose content never helps the agent
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "head", "iframe", "object", "canvas"}
+# Elements the agent can act on or read data from; always kept as tags
+_KEEP_TAGS = {"a", "button", "input", "select", "option", "textarea", "form", "label", "img", "audio", "video", "source"}
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "footer", "nav", "aside", "ul", "ol", "li",
+    "table", "thead", "tbody", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "br", "hr", "form",
+    "blockquote", "dl", "dt", "dd", "details", "summary",
+}
+_CELL_TAGS = {"td", "th"}
+# HTML void elements: never closed, so they must not open a nesting level
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+}
+_KEEP_ATTRS = ("id", "name", "class", "href", "src", "type", "value", "placeholder", "action", "method", "alt", "for")
+_JSON_SCRIPT_TYPES = ("application/json", "application/ld+json")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class _Compactor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._open_kept: list[str] = []
+        self._keep_script = False
+
+    def _attrs(self, attrs) -> str:
+        kept = []
+        for name, value in attrs:
+            if name not in _KEEP_ATTRS or value is None:
+                continue
+            if name == "class":
+                value = " ".join(value.split()[:2])
+            if name in ("href", "src") and value.startswith("data:"):
+                value = value[:40] + "..."
+            kept.append(f'{name}="{value}"')
+        return (" " + " ".join(kept)) if kept else ""
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            # Only the skipped element's own tag nests; anything else inside it is dropped unseen
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if tag == "script" and dict(attrs).get("type", "") in _JSON_SCRIPT_TYPES:
+            self._keep_script = True
+            self.parts.append("\n<script type=json>")
+            return
+        if tag in _SKIP_TAGS:
+            self._skip_tag, self._skip_depth = tag, 1
+            return
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag in _CELL_TAGS:
+            self.parts.append(" | ")
+
+        has_id = any(name == "id" and value for name, value in attrs)
+        if tag in _KEEP_TAGS or has_id:
+            self.parts.append(f"<{tag}{self._attrs(attrs)}>")
+            if tag not in _VOID_TAGS:
+                self._open_kept.append(tag)
+        else:
+            self._open_kept.append("")
+
+    def handle_endtag(self, tag):
+        if self._keep_script and tag == "script":
+            self._keep_script = False
+            self.parts.append("</script>\n")
+            return
+        if self._skip_depth:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+            return
+        if tag in _VOID_TAGS:
+            return
+        # Pop up to the matching open element (tolerates unclosed tags)
+        while self._open_kept:
+            kept = self._open_kept.pop()
+            if kept:
+                self.parts.append(f"</{kept}>")
+            if kept == tag or not kept:
+                break
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = re.sub(r"\s+", " ", data)
+        if text.strip():
+            self.parts.append(text)
+
+
+def compact_html(html: str) -> str:
+    """Strips non-content nodes and collapses whitespace, keeping actionable elements and ids."""
+    parser = _Compactor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Malformed markup: fall back to a crude tag strip
+        return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", html)).strip()
+    text = "".join(parser.parts)
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line and line != "|")
+
+
+def fit_to_budget(text: str, token_budget: int) -> str:
+    """Truncates text to roughly `token_budget` tokens, keeping the head and a short tail."""
+    max_chars = token_budget * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * 0.85)
+    tail = max_chars - head
+    dropped = len(text) - head - tail
+    return f"{text[:head]}\n[... {dropped} chars truncated ...]\n{text[-tail:]}"
+
+
+class PageCompactor:
+    """
+    Turns page HTML into prompt text under a token budget.
+    Keeps the previous snapshot so a barely changed page is sent as a diff.
+    """
+
+    def __init__(self, token_budget: int = PAGE_TOKEN_BUDGET, diff_threshold: float = PAGE_DIFF_THRESHOLD):
+        self.token_budget = token_budget
+        self.diff_threshold = diff_threshold
+        self.last_snapshot: Optional[str] = None
+
+    def render(self, html: str) -> str:
+        snapshot = compact_html(html)
+        previous, self.last_snapshot = self.last_snapshot, snapshot
+
+        if previous is not None:
+            if snapshot == previous:
+                return "(Page unchanged since the last snapshot.)"
+            old_lines, new_lines = previous.split("\n"), snapshot.split("\n")
+            matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+            if matcher.ratio() >= self.diff_threshold:
+                diff = "\n".join(difflib.unified_diff(old_lines, new_lines, "previous", "current", n=1, lineterm=""))
+                if len(diff) < len(snapshot):
+                    return fit_to_budget(f"(Page changed slightly; diff against the last snapshot)\n{diff}", self.token_budget)
+
+        return fit_to_budget(snapshot, self.token_budget)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from agent.core.metrics import register_stats_gauge
+from agent.core.page_ready import dom_version
+from agent.core.prefetch import classify_url
+from agent.core.log import get_logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+log = get_logger("INDEX")
+
+PAGE_INDEX_CACHE_SIZE = int(os.environ.get("PAGE_INDEX_CACHE_SIZE", "64"))
+# Instruction text kept in the index (and scanned for submit targets)
+PAGE_INDEX_TEXT_CHARS = int(os.environ.get("PAGE_INDEX_TEXT_CHARS", "20000"))
+# Entries per list shown to the LLM
+PAGE_INDEX_PROMPT_ITEMS = int(os.environ.get("PAGE_INDEX_PROMPT_ITEMS", "15"))
+
+# One pass over the rendered DOM. Submit-target patterns run in the order the
+# old regex scan used, but only over the visible instruction text.
+_INDEX_JS = r"""
+({maxText}) => {
+    const clean = (url) => url.split('#')[0].replace(/[.,;:!?)]+$/, '');
+    const selectorFor = (el) => {
+        const tag = el.tagName.toLowerCase();
+        if (el.id) return '#' + CSS.escape(el.id);
+        if (el.name) return `${tag}[name="${el.name}"]`;
+        const text = (el.innerText || el.value || '').trim().slice(0, 40);
+        if (text && ['button', 'a'].includes(tag)) return `${tag}:has-text("${text.replace(/"/g, '\\"')}")`;
+        return null;
+    };
+
+    const result = document.querySelector('#result');
+    let text = result && result.innerText.trim() ? result.innerText : (document.body ? document.body.innerText : '');
+    text = text.slice(0, maxText);
+
+    const urls = new Set();
+    const links = [];
+    for (const el of document.querySelectorAll('a[href], link[href], source[src], embed[src], iframe[src], object[data]')) {
+        const url = el.href || el.src || el.data;
+        if (!url) continue;
+        urls.add(clean(url));
+        if (el.tagName === 'A') links.push({href: clean(url), text: el.innerText.trim().slice(0, 80)});
+    }
+    for (const match of text.matchAll(/https?:\/\/[^\s"'<>)]+/g)) urls.add(clean(match[0]));
+
+    const forms = [];
+    for (const form of document.querySelectorAll('form')) {
+        forms.push({
+            action: form.action || '',
+            method: (form.method || 'get').toLowerCase(),
+            inputs: Array.from(form.querySelectorAll('input, select, textarea, button')).map(el => ({
+                tag: el.tagName.toLowerCase(), type: el.type || '', name: el.name || '', selector: selectorFor(el),
+            })),
+        });
+    }
+
+    const selectors = [];
+    for (const el of document.querySelectorAll('input, select, textarea, button, [onclick], [role=button]')) {
+        const selector = selectorFor(el);
+        if (selector && !selectors.includes(selector)) selectors.push(selector);
+    }
+
+    const submitTargets = [];
+    const patterns = [
+        /post\s+(?:your\s+)?answer\s+to\s+(https?:\/\/[^\s<>"')]+)/gi,
+        /post\s+to\s+(https?:\/\/[^\s<>"')]+)/gi,
+        /submit\s+(?:to\s+)?(https?:\/\/[^\s<>"')]+)/gi,
+        /(?:post|submit)[\s\S]{0,100}?(https?:\/\/[^\s<>"')]+)/gi,
+    ];
+    for (const pattern of patterns) {
+        for (const match of text.matchAll(pattern)) {
+            const url = clean(match[1]);
+            if (!submitTargets.includes(url)) submitTargets.push(url);
+        }
+    }
+    for (const form of forms) {
+        if (form.method === 'post' && form.action && !submitTargets.includes(form.action)) submitTargets.push(form.action);
+    }
+
+    return {url: location.href, title: document.title, text, links, forms, urls: Array.from(urls), selectors, submitTargets};
+}
+"""
+
+
+class PageIndex:
+    """Structured view of one rendered DOM version (links, forms, data URLs, submit targets, text)."""
+
+    def __init__(self, data: dict):
+        self.url: str = data.get("url", "")
+        self.title: str = data.get("title", "")
+        self.text: str = data.get("text", "")
+        self.links: list[dict] = data.get("links", [])
+        self.forms: list[dict] = data.get("forms", [])
+        self.urls: list[str] = data.get("urls", [])
+        self.selectors: list[str] = data.get("selectors", [])
+        self.submit_targets: list[str] = data.get("submitTargets", [])
+        self.data_urls: list[tuple[str, str]] = [(url, kind) for url in self.urls if (kind := classify_url(url))]
+
+    @property
+    def submit_url(self) -> Optional[str]:
+        return self.submit_targets[0] if self.submit_targets else None
+
+    def summary(self, max_items: int = PAGE_INDEX_PROMPT_ITEMS) -> str:
+        """Short text block for the prompt; empty when there is nothing worth listing."""
+        lines = []
+        if self.submit_targets:
+            lines.append("Submit targets: " + ", ".join(self.submit_targets[:3]))
+        if self.data_urls:
+            lines.append("Data files / APIs:")
+            lines += [f"- {url} ({kind})" for url, kind in self.data_urls[:max_items]]
+        for form in self.forms[:3]:
+            fields = ", ".join(f"{field['selector'] or field['tag']} ({field['type'] or field['tag']})"
+                               for field in form["inputs"][:max_items])
+            lines.append(f"Form {form['method'].upper()} {form['action'] or '(no action)'}: {fields}")
+        if self.selectors:
+            lines.append("Interactive elements: " + ", ".join(self.selectors[:max_items]))
+        return "\n".join(lines)
+
+
+class PageIndexCache:
+    """LRU of page indexes keyed by URL plus DOM version, so an unchanged page is indexed once."""
+
+    def __init__(self, max_entries: int = PAGE_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, PageIndex]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    async def get(self, page: Page) -> Optional[PageIndex]:
+        """Returns the index of the current DOM, building it on a miss (None if the page cannot be read)."""
+        key = await dom_version(page)
+        if key is not None and key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        try:
+            index = PageIndex(await page.evaluate(_INDEX_JS, {"maxText": PAGE_INDEX_TEXT_CHARS}))
+        except Exception as e:
+            log.warning(f"Page indexing failed: {e}")
+            return None
+        if key is not None:
+            self._entries[key] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+_page_index_cache = None
+
+
+def get_page_index_cache() -> PageIndexCache:
+    global _page_index_cache
+    if _page_index_cache is None:
+        _page_index_cache = PageIndexCache()
+    return _page_index_cache
+
+
+register_stats_gauge("agent_page_index_cache", "Page index cache counters.", lambda: _page_index_cache and _page_index_cache.stats)
+
+
+async def index_page(page: Page) -> Optional[PageIndex]:
+    """Returns the (cached) index of the page's current DOM."""
+    return await get_page_index_cache().get(page)
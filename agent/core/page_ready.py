@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Optional
+
+from agent.core.log import get_logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+log = get_logger("READY")
+
+# The DOM counts as settled after this long without mutations
+PAGE_SETTLE_MS = int(os.environ.get("PAGE_SETTLE_MS", "150"))
+# Upper bound on any readiness wait
+PAGE_READY_TIMEOUT_MS = int(os.environ.get("PAGE_READY_TIMEOUT_MS", "3000"))
+
+# Resolves once no mutation has happened for settleMs (or after timeoutMs)
+_QUIESCENCE_JS = """
+({settleMs, timeoutMs}) => new Promise(resolve => {
+    const start = performance.now();
+    let timer = null;
+    let hardStop = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => finish('quiet'), settleMs);
+    });
+    const finish = (reason) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(hardStop);
+        resolve({reason, elapsed: Math.round(performance.now() - start)});
+    };
+    observer.observe(document.documentElement || document, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+    timer = setTimeout(() => finish('quiet'), settleMs);
+    hardStop = setTimeout(() => finish('timeout'), timeoutMs);
+})
+"""
+
+# Installs (once per document) a mutation counter and returns "<document id>:<version>"
+_DOM_VERSION_JS = """
+() => {
+    if (!window.__agentDom) {
+        const state = {id: Math.random().toString(36).slice(2), version: 0};
+        new MutationObserver(() => { state.version++; }).observe(document.documentElement || document, {
+            childList: true, subtree: true, attributes: true, characterData: true
+        });
+        window.__agentDom = state;
+    }
+    return window.__agentDom.id + ':' + window.__agentDom.version;
+}
+"""
+
+
+async def wait_for_dom_quiescent(page: Page, settle_ms: int = PAGE_SETTLE_MS,
+                                 timeout_ms: int = PAGE_READY_TIMEOUT_MS) -> str:
+    """
+    Returns as soon as the DOM has gone `settle_ms` without mutations.
+    Survives a navigation racing the wait by waiting for the new document once.
+    """
+    last_error = None
+    for _ in range(2):
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            result = await page.evaluate(_QUIESCENCE_JS, {"settleMs": settle_ms, "timeoutMs": timeout_ms})
+            return result.get("reason", "quiet")
+        except Exception as e:
+            # Typically "Execution context was destroyed" because the page navigated
+            last_error = e
+    log.warning(f"Quiescence wait failed: {last_error}")
+    return "error"
+
+
+async def dom_version(page: Page) -> Optional[str]:
+    """Identifies the current document and how many mutations it has seen."""
+    try:
+        return f"{page.url}|{await page.evaluate(_DOM_VERSION_JS)}"
+    except Exception:
+        return None
+
+
+class PageReadiness:
+    """
+    Decides how long the See phase has to wait.
+    If the last action did not touch the page and the DOM has not mutated since
+    the last snapshot, no wait is needed; otherwise wait for DOM quiescence.
+    """
+
+    def __init__(self):
+        self._version: Optional[str] = None
+
+    async def observe(self, page: Page):
+        """Records the DOM version that the agent has just seen."""
+        self._version = await dom_version(page)
+
+    async def wait(self, page: Page, touched_page: bool) -> bool:
+        """Waits until the page is ready; returns False if nothing changed and no wait happened."""
+        if not touched_page:
+            current = await dom_version(page)
+            if current is not None and current == self._version:
+                return False
+        reason = await wait_for_dom_quiescent(page)
+        log.debug(f"Page settled ({reason}).")
+        await self.observe(page)
+        return True
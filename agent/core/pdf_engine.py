@@ -0,0 +1,178 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from agent.core.download_cache import get_download_cache, CacheEntry
+from agent.core.table_store import ingest_rows
+from agent.core.log import get_logger
+
+log = get_logger("PDF")
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages returned when the agent does not ask for a range
+PDF_DEFAULT_PAGES = int(os.environ.get("PDF_DEFAULT_PAGES", "10"))
+# Upper bound on pages extracted in a single tool call
+PDF_MAX_PAGES_PER_CALL = int(os.environ.get("PDF_MAX_PAGES_PER_CALL", "50"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Get or create the process pool used for PDF parsing."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, PDF_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_pdf_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def parse_page_range(spec, page_count: int) -> list[int]:
+    """
+    Turns a page spec into sorted 1-based page numbers within the document.
+    Accepts "5", "3-7", "1-3,10", "40-" or a list of ints; None means the first pages.
+    """
+    if spec is None or spec == "":
+        return list(range(1, min(page_count, PDF_DEFAULT_PAGES) + 1))
+    if isinstance(spec, int):
+        spec = str(spec)
+    parts = spec if isinstance(spec, list) else str(spec).split(",")
+
+    pages = set()
+    for part in parts:
+        part = str(part).strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, _, end = part.partition("-")
+            start = int(start) if start.strip() else 1
+            end = int(end) if end.strip() else page_count
+            pages.update(range(max(1, start), min(end, page_count) + 1))
+        else:
+            number = int(part)
+            if 1 <= number <= page_count:
+                pages.add(number)
+    return sorted(pages)[:PDF_MAX_PAGES_PER_CALL]
+
+
+def _count_pages(path: str) -> int:
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_pages(path: str, page_numbers: list[int], tables: bool) -> list[dict]:
+    """Runs in a worker process: extracts text (and optionally tables) for the given pages."""
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(path) as pdf:
+        for number in page_numbers:
+            page = pdf.pages[number - 1]
+            result = {"page": number, "text": page.extract_text() or ""}
+            if tables:
+                result["tables"] = page.extract_tables()
+            results.append(result)
+    return results
+
+
+def _format_table(table: list) -> str:
+    return "\n".join(",".join("" if cell is None else str(cell) for cell in row) for row in table)
+
+
+def _table_part(page: int, index: int) -> str:
+    return f"p{page}t{index + 1}"
+
+
+def _store_tables(directory: str, sha256: str, results: list[dict]) -> dict[str, str]:
+    """Stores every extracted table in the table store; returns part -> handle."""
+    handles = {}
+    for result in results:
+        for i, table in enumerate(result.get("tables") or []):
+            part = _table_part(result["page"], i)
+            try:
+                handle = ingest_rows(directory, sha256, part, table)
+            except Exception as e:
+                log.warning(f"Could not store table {part}: {e}")
+                continue
+            if handle:
+                handles[part] = handle
+    return handles
+
+
+def _format_page(result: dict, handles: dict[str, str]) -> str:
+    text = f"--- Page {result['page']} ---\n{result['text']}\n"
+    for i, table in enumerate(result.get("tables") or []):
+        handle = handles.get(_table_part(result["page"], i))
+        label = f"[Table {i+1}] (load_table('{handle}'))" if handle else f"[Table {i+1}]"
+        text += f"{label}\n{_format_table(table)}\n"
+    return text
+
+
+async def extract_pdf(entry: CacheEntry, pages=None, tables: bool = False) -> str:
+    """
+    Extracts the requested pages of a cached PDF off the event loop.
+    Pages are split across the process pool and each parsed page is cached by
+    content hash, so later calls only parse pages they have not seen. With
+    `tables`, each table is also stored in the table store under a handle.
+    """
+    cache = get_download_cache()
+    loop = asyncio.get_running_loop()
+    executor = get_pdf_executor()
+
+    count_key = "pdf:page_count"
+    cached_count = cache.get_extraction(entry.sha256, count_key)
+    if cached_count is not None:
+        page_count = int(cached_count)
+    else:
+        page_count = await loop.run_in_executor(executor, _count_pages, entry.path)
+        cache.put_extraction(entry.sha256, count_key, str(page_count))
+
+    page_numbers = parse_page_range(pages, page_count)
+    if not page_numbers:
+        return f"PDF has {page_count} pages. Requested pages '{pages}' are out of range."
+
+    results: dict[int, dict] = {}
+    missing = []
+    for number in page_numbers:
+        cached = cache.get_extraction(entry.sha256, f"pdf:page:{number}:{tables}")
+        if cached is not None:
+            results[number] = json.loads(cached)
+        else:
+            missing.append(number)
+
+    if missing:
+        log.info(f"Parsing {len(missing)} page(s) of {entry.path} across {PDF_WORKERS} worker(s)...")
+        workers = max(1, min(PDF_WORKERS, len(missing)))
+        chunks = [missing[i::workers] for i in range(workers)]
+        parsed = await asyncio.gather(*(
+            loop.run_in_executor(executor, _extract_pages, entry.path, chunk, tables)
+            for chunk in chunks
+        ))
+        for chunk_results in parsed:
+            for result in chunk_results:
+                results[result["page"]] = result
+                cache.put_extraction(entry.sha256, f"pdf:page:{result['page']}:{tables}", json.dumps(result))
+
+    header = f"PDF '{entry.path}' has {page_count} pages. Showing pages {page_numbers[0]}-{page_numbers[-1]}"
+    if len(page_numbers) != page_numbers[-1] - page_numbers[0] + 1:
+        header = f"PDF '{entry.path}' has {page_count} pages. Showing pages {', '.join(map(str, page_numbers))}"
+    handles = {}
+    if tables:
+        handles = await asyncio.to_thread(
+            _store_tables, cache.extract_dir, entry.sha256, [results[number] for number in page_numbers]
+        )
+    body = "".join(_format_page(results[number], handles) for number in page_numbers)
+    return f"{header}.\n{body}"
@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import os
+import re
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from agent.core.download_cache import fetch_to_cache, DOWNLOAD_MAX_BYTES
+from agent.core.log import get_logger
+
+log = get_logger("PREFETCH")
+
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "1").lower() in ("1", "true", "yes")
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", "3"))
+# Total bytes a single task may prefetch
+PREFETCH_MAX_BYTES = int(os.environ.get("PREFETCH_MAX_BYTES", str(64 * 1024 * 1024)))
+PREFETCH_MAX_URLS = int(os.environ.get("PREFETCH_MAX_URLS", "10"))
+# Prefetched results older than this are not served
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL", "120"))
+
+DATA_EXTENSIONS = (".pdf", ".csv", ".tsv", ".json", ".txt", ".xlsx", ".xls", ".xml", ".parquet")
+_API_PATTERN = re.compile(r"/api(/|$)|[?&](format|output)=json", re.IGNORECASE)
+_SKIP_PATTERN = re.compile(r"submit|logout|delete", re.IGNORECASE)
+
+# Prefetcher of the task running in this context; tools pick up its results through it,
+# so one task (or job) is never served another's prefetched data
+_current: contextvars.ContextVar[Optional["Prefetcher"]] = contextvars.ContextVar("prefetcher", default=None)
+
+
+def classify_url(url: str) -> Optional[str]:
+    """Returns "file" for data files, "api" for API-looking URLs, None otherwise."""
+    url = url.rstrip(".,;:!?)")
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or _SKIP_PATTERN.search(parsed.path):
+        return None
+    if parsed.path.lower().endswith(DATA_EXTENSIONS):
+        return "file"
+    if _API_PATTERN.search(url):
+        return "api"
+    return None
+
+
+def take_prefetched(url: str, kind: str) -> Optional[asyncio.Task]:
+    """Returns the current task's prefetch of `url` if it was started recently and did not fail."""
+    prefetcher = _current.get()
+    return prefetcher.take(url, kind) if prefetcher is not None else None
+
+
+def bind_prefetcher(prefetcher: "Prefetcher") -> contextvars.Token:
+    return _current.set(prefetcher)
+
+
+def unbind_prefetcher(token: contextvars.Token):
+    _current.reset(token)
+
+
+class Prefetcher:
+    """
+    Speculatively downloads and parses data links found on a task page while
+    the LLM is thinking. Bounded by a concurrency limit, a URL count and a
+    total byte budget; results are served by tool_read_file / tool_call_api
+    running under `bind_prefetcher`. One per task: results are dropped by `cancel`.
+    Each download reserves its byte cap before it starts (an equal share of the
+    budget per concurrent fetch), so parallel fetches cannot overrun the budget.
+    """
+
+    def __init__(self, concurrency: int = PREFETCH_CONCURRENCY, max_bytes: int = PREFETCH_MAX_BYTES,
+                 max_urls: int = PREFETCH_MAX_URLS):
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.max_bytes = max_bytes
+        self.max_urls = max_urls
+        self.bytes_used = 0
+        self._reserved = 0
+        self._share = max(1, max_bytes // max(1, concurrency))
+        self._seen: set[str] = set()
+        # url -> (started_at, kind, task)
+        self._store: dict[str, tuple[float, str, asyncio.Task]] = {}
+
+    def take(self, url: str, kind: str) -> Optional[asyncio.Task]:
+        item = self._store.get(url)
+        if item is None:
+            return None
+        started_at, stored_kind, task = item
+        if stored_kind != kind or time.time() - started_at > PREFETCH_TTL or task.cancelled():
+            return None
+        if task.done() and task.exception() is not None:
+            return None
+        return task
+
+    def start(self, index):
+        """Starts background fetches for the data links of a PageIndex that were not seen before."""
+        if not PREFETCH_ENABLED or index is None:
+            return
+        for url, kind in index.data_urls:
+            if url in self._seen or len(self._seen) >= self.max_urls:
+                continue
+            self._seen.add(url)
+            log.info(f"Prefetching {kind}: {url}")
+            task = asyncio.ensure_future(self._fetch(url, kind))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._store[url] = (time.time(), kind, task)
+
+    async def _fetch(self, url: str, kind: str) -> str:
+        # Imported here: tools imports this module
+        from agent.core.tools import tool_read_file, tool_call_api
+
+        async with self._semaphore:
+            if kind == "api":
+                result = await tool_call_api(url, use_prefetch=False)
+                if result.startswith("Error"):
+                    raise RuntimeError(result)
+                return result
+            reserve = min(self.max_bytes - self.bytes_used - self._reserved, self._share, DOWNLOAD_MAX_BYTES)
+            if reserve <= 0:
+                raise RuntimeError("Prefetch byte budget exhausted.")
+            self._reserved += reserve
+            try:
+                entry = await fetch_to_cache(url, max_bytes=reserve)
+                self.bytes_used += entry.size
+            finally:
+                self._reserved -= reserve
+            # The download is fresh in the cache now; this only runs (and caches) the parse
+            result = await tool_read_file(url, use_prefetch=False)
+            if result.startswith("Error"):
+                raise RuntimeError(result)
+            return result
+
+    def cancel(self):
+        """Stops prefetches that have not finished and drops the results (called when the task ends)."""
+        for _, _, task in self._store.values():
+            if not task.done():
+                task.cancel()
+        self._store = {}
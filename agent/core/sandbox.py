@@ -0,0 +1,327 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from typing import Optional
+
+from agent.core.metrics import register_stats_gauge, TIMEOUTS_TOTAL
+from agent.core.log import get_logger
+
+log = get_logger("SANDBOX")
+
+# Warm worker processes kept ready for run_python_code
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", "2"))
+# Hard wall-clock limit per snippet; the worker is killed and replaced when exceeded
+SANDBOX_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", "30"))
+# Address-space limit per worker process (0 disables)
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", "1024"))
+# Captured stdout/stderr returned per call
+SANDBOX_MAX_OUTPUT = int(os.environ.get("SANDBOX_MAX_OUTPUT", "20000"))
+SANDBOX_PRELOAD = ("pandas", "numpy", "matplotlib", "matplotlib.pyplot", "json", "re", "math")
+
+
+def _worker_main(conn, memory_mb: int, max_output: int, table_dir: str):
+    """Entry point of a sandbox process: preloads libraries, then executes snippets sent over `conn`."""
+    # One BLAS/OpenMP thread: per-thread buffers reserved by OpenBLAS on many-core hosts
+    # can exceed the address-space limit while numpy is being imported
+    for variable in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = "1"
+
+    import builtins
+    import functools
+    import importlib
+    import io
+    import sys
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+
+    from agent.core.table_store import load_table
+
+    if memory_mb:
+        try:
+            import resource
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    for name in SANDBOX_PRELOAD:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            log.debug(f"Sandbox worker skipped preloading {name} (not installed)")
+        except Exception as e:
+            # E.g. MemoryError under the address-space limit: the worker still serves snippets
+            log.warning(f"Sandbox worker could not preload {name}: {e!r}")
+
+    namespaces: dict[str, dict] = {}
+    conn.send({"ready": True})
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        for namespace_id in message.get("drop", ()):
+            namespaces.pop(namespace_id, None)
+
+        namespace_id = message.get("namespace")
+        fresh = {
+            "__builtins__": builtins,
+            "__name__": "__main__",
+            # Tables parsed by read_file, memory-mapped by handle
+            "load_table": functools.partial(load_table, directory=table_dir),
+        }
+        isolated_globals = namespaces.setdefault(namespace_id, fresh) if namespace_id else fresh
+
+        code_out = io.StringIO()
+        error = None
+        try:
+            with redirect_stdout(code_out), redirect_stderr(code_out):
+                exec(message["code"], isolated_globals)
+        except BaseException as e:
+            error = f"{e}\n{traceback.format_exc()}"
+        finally:
+            if "matplotlib.pyplot" in sys.modules:
+                sys.modules["matplotlib.pyplot"].close("all")
+
+        conn.send({"output": code_out.getvalue()[:max_output], "error": error})
+
+
+class _SandboxWorker:
+    def __init__(self, ctx, table_dir: str):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, SANDBOX_MEMORY_MB, SANDBOX_MAX_OUTPUT, table_dir),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.namespaces: set[str] = set()
+        self.pending_drops: list[str] = []
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            if not self.conn.poll(timeout):
+                return False
+            return bool(self.conn.recv().get("ready"))
+        except (EOFError, OSError):
+            return False
+
+    def call(self, message: dict, timeout: float) -> Optional[dict]:
+        """Blocking round-trip; returns None when the worker misses the deadline."""
+        self.conn.send(message)
+        if not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        finally:
+            self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of pre-started Python worker processes for run_python_code.
+    Each snippet runs in a separate process with its own stdout capture, a hard
+    wall-clock limit and a memory limit. A `namespace` id keeps globals alive
+    between calls of the same task; it is pinned to the worker that holds it.
+    Snippets can call `load_table(handle)` to open tables stored by read_file.
+    """
+
+    def __init__(self, size: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: list[_SandboxWorker] = []
+        self._busy: set[_SandboxWorker] = set()
+        self._affinity: dict[str, _SandboxWorker] = {}
+        self._cond = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        # Replacements for dead workers being spawned in the background
+        self._replacements: set[asyncio.Task] = set()
+        self._pending_spawns = 0
+        # Imported here: worker processes import this module and do not need the HTTP stack
+        from agent.core.download_cache import get_download_cache
+        self.table_dir = os.path.abspath(get_download_cache().extract_dir)
+
+    @property
+    def stats(self) -> dict:
+        return {"workers": len(self._workers), "busy": len(self._busy), "namespaces": len(self._affinity)}
+
+    def _spawn_blocking(self) -> _SandboxWorker:
+        worker = _SandboxWorker(self._ctx, self.table_dir)
+        if not worker.wait_ready(120):
+            worker.kill()
+            raise RuntimeError("Sandbox worker failed to start.")
+        return worker
+
+    async def start(self):
+        """
+        Spawns the workers. Workers that started are kept even if others failed;
+        when none started the pool stays unstarted and the error is raised.
+        """
+        async with self._start_lock:
+            if self._started:
+                return
+            log.info(f"Starting {self.size} Python workers...")
+            results = await asyncio.gather(*(asyncio.to_thread(self._spawn_blocking) for _ in range(self.size)),
+                                           return_exceptions=True)
+            workers = [result for result in results if isinstance(result, _SandboxWorker)]
+            errors = [result for result in results if not isinstance(result, _SandboxWorker)]
+            if not workers:
+                raise errors[0]
+            if errors:
+                log.warning(f"Only {len(workers)} of {self.size} Python workers started: {errors[0]}")
+            self._workers.extend(workers)
+            self._started = True
+        async with self._cond:
+            self._cond.notify_all()
+
+    async def stop(self):
+        # Replacements still spawning are not cancelled (the thread would leak the process);
+        # they see the pool stopped and kill their worker when it comes up
+        for worker in self._workers:
+            worker.kill()
+        self._workers = []
+        self._busy.clear()
+        self._affinity.clear()
+        self._started = False
+        log.info("Stopped.")
+
+    async def _acquire(self, namespace: Optional[str], timeout: float) -> _SandboxWorker:
+        """Waits up to `timeout` seconds for a worker; raises asyncio.TimeoutError when none frees up."""
+        expires = time.monotonic() + timeout
+        async with self._cond:
+            while True:
+                if not self._workers and not self._pending_spawns:
+                    raise RuntimeError("No Python workers are running.")
+                worker = self._affinity.get(namespace) if namespace else None
+                if worker is not None:
+                    if worker not in self._busy:
+                        break
+                else:
+                    idle = [w for w in self._workers if w not in self._busy]
+                    if idle:
+                        worker = min(idle, key=lambda w: len(w.namespaces))
+                        break
+                # Cancelling the wait leaves the worker unclaimed, so nothing leaks on timeout
+                await asyncio.wait_for(self._cond.wait(), timeout=max(0.0, expires - time.monotonic()))
+            self._busy.add(worker)
+            if namespace:
+                self._affinity[namespace] = worker
+                worker.namespaces.add(namespace)
+            return worker
+
+    async def _release(self, worker: _SandboxWorker, dead: bool):
+        """Returns a worker to the pool; a dead one is dropped at once and replaced in the background."""
+        async with self._cond:
+            self._busy.discard(worker)
+            if dead:
+                for namespace in worker.namespaces:
+                    self._affinity.pop(namespace, None)
+                if worker in self._workers:
+                    self._workers.remove(worker)
+                self._pending_spawns += 1
+            self._cond.notify_all()
+        if dead:
+            # Killing is quick; the replacement (which imports pandas) must not hold up the caller
+            worker.kill()
+            task = asyncio.ensure_future(self._replace())
+            self._replacements.add(task)
+            task.add_done_callback(self._replacements.discard)
+
+    async def _replace(self):
+        replacement = None
+        try:
+            replacement = await asyncio.to_thread(self._spawn_blocking)
+        except Exception as e:
+            log.error(f"Could not replace worker: {e}")
+        async with self._cond:
+            self._pending_spawns -= 1
+            if replacement is not None:
+                if self._started:
+                    self._workers.append(replacement)
+                else:
+                    replacement.kill()  # The pool was stopped meanwhile
+            self._cond.notify_all()
+
+    def drop_namespace(self, namespace: str):
+        """Forgets a task's namespace; the worker frees it with its next call."""
+        worker = self._affinity.pop(namespace, None)
+        if worker is not None:
+            worker.namespaces.discard(namespace)
+            worker.pending_drops.append(namespace)
+
+    async def run(self, code: str, namespace: Optional[str] = None, timeout: Optional[float] = None) -> dict:
+        """
+        Executes `code` in a worker and returns {"output", "error"}.
+        `timeout` covers both waiting for a free worker and running the code.
+        On timeout or crash the worker is replaced and its namespaces are lost.
+        """
+        if not self._started:
+            await self.start()
+        timeout = timeout or self.timeout
+        acquire_started = time.monotonic()
+        try:
+            worker = await self._acquire(namespace, timeout)
+        except asyncio.TimeoutError:
+            TIMEOUTS_TOTAL.inc(scope="sandbox")
+            return {"output": "", "error": f"No Python worker became free within {timeout:.0f}s."}
+        timeout = max(0.5, timeout - (time.monotonic() - acquire_started))
+        message = {"code": code, "namespace": namespace, "drop": worker.pending_drops}
+        worker.pending_drops = []
+        dead = False
+        try:
+            reply = await asyncio.to_thread(worker.call, message, timeout)
+            if reply is None:
+                dead = True
+                TIMEOUTS_TOTAL.inc(scope="sandbox")
+                return {"output": "", "error": f"Execution timed out after {timeout:.0f}s; the sandbox was reset."}
+            return reply
+        except (EOFError, OSError) as e:
+            dead = True
+            return {"output": "", "error": f"Sandbox worker crashed ({e}); it was restarted and variables were lost."}
+        except BaseException:
+            # Cancelled mid-call: the worker may still be running the snippet
+            dead = True
+            raise
+        finally:
+            await self._release(worker, dead)
+
+
+_sandbox_pool = None
+
+
+async def start_sandbox_pool() -> SandboxPool:
+    """Creates and warms the app-wide sandbox pool (called from the app lifespan)."""
+    global _sandbox_pool
+    if _sandbox_pool is None:
+        _sandbox_pool = SandboxPool()
+    await _sandbox_pool.start()
+    return _sandbox_pool
+
+
+async def stop_sandbox_pool():
+    global _sandbox_pool
+    if _sandbox_pool is not None:
+        await _sandbox_pool.stop()
+        _sandbox_pool = None
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Returns the app-wide pool; it starts its workers on first use if the lifespan did not."""
+    global _sandbox_pool
+    if _sandbox_pool is None:
+        _sandbox_pool = SandboxPool()
+    return _sandbox_pool
+
+
+register_stats_gauge("agent_sandbox_pool", "Sandbox worker pool usage.", lambda: _sandbox_pool and _sandbox_pool.stats)
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from agent.core.job_store import Job, JobStore, create_job_store, new_worker_id, JOB_LEASE_SECONDS
+from agent.core.metrics import JOBS_REJECTED, JOBS_DEDUPLICATED, JOBS_TOTAL, TIMEOUTS_TOTAL, start_trace, end_trace
+from agent.core.log import get_logger, bind_job, unbind_job
+
+log = get_logger("SCHEDULER")
+
+# Number of jobs allowed to run at the same time (per process)
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+# Jobs allowed to wait for a free slot before /quiz starts rejecting
+JOB_QUEUE_DEPTH = int(os.environ.get("JOB_QUEUE_DEPTH", "8"))
+# How long finished jobs stay visible at GET /jobs/{id}
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "3600"))
+# Lease renewal interval of a running job
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 3)))
+# A request repeating a chain that completed ("done") this recently gets that job back instead of a new run
+JOB_DEDUPE_WINDOW_SECONDS = float(os.environ.get("JOB_DEDUPE_WINDOW_SECONDS", "60"))
+# How often idle workers look for jobs submitted through other processes
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+
+JobRunner = Callable[[Job], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot admit another job."""
+
+
+class JobFailed(Exception):
+    """Raised by a runner for a job that ended without success; recorded as failed, without a traceback."""
+
+
+class JobScheduler:
+    """
+    Bounded job scheduler over a shared JobStore.
+    A fixed number of worker coroutines claim jobs from the store, so several
+    processes (uvicorn workers, containers) can serve one queue. A running job's
+    lease is renewed by a heartbeat; when a process dies, its jobs are claimed
+    again after the lease expires and resume from their last checkpoint.
+    `submit` raises QueueFullError instead of piling up unbounded work.
+    Store calls go through `JobStore.call`, so a SQLite write lock held by another
+    process never stalls the event loop.
+    """
+
+    def __init__(self, runner: JobRunner, concurrency: int = JOB_CONCURRENCY,
+                 queue_depth: int = JOB_QUEUE_DEPTH, retention: float = JOB_RETENTION_SECONDS,
+                 store: Optional[JobStore] = None, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.runner = runner
+        self.concurrency = max(1, concurrency)
+        self.queue_depth = max(0, queue_depth)
+        self.retention = retention
+        self.lease_seconds = lease_seconds
+        self._store = store
+        self.worker_id = new_worker_id()
+        self._wakeups: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._running = 0
+        self._stopping = False
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = create_job_store()
+        return self._store
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "queued": self.store.count("queued"),
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+        }
+
+    def start(self):
+        if self._workers:
+            return
+        # One token per local submission wakes one idle worker; others are found by polling
+        self._wakeups = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        log.info(f"Started {self.concurrency} workers as {self.worker_id} (queue depth {self.queue_depth}).")
+
+    async def stop(self):
+        # Running jobs are released back to the store, so another process (or the next start) resumes them
+        self._stopping = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._stopping = False
+        log.info("Stopped.")
+
+    async def submit(self, data: dict, fingerprint: Optional[str] = None) -> tuple[Job, bool]:
+        """
+        Admits a job or raises QueueFullError when every slot and queue entry is taken.
+        With a `fingerprint`, a request matching a queued or running job (or one done
+        within JOB_DEDUPE_WINDOW_SECONDS) gets that job instead of starting another.
+        Returns the job and whether it was newly created.
+        """
+        if not self._workers:
+            self.start()
+        store = self.store
+        now = time.time()
+        await store.call(store.prune, now - max(self.retention, JOB_DEDUPE_WINDOW_SECONDS))
+        if fingerprint:
+            existing = await store.call(store.find, fingerprint, now - JOB_DEDUPE_WINDOW_SECONDS)
+            if existing is not None:
+                JOBS_DEDUPLICATED.inc(outcome="cached" if existing.status == "done" else "attached")
+                return existing, False
+        if self.queue_depth == 0 and self._running >= self.concurrency:
+            JOBS_REJECTED.inc()
+            raise QueueFullError("All workers are busy.")
+        if self.queue_depth and await store.call(store.count, "queued") >= self.queue_depth:
+            JOBS_REJECTED.inc()
+            raise QueueFullError(f"Job queue is full ({self.queue_depth} waiting).")
+        job = Job(data, fingerprint=fingerprint)
+        stored = await store.call(store.add, job)
+        if stored is not job:
+            JOBS_DEDUPLICATED.inc(outcome="attached")
+            return stored, False
+        self._wakeups.put_nowait(None)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    async def _worker(self, index: int):
+        # The flag also ends the loop if a cancellation is swallowed by wait_for racing its timeout
+        while not self._stopping:
+            job = await self.store.call(self.store.claim, self.worker_id, self.lease_seconds)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeups.get(), timeout=JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _heartbeat(self, job: Job, run_task: asyncio.Task):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            if job.lease_lost or not await self.store.call(self.store.heartbeat, job, self.lease_seconds):
+                job.lease_lost = True
+                log.warning(f"Lost the lease on job {job.id}; another worker took it over.")
+                run_task.cancel()
+                return
+
+    async def _run(self, job: Job):
+        self._running += 1
+        if job.claims > 1:
+            log.info(f"Resuming job {job.id} (claim {job.claims}) from {job.progress or 'the start'}")
+        # Spans recorded while the job runs end up in its trace
+        start_trace(job.id)
+        job_token = bind_job(job.id)
+        run_task = asyncio.create_task(self.runner(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, run_task))
+        try:
+            await run_task
+            job.status = "done"
+        except asyncio.CancelledError:
+            if not job.lease_lost:
+                # The scheduler is stopping: the job goes back to the queue below
+                raise
+        except asyncio.TimeoutError:
+            job.status = "timeout"
+            job.error = "Task chain timed out."
+            TIMEOUTS_TOTAL.inc(scope="job")
+        except JobFailed as e:
+            job.status = "failed"
+            job.error = str(e)
+            log.warning(f"Job {job.id} failed: {e}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            log.exception(f"Job {job.id} failed: {e}")
+        finally:
+            heartbeat.cancel()
+            self._running -= 1
+            if job.lease_lost:
+                pass
+            elif job.status == "running":
+                await self.store.call(self.store.release, job)
+            else:
+                job.finished_at = time.time()
+                await self.store.call(self.store.finish, job)
+                JOBS_TOTAL.inc(status=job.status)
+            end_trace()
+            unbind_job(job_token)
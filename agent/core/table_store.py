@@ -0,0 +1,225 @@
+import glob
+import importlib.util
+import json
+import os
+from typing import Optional
+from urllib.parse import urlparse
+
+from agent.core.log import get_logger
+
+log = get_logger("TABLES")
+
+# With pyarrow (in requirements.txt; also needed for Parquet), tables are Feather (Arrow IPC)
+# files that load_table memory-maps. Only looked up here; pyarrow is imported on first use.
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Columns described in the summary returned to the agent
+TABLE_SUMMARY_COLUMNS = int(os.environ.get("TABLE_SUMMARY_COLUMNS", "40"))
+# Sample rows included in the summary
+TABLE_SAMPLE_ROWS = int(os.environ.get("TABLE_SAMPLE_ROWS", "5"))
+_MAX_VALUE_CHARS = 40
+# Characters of a JSON document's non-table fields shown next to the table summary
+_MAX_EXTRA_FIELDS_CHARS = 2000
+
+# Without pyarrow, tables are pickled DataFrames (loaded whole rather than memory-mapped)
+TABLE_EXTENSION = ".feather" if _HAS_PYARROW else ".pkl"
+
+
+def tabular_kind(content_type: str, url: str) -> Optional[str]:
+    """Returns "csv", "tsv", "json", "excel" or "parquet" for tabular downloads, None otherwise."""
+    path = urlparse(url).path.lower()
+    if "tab-separated" in content_type or path.endswith(".tsv"):
+        return "tsv"
+    if "csv" in content_type or path.endswith(".csv"):
+        return "csv"
+    if "spreadsheet" in content_type or "excel" in content_type or path.endswith((".xlsx", ".xls")):
+        return "excel"
+    if "parquet" in content_type or path.endswith(".parquet"):
+        return "parquet"
+    if "json" in content_type or path.endswith(".json"):
+        return "json"
+    return None
+
+
+def table_handle(sha256: str, part: str = "") -> str:
+    """Handle of the table parsed from the file with this content hash (`part` names one of several)."""
+    return f"tbl_{sha256[:12]}{'_' + part if part else ''}"
+
+
+def _table_path(directory: str, sha256: str, handle: str) -> str:
+    # Prefixed with the content hash so the download cache evicts it together with the file
+    return os.path.join(directory, f"{sha256}_{handle}{TABLE_EXTENSION}")
+
+
+def _json_records(data) -> tuple[Optional[object], dict]:
+    """
+    Splits a JSON document into its rows (a list of objects, or a column-oriented
+    dict) and the remaining top-level fields; rows are None when it is not tabular.
+    """
+    others = {}
+    if isinstance(data, dict):
+        if data and all(isinstance(value, list) for value in data.values()):
+            lengths = {len(value) for value in data.values()}
+            if len(lengths) == 1 and 0 not in lengths:
+                return data, {}  # Column-oriented: {"col": [...], ...}
+        lists = [key for key, value in data.items() if isinstance(value, list) and value]
+        if len(lists) != 1:
+            return None, {}
+        others = {key: value for key, value in data.items() if key != lists[0]}
+        data = data[lists[0]]
+    if isinstance(data, list) and data and all(isinstance(row, dict) for row in data):
+        return data, others
+    return None, {}
+
+
+def _read_frame(path: str, kind: str, encoding: str) -> tuple[Optional[object], dict]:
+    """Returns (DataFrame or None, top-level JSON fields that are not part of the table)."""
+    import pandas as pd
+
+    if kind == "csv":
+        return pd.read_csv(path, encoding=encoding, encoding_errors="replace"), {}
+    if kind == "tsv":
+        return pd.read_csv(path, sep="\t", encoding=encoding, encoding_errors="replace"), {}
+    if kind == "excel":
+        return pd.read_excel(path), {}
+    if kind == "parquet":
+        return pd.read_parquet(path), {}
+    with open(path, encoding=encoding, errors="replace") as f:
+        records, others = _json_records(json.load(f))
+    if records is None:
+        return None, {}
+    if isinstance(records, dict):
+        return pd.DataFrame(records), others
+    return pd.json_normalize(records), others
+
+
+def _describe_other_fields(others: dict) -> str:
+    text = json.dumps(others, ensure_ascii=False, default=str)
+    if len(text) > _MAX_EXTRA_FIELDS_CHARS:
+        text = text[:_MAX_EXTRA_FIELDS_CHARS] + "..."
+    return f"Other top-level fields of the document (not in the table):\n{text}"
+
+
+def _write_frame(df, path: str):
+    df = df.reset_index(drop=True)
+    df.columns = [str(column) for column in df.columns]
+    tmp_path = f"{path}.tmp"
+    if _HAS_PYARROW:
+        import pyarrow.feather as feather
+        # Uncompressed, so readers can map the columns without decoding them
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= _MAX_VALUE_CHARS else text[:_MAX_VALUE_CHARS] + "..."
+
+
+def _describe_column(series) -> str:
+    import pandas as pd
+
+    nulls = int(series.isna().sum())
+    head = f"- {series.name} ({series.dtype}{f', {nulls} nulls' if nulls else ''})"
+    values = series.dropna()
+    if values.empty:
+        return head
+    if pd.api.types.is_bool_dtype(values):
+        return f"{head}: {int(values.sum())} true"
+    if pd.api.types.is_numeric_dtype(values):
+        return (f"{head}: min {_short(values.min())}, max {_short(values.max())}, "
+                f"mean {values.mean():.6g}, sum {_short(values.sum())}")
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return f"{head}: {_short(values.min())} to {_short(values.max())}"
+    counts = values.astype(str).value_counts()
+    top = ", ".join(f"{_short(value)!r} ({count})" for value, count in counts.head(3).items())
+    return f"{head}: {len(counts)} unique; top {top}"
+
+
+def describe_table(df, handle: str) -> str:
+    """Compact schema, per-column statistics and a few sample rows for the prompt."""
+    rows, columns = df.shape
+    lines = [
+        f"Table '{handle}': {rows} rows x {columns} columns.",
+        f"Load it in run_python_code with: df = load_table('{handle}')",
+        "Columns:",
+    ]
+    lines += [_describe_column(df[column]) for column in df.columns[:TABLE_SUMMARY_COLUMNS]]
+    if columns > TABLE_SUMMARY_COLUMNS:
+        lines.append(f"... {columns - TABLE_SUMMARY_COLUMNS} more columns")
+    if rows:
+        lines.append(f"First {min(rows, TABLE_SAMPLE_ROWS)} rows:")
+        lines.append(df.head(TABLE_SAMPLE_ROWS).to_csv(index=False).strip())
+    return "\n".join(lines)
+
+
+def ingest_file(directory: str, sha256: str, path: str, kind: str, encoding: str = "utf-8") -> Optional[str]:
+    """
+    Parses a downloaded table once into the columnar store and returns its summary.
+    Returns None when the file is not tabular (e.g. a JSON object without rows).
+    Fields of a JSON document that sit next to its rows (instructions, parameters)
+    are included in the summary, so nothing the agent saw before is hidden.
+    Blocking: run it off the event loop.
+    """
+    df, others = _read_frame(path, kind, encoding)
+    if df is None:
+        return None
+    handle = table_handle(sha256)
+    _write_frame(df, _table_path(directory, sha256, handle))
+    log.info(f"Stored {kind} table {handle} ({df.shape[0]} rows x {df.shape[1]} columns)")
+    summary = describe_table(df, handle)
+    if others:
+        summary = f"{_describe_other_fields(others)}\n{summary}"
+    return summary
+
+
+def _rows_to_frame(rows: list):
+    import pandas as pd
+
+    rows = [["" if cell is None else str(cell).strip() for cell in row] for row in rows if row]
+    if not rows:
+        return None
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    header = rows[0]
+    if len(rows) > 1 and all(header) and len(set(header)) == len(header):
+        df = pd.DataFrame(rows[1:], columns=header)
+    else:
+        df = pd.DataFrame(rows, columns=[f"col{i}" for i in range(width)])
+    for column in df.columns:
+        text = df[column].str.replace(",", "", regex=False)
+        cleaned = text.mask(text == "")
+        numbers = pd.to_numeric(cleaned, errors="coerce")
+        if numbers.notna().sum() == cleaned.notna().sum() and cleaned.notna().any():
+            df[column] = numbers
+    return df
+
+
+def ingest_rows(directory: str, sha256: str, part: str, rows: list) -> Optional[str]:
+    """Stores an extracted table (list of rows, e.g. from a PDF page) and returns its handle."""
+    handle = table_handle(sha256, part)
+    path = _table_path(directory, sha256, handle)
+    if os.path.exists(path):
+        return handle
+    df = _rows_to_frame(rows)
+    if df is None:
+        return None
+    _write_frame(df, path)
+    return handle
+
+
+def load_table(handle: str, directory: str):
+    """
+    Loads a stored table as a DataFrame. Feather files are memory-mapped, so
+    numeric columns are not copied into the process.
+    """
+    matches = glob.glob(os.path.join(directory, f"*_{glob.escape(handle)}{TABLE_EXTENSION}"))
+    if not matches:
+        raise KeyError(f"No stored table with handle {handle!r}; read the file with read_file first.")
+    if _HAS_PYARROW:
+        import pyarrow.feather as feather
+        return feather.read_table(matches[0], memory_map=True).to_pandas(split_blocks=True)
+    import pandas as pd
+    return pd.read_pickle(matches[0])
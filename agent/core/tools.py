@@ -1,17 +1,25 @@
+from __future__ import annotations
+
 import asyncio
-import httpx
-import pdfplumber
-import io
-import pandas as pd
-import numpy as np
-import traceback
-import base64
 import os
 import json
-import hashlib
-from typing import Any, Tuple
-from playwright.async_api import Page
-from openai import AsyncOpenAI
+from typing import TYPE_CHECKING, Any, Tuple
+from agent.core.http_client import get_http_client
+from agent.core.download_cache import get_download_cache, fetch_to_cache, DownloadError
+from agent.core.pdf_engine import extract_pdf
+from agent.core.table_store import tabular_kind, ingest_file
+from agent.core.sandbox import get_sandbox_pool, SANDBOX_TIMEOUT
+from agent.core.prefetch import take_prefetched
+from agent.core.vision import screenshot_for_vision, get_vision_cache
+from agent.core.llm_gateway import get_llm_gateway, LLM_CALL_TIMEOUT
+from agent.core.metrics import span, record_llm_call
+from agent.core.deadline import Deadline, step_timeout
+from agent.core.log import get_logger
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+log = get_logger("TOOL")
 
 # Lazy initialization to avoid errors during import when API key is not set
 _llm_client = None
@@ -23,7 +31,10 @@ def get_llm_client():
         api_key = os.environ.get("AIPIPE_API_KEY")
         base_url = os.environ.get("AIPIPE_BASE_URL")
         if api_key:
-            _llm_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            # Imported on first use: openai is slow to import and not needed to serve /health
+            from openai import AsyncOpenAI
+            # Retries are handled (with jitter, within the deadline) by the LLM gateway
+            _llm_client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         else:
             # Return a mock client for testing when API key is not set
             # This allows tests to run without API credentials
@@ -39,161 +50,237 @@ def get_llm_client():
             _llm_client = MockClient()
     return _llm_client
 
-async def tool_click(page: Page, selector: str):
+async def tool_click(page: Page, selector: str, deadline: Deadline = None):
     """Uses Playwright to click an element based on its CSS selector."""
-    print(f"[TOOL] 🦾 CLICK: {selector}")
+    log.info(f"CLICK: {selector}")
     if not selector:
         raise ValueError("No selector provided for click tool")
-    await page.locator(selector).first.click(timeout=5000)
+    await page.locator(selector).first.click(timeout=step_timeout(deadline, 5.0) * 1000)
     return f"Clicked element '{selector}'."
 
-async def tool_fill_text(page: Page, selector: str, text: str):
+async def tool_fill_text(page: Page, selector: str, text: str, deadline: Deadline = None):
     """Uses Playwright to fill a text field."""
-    print(f"[TOOL] 🦾 FILL: {selector} with '{text}'")
+    log.info(f"FILL: {selector}", extra={"text": text})
     if not selector:
         raise ValueError("No selector provided for fill_text tool")
-    await page.locator(selector).first.fill(text, timeout=5000)
+    await page.locator(selector).first.fill(text, timeout=step_timeout(deadline, 5.0) * 1000)
     return f"Filled '{selector}'."
 
-async def tool_call_api(url: str, headers: dict = None):
+async def tool_call_api(url: str, headers: dict = None, use_prefetch: bool = True, deadline: Deadline = None):
     """Makes a GET request to an API. FAIL FAST strategy."""
-    print(f"[TOOL] 📡 Calling API: {url}")
+    log.info(f"Calling API: {url}")
+    prefetched = take_prefetched(url, "api") if use_prefetch and not headers else None
+    if prefetched is not None:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(prefetched), timeout=step_timeout(deadline, None))
+            log.info(f"Serving prefetched API response for {url}")
+            return result
+        except Exception as e:
+            log.info(f"Prefetch of {url} failed ({e}), calling again")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, headers=headers)
-            return f"Status: {response.status_code}\nBody: {response.text[:5000]}"
+        client = get_http_client()
+        response = await client.get(url, headers=headers, timeout=step_timeout(deadline, 10.0))
+        return f"Status: {response.status_code}\nBody: {response.text[:5000]}"
     except Exception as e:
         return f"Error calling API: {str(e)}"
 
-async def tool_read_file(url: str, base_url: str = None):
-    """Downloads a file (PDF, CSV, text) and extracts its content or saves it for processing."""
-    from urllib.parse import urljoin, urlparse
-    import os
+def _charset(content_type: str) -> str:
+    """Returns the charset declared in a Content-Type header (default utf-8)."""
+    for part in content_type.split(";"):
+        part = part.strip()
+        if part.startswith("charset="):
+            return part[len("charset="):].strip('"') or "utf-8"
+    return "utf-8"
+
+def _read_text(path: str, content_type: str, limit: int) -> str:
+    """Reads at most `limit` characters of a downloaded text file."""
+    with open(path, encoding=_charset(content_type), errors="replace") as f:
+        return f.read(limit)
+
+def _is_pdf(entry, url: str) -> bool:
+    return "pdf" in entry.content_type or url.endswith(".pdf")
+
+async def _extract_file(entry, url: str) -> str:
+    """
+    Builds the tool output for a downloaded non-PDF file. Tabular files are parsed
+    once into the table store and summarised (schema and statistics); other files,
+    and text tables that fail to parse, fall back to a text preview. Binary tables
+    (Excel, Parquet) that fail to parse are never decoded as text.
+    """
+    content_type = entry.content_type
+    kind = tabular_kind(content_type, url)
+    if kind is not None:
+        try:
+            summary = await asyncio.to_thread(
+                ingest_file, get_download_cache().extract_dir, entry.sha256, entry.path, kind, _charset(content_type)
+            )
+        except Exception as e:
+            log.warning(f"Could not parse {entry.path} as {kind}: {e}")
+            summary = None
+        if summary is not None:
+            return f"File saved to '{entry.path}'.\n{summary}"
+
+    if kind in ("excel", "parquet"):
+        return (f"File saved to '{entry.path}', but it could not be parsed as {kind}. "
+                "It is binary; open it in run_python_code instead of reading it as text.")
+    if kind in ("csv", "tsv"):
+        # Return preview only
+        preview = _read_text(entry.path, content_type, 1000)
+        return f"File saved to '{entry.path}'. You can read it using pandas.\nPreview:\n{preview}..."
+    return _read_text(entry.path, content_type, 10000)
+
+async def tool_read_file(url: str, base_url: str = None, pages=None, tables: bool = False,
+                         use_prefetch: bool = True, deadline: Deadline = None):
+    """
+    Downloads a file (PDF, CSV, JSON, Excel, text) and extracts its content or saves it for processing.
+    Tabular files are parsed once into the table store; the agent gets their schema and
+    statistics plus a handle that run_python_code loads with `load_table(handle)`.
+    Downloads are streamed to disk through the cache: unchanged files are revalidated
+    with a conditional GET and their previous extraction is returned without re-parsing.
+    For PDFs, `pages` selects a page range (e.g. "40" or "3-7") and `tables` also
+    extracts tables; parsing runs in the PDF process pool.
+    A default read of a file the prefetcher already fetched and parsed is served from it.
+    With a `deadline`, downloads and parsing are cut off when the budget runs out.
+    """
+    from urllib.parse import urljoin
     
     if base_url and not url.startswith(("http://", "https://")):
         url = urljoin(base_url, url)
-        print(f"[TOOL] 🔗 Resolved relative URL to: {url}")
+        log.debug(f"Resolved relative URL to: {url}")
+
+    prefetched = take_prefetched(url, "file") if use_prefetch and not pages and not tables else None
+    if prefetched is not None:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(prefetched), timeout=step_timeout(deadline, None))
+            log.info(f"Serving prefetched file: {url}")
+            return result
+        except Exception as e:
+            log.info(f"Prefetch of {url} failed ({e}), downloading again")
 
-    print(f"[TOOL] 📂 Downloading file: {url}")
+    log.info(f"Downloading file: {url}")
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(url)
-            if response.status_code != 200:
-                return f"Error: Failed to download. Status: {response.status_code}"
-            
-            content_type = response.headers.get("content-type", "").lower()
-            
-            # Create downloads directory if it doesn't exist
-            os.makedirs("downloads", exist_ok=True)
-            
-            # Extract filename from URL or use default
-            parsed_url = urlparse(url)
-            original_filename = os.path.basename(parsed_url.path)
-            if not original_filename:
-                original_filename = "downloaded_file"
-            
-            # Use hash of URL to ensure uniqueness and avoid collisions
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-            name, ext = os.path.splitext(original_filename)
-            if not ext:
-                ext = ".txt" # Default extension
-            
-            safe_filename = f"{name}_{url_hash}{ext}"
-            local_path = os.path.join("downloads", safe_filename)
-            
-            # Save the file
-            with open(local_path, "wb") as f:
-                f.write(response.content)
-            
-            if "pdf" in content_type or url.endswith(".pdf"):
-                print("[TOOL]  Processing PDF...")
-                with pdfplumber.open(io.BytesIO(response.content)) as pdf:
-                    text = ""
-                    for i, page in enumerate(pdf.pages[:10]):
-                        text += f"--- Page {i+1} ---\n{page.extract_text()}\n"
-                    return text
-            
-            elif "csv" in content_type or url.endswith(".csv"):
-                print(f"[TOOL]  Saved CSV to {local_path}")
-                # Return preview only
-                preview = response.text[:1000]
-                return f"File saved to '{local_path}'. You can read it using pandas.\nPreview:\n{preview}..."
+        cache = get_download_cache()
+        try:
+            entry = await fetch_to_cache(url, timeout=step_timeout(deadline, 15.0))
+        except DownloadError as e:
+            return f"Error: {e}"
+
+        if _is_pdf(entry, url):
+            log.info("Processing PDF...")
+            return await asyncio.wait_for(
+                extract_pdf(entry, pages=pages, tables=bool(tables)),
+                timeout=step_timeout(deadline, None)
+            )
+
+        # Extractions are keyed by content hash, so the same bytes are parsed once
+        # (v2: tables are summarised from the table store instead of a text preview)
+        extraction_key = f"read_file:v2:{entry.path}"
+        cached = cache.get_extraction(entry.sha256, extraction_key)
+        if cached is not None:
+            log.info(f"Using cached extraction for {entry.path}")
+            return cached
+
+        result = await _extract_file(entry, url)
+        cache.put_extraction(entry.sha256, extraction_key, result)
+        return result
             
-            else:
-                return response.text[:10000]
-                
+    except asyncio.TimeoutError:
+        return "Error reading file: ran out of time for this task."
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
-async def tool_run_python_code(code: str):
+async def tool_run_python_code(code: str, namespace: str = None, deadline: Deadline = None):
     """
     Executes a snippet of Python code for data analysis.
     The code can import any library installed in the environment.
+    It runs in a warm sandbox worker process with a wall-clock and memory limit;
+    calls sharing a `namespace` keep their variables between steps.
     """
-    print(f"[TOOL] 🐍 RUN PYTHON: \n{code}")
+    log.info("RUN PYTHON", extra={"code": code, "code_chars": len(code or "")})
     
     # Safety check: prevent package installation
     if "pip install" in code or "!pip" in code:
         return "Error: Package installation is not allowed. Please use only pre-installed libraries (pandas, numpy, etc.)."
-        
-    isolated_globals = {"__builtins__": __builtins__}
-    
-    code_out = io.StringIO()
-    
-    try:
-        import sys
-        original_stdout = sys.stdout
-        sys.stdout = code_out
-        
-        exec(code, isolated_globals)
-        
-        sys.stdout = original_stdout
-        
-        output = code_out.getvalue()
-        if not output:
-            return "Code executed successfully (no print output)."
-        return f"Python output:\n{output}"
 
+    try:
+        result = await get_sandbox_pool().run(code, namespace=namespace, timeout=step_timeout(deadline, SANDBOX_TIMEOUT))
     except Exception as e:
-        sys.stdout = original_stdout
-        tb = traceback.format_exc()
-        return f"Error executing Python code: {e}\n{tb}"
+        return f"Error executing Python code: {e}"
 
-async def tool_take_screenshot_and_analyze(page: Page, analysis_prompt: str):
-    """Takes a screenshot, sends it to Gemini 2.5 Pro for analysis."""
-    print(f"[TOOL] 📸 Taking screenshot for analysis...")
+    output = result.get("output", "")
+    if result.get("error"):
+        if output:
+            return f"Python output:\n{output}\nError executing Python code: {result['error']}"
+        return f"Error executing Python code: {result['error']}"
+    if not output:
+        return "Code executed successfully (no print output)."
+    return f"Python output:\n{output}"
+
+async def tool_take_screenshot_and_analyze(page: Page, analysis_prompt: str, selector: str = None, clip: dict = None,
+                                           deadline: Deadline = None):
+    """
+    Takes a screenshot (whole page, one element via `selector`, or a `clip` region),
+    downscales and re-encodes it in a worker thread, and sends it to the strong model
+    through the LLM gateway (retries, hedging, LLM_CALL_TIMEOUT). Answers are cached
+    by page URL, prompt and exact screenshot content, so an unchanged page is not
+    uploaded again.
+    """
+    log.info("Taking screenshot for analysis...")
     
-    screenshot_bytes = await page.screenshot()
-    screenshot_base64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+    try:
+        image = await screenshot_for_vision(page, selector=selector, clip=clip, deadline=deadline)
+    except Exception as e:
+        return f"Error taking screenshot: {str(e)}"
     
-    model_name = os.environ.get("LLM_MODEL", "google/gemini-2.5-pro")
-    print(f"[TOOL]  Screenshot captured. Sending to {model_name} for analysis...")
+    gateway = get_llm_gateway()
+    model_name = gateway.strong_model
+    vision_cache = get_vision_cache()
+    page_url = page.url
+    cached = vision_cache.get(model_name, analysis_prompt, page_url, image.content_hash)
+    if cached is not None:
+        log.info("Page looks unchanged; reusing cached vision analysis.")
+        return cached
+
+    log.info(f"Screenshot captured ({image.size_bytes} bytes). Sending to {model_name} for analysis...")
     
-    try:
-        llm_client = get_llm_client()
-        response = await llm_client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": analysis_prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{screenshot_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=500
+    async def vision_completion(client, model: str, messages: list, **params) -> str:
+        # Records every request the gateway sends, retries and hedges included
+        response = await client.chat.completions.create(model=model, messages=messages, **params)
+        text = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        record_llm_call(
+            model,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+            len(image.data_url) + len(analysis_prompt),
+            len((text or "").encode("utf-8")),
         )
-        analysis = response.choices[0].message.content
-        print(f"[TOOL]  Vision analysis complete.")
+        return text
+
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": analysis_prompt},
+                {"type": "image_url", "image_url": {"url": image.data_url}},
+            ],
+        }
+    ]
+    try:
+        async with span("llm.vision", model=model_name, image_bytes=image.size_bytes):
+            analysis = await asyncio.wait_for(
+                gateway.complete(vision_completion, get_llm_client(), model_name, messages,
+                                 deadline=deadline, max_tokens=500),
+                timeout=step_timeout(deadline, LLM_CALL_TIMEOUT),
+            )
+        log.info("Vision analysis complete.")
+        if analysis:
+            vision_cache.put(model_name, analysis_prompt, page_url, image.content_hash, analysis)
         return analysis
+    except asyncio.TimeoutError:
+        return "Error during vision analysis: ran out of time for this task."
     except Exception as e:
-        print(f"[TOOL]  ❌ Vision analysis failed: {e}")
+        log.warning(f"Vision analysis failed: {e}")
         return f"Error during vision analysis: {str(e)}"
 
 def validate_answer_format(answer: Any) -> Tuple[bool, str]:
@@ -253,15 +340,15 @@ def check_payload_size(payload: dict) -> Tuple[bool, str, int]:
     except Exception as e:
         return False, f"Error checking payload size: {e}", 0
 
-async def tool_submit_answer(submission_url: str, answer_json: dict, base_url: str = None):
+async def tool_submit_answer(submission_url: str, answer_json: dict, base_url: str = None, deadline: Deadline = None):
     """The FINAL tool. Submits the answer via HTTP POST and returns the response."""
     from urllib.parse import urljoin
     
     if base_url and not submission_url.startswith(("http://", "https://")):
         submission_url = urljoin(base_url, submission_url)
-        print(f"[TOOL] 🔗 Resolved relative submission URL to: {submission_url}")
+        log.debug(f"Resolved relative submission URL to: {submission_url}")
 
-    print(f"[TOOL] 📤 SUBMIT: {answer_json} to {submission_url}")
+    log.info(f"SUBMIT to {submission_url}", extra={"payload": answer_json})
     
     # Validate answer format
     answer = answer_json.get("answer")
@@ -269,7 +356,7 @@ async def tool_submit_answer(submission_url: str, answer_json: dict, base_url: s
         is_valid, error_msg = validate_answer_format(answer)
         if not is_valid:
             error = f"Invalid answer format: {error_msg}"
-            print(f"[TOOL] ❌ {error}")
+            log.warning(error)
             return {
                 "correct": False,
                 "reason": error,
@@ -279,44 +366,46 @@ async def tool_submit_answer(submission_url: str, answer_json: dict, base_url: s
     # Check payload size
     is_size_ok, size_error, size_bytes = check_payload_size(answer_json)
     if not is_size_ok:
-        print(f"[TOOL] ❌ {size_error}")
+        log.warning(size_error)
         return {
             "correct": False,
             "reason": size_error,
             "url": None
         }
-    print(f"[TOOL] ✓ Payload size: {size_bytes} bytes (under 1MB limit)")
+    log.debug(f"Payload size: {size_bytes} bytes (under 1MB limit)")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                submission_url,
-                json=answer_json,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                try:
-                    result = response.json()
-                    print(f"[TOOL] ✅ Submission successful. Response: {result}")
-                    return result
-                except Exception as e:
-                    return {
-                        "correct": False,
-                        "reason": f"Failed to parse response JSON: {e}",
-                        "url": None
-                    }
-            else:
-                error_msg = f"Submission failed with status {response.status_code}: {response.text[:500]}"
-                print(f"[TOOL] ❌ {error_msg}")
+        client = get_http_client()
+        response = await client.post(
+            submission_url,
+            json=answer_json,
+            headers={"Content-Type": "application/json"},
+            # The submission may spend the reserve the deadline held back for it
+            timeout=deadline.submit_timeout(30.0) if deadline else 30.0
+        )
+        
+        if response.status_code == 200:
+            try:
+                result = response.json()
+                log.info("Submission successful.", extra={"response": result})
+                return result
+            except Exception as e:
                 return {
                     "correct": False,
-                    "reason": error_msg,
+                    "reason": f"Failed to parse response JSON: {e}",
                     "url": None
                 }
+        else:
+            error_msg = f"Submission failed with status {response.status_code}: {response.text[:500]}"
+            log.warning(error_msg)
+            return {
+                "correct": False,
+                "reason": error_msg,
+                "url": None
+            }
     except Exception as e:
         error_msg = f"Error submitting answer: {str(e)}"
-        print(f"[TOOL] ❌ {error_msg}")
+        log.warning(error_msg)
         return {
             "correct": False,
             "reason": error_msg,
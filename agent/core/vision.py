@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from agent.core.deadline import Deadline, step_timeout
+from agent.core.metrics import register_stats_gauge
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+# Longest image side sent to the vision model
+SCREENSHOT_MAX_SIDE = int(os.environ.get("SCREENSHOT_MAX_SIDE", "1280"))
+# "jpeg" or "webp" ("png" keeps the original encoding)
+SCREENSHOT_FORMAT = os.environ.get("SCREENSHOT_FORMAT", "jpeg").lower()
+SCREENSHOT_QUALITY = int(os.environ.get("SCREENSHOT_QUALITY", "80"))
+VISION_CACHE_SIZE = int(os.environ.get("VISION_CACHE_SIZE", "128"))
+
+
+class PreparedImage:
+    def __init__(self, data_url: str, content_hash: str, size_bytes: int):
+        self.data_url = data_url
+        # SHA-256 of the captured pixels: only an identical screenshot shares a cached answer
+        self.content_hash = content_hash
+        self.size_bytes = size_bytes
+
+
+async def capture_screenshot(page: Page, selector: Optional[str] = None, clip: Optional[dict] = None,
+                             deadline: Optional[Deadline] = None) -> bytes:
+    """Captures the whole viewport, one element, or a clip region as PNG, within the time left."""
+    if selector:
+        return await page.locator(selector).first.screenshot(timeout=step_timeout(deadline, 5.0) * 1000)
+    timeout = step_timeout(deadline, 10.0) * 1000
+    if clip:
+        region = {key: float(clip[key]) for key in ("x", "y", "width", "height")}
+        return await page.screenshot(clip=region, timeout=timeout)
+    return await page.screenshot(timeout=timeout)
+
+
+def prepare_image(png_bytes: bytes, max_side: int = SCREENSHOT_MAX_SIDE, fmt: str = SCREENSHOT_FORMAT,
+                  quality: int = SCREENSHOT_QUALITY) -> PreparedImage:
+    """Downscales and re-encodes a screenshot (CPU-bound; run it in a worker thread)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        # No Pillow: send the PNG as is, hashed as encoded
+        encoded = base64.b64encode(png_bytes).decode("utf-8")
+        return PreparedImage(f"data:image/png;base64,{encoded}", hashlib.sha256(png_bytes).hexdigest(), len(png_bytes))
+
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        # Hashed before downscaling, so a one-digit change still gives a new key
+        content_hash = hashlib.sha256(f"{image.mode}{image.size}".encode() + image.tobytes()).hexdigest()
+        image.thumbnail((max_side, max_side))
+        if fmt == "png":
+            out_format, mime = "PNG", "image/png"
+            save_args = {"optimize": True}
+        elif fmt == "webp":
+            out_format, mime = "WEBP", "image/webp"
+            save_args = {"quality": quality}
+        else:
+            out_format, mime = "JPEG", "image/jpeg"
+            save_args = {"quality": quality, "optimize": True}
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=out_format, **save_args)
+
+    data = buffer.getvalue()
+    encoded = base64.b64encode(data).decode("utf-8")
+    return PreparedImage(f"data:{mime};base64,{encoded}", content_hash, len(data))
+
+
+class VisionCache:
+    """
+    LRU cache of vision answers keyed by model, prompt, page URL and the exact
+    screenshot content. Pages that merely look alike (same layout, different
+    numbers) or live at another URL never share an answer.
+    """
+
+    def __init__(self, max_entries: int = VISION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def get(self, model: str, prompt: str, url: str, content_hash: str) -> Optional[str]:
+        key = (model, prompt, url, content_hash)
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key]
+
+    def put(self, model: str, prompt: str, url: str, content_hash: str, analysis: str):
+        key = (model, prompt, url, content_hash)
+        self._entries[key] = analysis
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_vision_cache = None
+
+
+def get_vision_cache() -> VisionCache:
+    global _vision_cache
+    if _vision_cache is None:
+        _vision_cache = VisionCache()
+    return _vision_cache
+
+
+register_stats_gauge("agent_vision_cache", "Vision answer cache counters.", lambda: _vision_cache and _vision_cache.stats)
+
+
+async def screenshot_for_vision(page: Page, selector: Optional[str] = None, clip: Optional[dict] = None,
+                                deadline: Optional[Deadline] = None) -> PreparedImage:
+    """Captures a screenshot and prepares it off the event loop."""
+    png_bytes = await capture_screenshot(page, selector=selector, clip=clip, deadline=deadline)
+    return await asyncio.to_thread(prepare_image, png_bytes)
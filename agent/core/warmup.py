@@ -0,0 +1,112 @@
+import asyncio
+import importlib
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from agent.core.log import get_logger
+
+log = get_logger("WARMUP")
+
+# Warm the browser pool, sandbox workers and LLM connection in the background after startup;
+# when off, each starts on first use
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1").lower() in ("1", "true", "yes")
+# Time limit per warm-up step
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", "120"))
+# Imported in a thread during warm-up so the first table parse does not pay for it
+WARMUP_MODULES = ("pandas",)
+
+
+class Readiness:
+    """
+    Warm-up state of the expensive resources, reported by GET /ready.
+    Liveness (GET /health) does not depend on it. The service is ready once
+    every required step succeeded; optional steps only report their status.
+    """
+
+    def __init__(self, enabled: bool = WARMUP_ENABLED):
+        self.enabled = enabled
+        self.components: dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        if not self.enabled:
+            return True
+        if self.finished_at is None:
+            return False
+        return all(c["status"] == "ready" for c in self.components.values() if c["required"])
+
+    def to_dict(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "warming" if self.finished_at is None else "degraded",
+            "warmup_enabled": self.enabled,
+            "components": self.components,
+            "warmup_seconds": round(self.finished_at - self.started_at, 3) if self.finished_at else None,
+        }
+
+    async def _step(self, name: str, warm: Callable[[], Awaitable], required: bool):
+        component = self.components[name] = {"status": "warming", "required": required}
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(warm(), timeout=WARMUP_TIMEOUT)
+            component["status"] = "ready"
+        except asyncio.TimeoutError:
+            component.update(status="failed", error=f"timed out after {WARMUP_TIMEOUT:.0f}s")
+        except Exception as e:
+            component.update(status="failed", error=str(e))
+        component["seconds"] = round(time.monotonic() - started, 3)
+        if component["status"] == "ready":
+            log.info(f"{name} warm in {component['seconds']}s")
+        else:
+            log.warning(f"{name} warm-up failed: {component['error']}")
+
+    async def run(self, steps: dict[str, tuple[Callable[[], Awaitable], bool]]):
+        """Runs the (warm, required) steps concurrently and records their outcome."""
+        self.started_at = time.time()
+        for name, (_, required) in steps.items():
+            self.components[name] = {"status": "pending", "required": required}
+        await asyncio.gather(*(self._step(name, warm, required) for name, (warm, required) in steps.items()))
+        self.finished_at = time.time()
+        log.info(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s (ready={self.ready}).")
+
+
+async def _import_modules():
+    for name in WARMUP_MODULES:
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except ImportError:
+            pass
+
+
+def _warmup_steps() -> dict[str, tuple[Callable[[], Awaitable], bool]]:
+    # Imported here so that importing this module stays cheap
+    from agent.core.browser_pool import start_browser_pool
+    from agent.core.sandbox import start_sandbox_pool
+    from agent.core.worker import warm_llm_client
+
+    return {
+        "browser": (start_browser_pool, True),
+        "sandbox": (start_sandbox_pool, True),
+        "llm": (warm_llm_client, False),
+        "modules": (_import_modules, False),
+    }
+
+
+_readiness = None
+
+
+def get_readiness() -> Readiness:
+    global _readiness
+    if _readiness is None:
+        _readiness = Readiness()
+    return _readiness
+
+
+def start_warmup() -> Optional[asyncio.Task]:
+    """Starts the background warm-up (called from the app lifespan); None when WARMUP_ENABLED is off."""
+    readiness = get_readiness()
+    if not readiness.enabled:
+        return None
+    return asyncio.create_task(readiness.run(_warmup_steps()))
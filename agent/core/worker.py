@@ -1,11 +1,34 @@
+from __future__ import annotations
+
 import os
 import json
 import asyncio
 import re
-import traceback
-from playwright.async_api import async_playwright, Page
-from openai import AsyncOpenAI
+import time
+import uuid
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
 from agent.core.tools import *
+from agent.core.browser_pool import get_browser_pool
+from agent.core.sandbox import get_sandbox_pool
+from agent.core.page_compactor import PageCompactor, estimate_tokens
+from agent.core.history import ConversationHistory
+from agent.core.llm_cache import cached_chat_completion, create_completion, get_llm_cache
+from agent.core.llm_gateway import get_llm_gateway, LLM_CALL_TIMEOUT
+from agent.core.json_stream import IncrementalJSONObject
+from agent.core.download_cache import fetch_to_cache
+from agent.core.prefetch import Prefetcher, bind_prefetcher, unbind_prefetcher
+from agent.core.page_ready import PageReadiness, wait_for_dom_quiescent
+from agent.core.page_index import index_page
+from agent.core.metrics import span, TOOL_CALLS, TIMEOUTS_TOTAL, LLM_ESCALATIONS
+from agent.core.deadline import Deadline, DEFAULT_BUDGET_SECONDS
+from agent.core.log import get_logger, bind_task, unbind_task
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+log = get_logger("SOLVER")
+extract_log = get_logger("EXTRACT")
+supervisor_log = get_logger("SUPERVISOR")
 
 # Lazy initialization to avoid errors during import when API key is not set
 _llm_client = None
@@ -17,7 +40,9 @@ def get_llm_client():
         api_key = os.environ.get("AIPIPE_API_KEY")
         base_url = os.environ.get("AIPIPE_BASE_URL")
         if api_key:
-            _llm_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            from openai import AsyncOpenAI
+            # Retries are handled (with jitter, within the deadline) by the LLM gateway
+            _llm_client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         else:
             # Return a mock client for testing when API key is not set
             class MockCompletions:
@@ -32,6 +57,68 @@ def get_llm_client():
             _llm_client = MockClient()
     return _llm_client
 
+async def warm_llm_client():
+    """Creates the solver's LLM client and opens its connection ahead of the first call."""
+    client = get_llm_client()
+    if not hasattr(client, "models"):
+        return  # No API key: nothing to connect to
+    import openai
+    try:
+        await client.with_options(max_retries=0, timeout=10).models.list()
+    except openai.APIStatusError:
+        pass  # Any HTTP answer means the connection (and TLS session) is up
+
+# Stream LLM responses and dispatch the tool as soon as the JSON object closes
+LLM_STREAMING = os.environ.get("LLM_STREAMING", "0").lower() in ("1", "true", "yes")
+
+def _escalate(model_name: str, reason: str):
+    """Logs and counts a move from the fast to the strong model; the caller sets its `escalated` flag."""
+    gateway = get_llm_gateway()
+    if gateway.fast_model is not None and model_name != gateway.strong_model:
+        log.warning(f"Escalating from {model_name} to {gateway.strong_model} ({reason}).")
+        LLM_ESCALATIONS.inc(reason=reason)
+
+def _start_early_download(url: str, base_url: str):
+    """Starts a read_file download while the rest of the LLM response is still streaming."""
+    from urllib.parse import urljoin
+
+    if base_url and not url.startswith(("http://", "https://")):
+        url = urljoin(base_url, url)
+    log.info(f"Early start: downloading {url} while the LLM is still responding")
+    task = asyncio.ensure_future(fetch_to_cache(url))
+    # tool_read_file joins the same in-flight download; errors surface there
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+def make_streaming_completion(base_url: str):
+    """
+    Builds a completion function that streams the response and returns as soon
+    as the top-level JSON object is closed. Once the "tool" and "url" fields of a
+    read_file action have arrived, the download is started early.
+    """
+    async def stream_completion(client, model: str, messages: list, **params) -> str:
+        stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        parser = IncrementalJSONObject()
+        early_download = None
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parser.feed(delta)
+                url = parser.fields.get("url")
+                if early_download is None and parser.fields.get("tool") == "read_file" and isinstance(url, str):
+                    early_download = _start_early_download(url, base_url)
+                if parser.complete:
+                    log.info("JSON object complete; dispatching without waiting for the stream to end")
+                    break
+        finally:
+            await stream.close()
+        return parser.text
+    return stream_completion
+
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
 
 SYSTEM_PROMPT = """
@@ -43,7 +130,8 @@ You MUST operate in a step-by-step "See-Think-Act" loop.
 {task_hint}
 
 **AVAILABLE TOOLS:**
-You MUST respond with a single valid JSON object describing the *one* tool you want to use next.
+You MUST respond with a single valid JSON object describing the tool you want to use next
+(or a batch of independent tools, see 6).
 (All curly braces in JSON examples must be escaped by doubling: {{ and }})
 
 1.  **Web Navigation:**
@@ -55,26 +143,50 @@ You MUST respond with a single valid JSON object describing the *one* tool you w
     {{"tool": "read_file", "url": "<file_url>"}}
        (Use this for PDFs, CSVs, or text files found on the page. 
        Files will be saved to a local 'downloads/' directory. 
-       The tool will return the path and a preview.)
+       The tool will return the path and a preview. Tables (CSV, JSON rows, Excel)
+       come back as a handle with their schema and column statistics instead.
+       For PDFs you may add "pages": "<range like 40 or 3-7>" to read specific pages
+       (default: first 10) and "tables": true to also extract tables.)
 
 3.  **Data Analysis (Code):**
     {{"tool": "run_python_code", "code": "<python_code_snippet>"}}
        (CRITICAL: Use this for ALL math, parsing, filtering, or analysis.
        You MUST import any libraries you need (e.g., pandas, json).
-       You MUST `print()` your final answer to get the output.)
+       You MUST `print()` your final answer to get the output.
+       Variables you define are kept for later run_python_code calls in this task,
+       so you can reuse loaded DataFrames instead of reloading files.
+       Tables returned by read_file are already parsed: `df = load_table('<handle>')`
+       is much faster than pd.read_csv on the file.)
 
 4.  **Vision Analysis:**
     {{"tool": "take_screenshot_and_analyze", "analysis_prompt": "<what_to_look_for>"}}
-       (Use this if the HTML is confusing or the task is visual, like a chart or image.)
+       (Use this if the HTML is confusing or the task is visual, like a chart or image.
+       Optionally add "selector": "<css_selector>" to capture one element, or
+       "clip": {{"x": 0, "y": 0, "width": 800, "height": 600}} to capture a region.)
 
 5.  **Final Submission:**
     {{"tool": "submit_answer", "submission_url": "<url>", "answer_json": {{"answer": <value>}} }}
        (Use this *only* when you have the final answer for the current task.)
 
+6.  **Batching (optional):**
+    {{"actions": [{{"tool": "read_file", "url": "<a.csv>"}}, {{"tool": "call_api", "url": "<api_url>", "headers": {{}} }}]}}
+       (Use this to run several tools in one step when none needs another's output.
+       read_file and call_api run in parallel; click/fill_text/screenshot and run_python_code run in order.
+       All results come back together. Send submit_answer on its own once you know the answer:
+       a submit_answer inside a batch is not sent.)
+
 **CURRENT PAGE HTML:**
+(Compacted: scripts, styles and layout markup are removed; links, forms, inputs, buttons
+and elements with an id are kept so you can still build CSS selectors. Later pages may be
+sent as a diff against the previous snapshot.)
 {html_content}
 """
 
+URGENT_MESSAGE = (
+    "TIME IS ALMOST UP: about {seconds}s remain for this task. Do not explore further. "
+    "Respond now with a submit_answer command containing your best answer so far."
+)
+
 def extract_submission_url(text: str) -> str:
     """
     Extracts the submission URL from quiz instructions text.
@@ -89,7 +201,7 @@ def extract_submission_url(text: str) -> str:
     match = re.search(pattern1, text, re.IGNORECASE)
     if match:
         url = match.group(1).rstrip('.,;:!?)')
-        print(f"[EXTRACT] Found submission URL (pattern 1): {url}")
+        extract_log.debug(f"Found submission URL (pattern 1): {url}")
         return url
     
     # Pattern 2: "Post to https://..."
@@ -97,7 +209,7 @@ def extract_submission_url(text: str) -> str:
     match = re.search(pattern2, text, re.IGNORECASE)
     if match:
         url = match.group(1).rstrip('.,;:!?)')
-        print(f"[EXTRACT] Found submission URL (pattern 2): {url}")
+        extract_log.debug(f"Found submission URL (pattern 2): {url}")
         return url
     
     # Pattern 3: "Submit to https://..."
@@ -105,7 +217,7 @@ def extract_submission_url(text: str) -> str:
     match = re.search(pattern3, text, re.IGNORECASE)
     if match:
         url = match.group(1).rstrip('.,;:!?)')
-        print(f"[EXTRACT] Found submission URL (pattern 3): {url}")
+        extract_log.debug(f"Found submission URL (pattern 3): {url}")
         return url
     
     # Pattern 4: Any URL that appears after "submit" or "post" keywords
@@ -113,10 +225,10 @@ def extract_submission_url(text: str) -> str:
     match = re.search(pattern4, text, re.IGNORECASE)
     if match:
         url = match.group(1).rstrip('.,;:!?)')
-        print(f"[EXTRACT] Found submission URL (pattern 4): {url}")
+        extract_log.debug(f"Found submission URL (pattern 4): {url}")
         return url
     
-    print("[EXTRACT] No submission URL found in text")
+    extract_log.info("No submission URL found in text")
     return None
 
 async def extract_rendered_quiz_content(page: Page) -> str:
@@ -125,16 +237,22 @@ async def extract_rendered_quiz_content(page: Page) -> str:
     Tries to get content from #result div first, then falls back to body text.
     """
     try:
-        # Wait for JavaScript to execute and render content
-        await page.wait_for_load_state("networkidle", timeout=5000)
-        await asyncio.sleep(0.5)  # Give a bit more time for scripts
+        # Wait for JavaScript to render: return as soon as the DOM stops mutating
+        await wait_for_dom_quiescent(page)
         
         # Try to get content from #result div (common pattern in quiz pages)
         result_div = await page.query_selector("#result")
         if result_div:
             rendered_text = await result_div.inner_text()
+            if not (rendered_text and rendered_text.strip()):
+                # Content is probably still being fetched: fall back to waiting for the network
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=3000)
+                except Exception:
+                    pass
+                rendered_text = await result_div.inner_text()
             if rendered_text and rendered_text.strip():
-                print(f"[EXTRACT] Found quiz content in #result div ({len(rendered_text)} chars)")
+                extract_log.info(f"Found quiz content in #result div ({len(rendered_text)} chars)")
                 return rendered_text
         
         # Fallback: get all visible text from body
@@ -142,185 +260,428 @@ async def extract_rendered_quiz_content(page: Page) -> str:
         if body:
             rendered_text = await body.inner_text()
             if rendered_text and rendered_text.strip():
-                print(f"[EXTRACT] Extracted quiz content from body ({len(rendered_text)} chars)")
+                extract_log.info(f"Extracted quiz content from body ({len(rendered_text)} chars)")
                 return rendered_text
         
         # Last resort: return HTML content
-        print("[EXTRACT] No rendered text found, using HTML content")
+        extract_log.info("No rendered text found, using HTML content")
         return await page.content()
         
     except Exception as e:
-        print(f"[EXTRACT] Error extracting rendered content: {e}, falling back to HTML")
+        extract_log.warning(f"Error extracting rendered content: {e}, falling back to HTML")
         return await page.content()
 
-async def run_single_task_loop(page: Page, task_hint: str, task_url: str):
+# Tools that only touch the network and can run side by side
+CONCURRENT_TOOLS = {"read_file", "call_api"}
+# Tools that act on (or look at) the shared page; run one at a time, in order
+PAGE_TOOLS = {"click", "fill_text", "take_screenshot_and_analyze"}
+# Tools after which the page has to settle before the next snapshot
+PAGE_MUTATING_TOOLS = {"click", "fill_text"}
+MAX_BATCH_ACTIONS = 8
+
+async def execute_action(page: Page, action: dict, code_namespace: str, deadline: Deadline = None) -> str:
+    """Runs one tool action (anything but submit_answer) inside a timing span and returns its output."""
+    tool = action.get("tool")
+    # Tool names come from the LLM; keep the metric label set bounded
+    label = tool if tool in CONCURRENT_TOOLS | PAGE_TOOLS | {"run_python_code"} else "unknown"
+    outcome = "error"
+    try:
+        async with span(f"tool.{label}") as s:
+            result = await _dispatch_action(page, action, code_namespace, deadline)
+            outcome = "error" if str(result).startswith("Error") else "ok"
+            s.set(outcome=outcome, output_chars=len(str(result)))
+        return result
+    finally:
+        TOOL_CALLS.inc(tool=label, outcome=outcome)
+
+async def _dispatch_action(page: Page, action: dict, code_namespace: str, deadline: Deadline = None) -> str:
+    tool = action.get("tool")
+
+    if tool == "click":
+        return await tool_click(page, action.get("selector"), deadline=deadline)
+    elif tool == "fill_text":
+        return await tool_fill_text(page, action.get("selector"), action.get("text"), deadline=deadline)
+    elif tool == "call_api":
+        return await tool_call_api(action.get("url"), action.get("headers"), deadline=deadline)
+    elif tool == "read_file":
+        return await tool_read_file(
+            action.get("url"),
+            base_url=page.url,
+            pages=action.get("pages"),
+            tables=action.get("tables", False),
+            deadline=deadline
+        )
+    elif tool == "run_python_code":
+        return await tool_run_python_code(action.get("code"), namespace=code_namespace, deadline=deadline)
+    elif tool == "take_screenshot_and_analyze":
+        return await tool_take_screenshot_and_analyze(
+            page,
+            action.get("analysis_prompt"),
+            selector=action.get("selector"),
+            clip=action.get("clip"),
+            deadline=deadline
+        )
+    return f"Error: LLM returned an unknown tool: '{tool}'."
+
+async def execute_batch(page: Page, actions: list, code_namespace: str, deadline: Deadline = None) -> str:
+    """
+    Runs several independent actions and returns their combined output.
+    read_file/call_api run concurrently; page actions run in order, and so do
+    run_python_code calls (they share one namespace); all three lanes overlap.
+    """
+    results = [None] * len(actions)
+
+    async def run_one(index: int, action: dict):
+        try:
+            results[index] = await execute_action(page, action, code_namespace, deadline)
+        except Exception as e:
+            results[index] = f"Error: {e}"
+
+    async def run_in_order(indexed: list):
+        for index, action in indexed:
+            await run_one(index, action)
+
+    concurrent, page_lane, python_lane = [], [], []
+    for index, action in enumerate(actions):
+        tool = action.get("tool")
+        if tool in CONCURRENT_TOOLS:
+            concurrent.append(run_one(index, action))
+        elif tool == "run_python_code":
+            python_lane.append((index, action))
+        else:
+            page_lane.append((index, action))
+
+    await asyncio.gather(run_in_order(page_lane), run_in_order(python_lane), *concurrent)
+    return "\n\n".join(
+        f"[{index + 1}] {action.get('tool')}: {results[index]}" for index, action in enumerate(actions)
+    )
+
+async def submit_action(page: Page, action: dict, task_url: str, deadline: Deadline = None) -> dict:
+    """Posts the answer from a submit_answer action and returns the server's JSON response."""
+    submission_payload = {
+        "email": os.environ.get("STUDENT_EMAIL", "default@email.com"),
+        "secret": os.environ.get("SECRET_KEY"),
+        "url": task_url, # Use the original task URL, not current page.url
+        "answer": action.get("answer_json", {}).get("answer")
+    }
+    async with span("tool.submit_answer"):
+        result = await tool_submit_answer(
+            action.get("submission_url"),
+            submission_payload,
+            base_url=page.url,
+            deadline=deadline
+        )
+    TOOL_CALLS.inc(tool="submit_answer", outcome="correct" if result.get("correct") else "incorrect")
+    return result
+
+async def run_single_task_loop(page: Page, task_hint: str, task_url: str, retrying: bool = False,
+                               deadline: Deadline = None):
     """
     This is the "Inner Loop" (Solver).
     It runs a "See-Think-Act" loop to solve a *single* task URL.
     It exits by calling "submit_answer" and returning the JSON response.
+    When `retrying` after a wrong answer, cached LLM responses are bypassed and the
+    strong model is used from the start.
+    Every step is bounded by `deadline`; near the end the LLM is told to submit now.
     """
-    print(f"[SOLVER] 🤖 Starting new task. Hint: {task_hint[:100]}...")
-    
-    message_history = []
+    log.info("Starting new task", extra={"url": task_url, "hint": task_hint[:100]})
+    deadline = deadline or Deadline(DEFAULT_BUDGET_SECONDS)
     
+    message_history = ConversationHistory()
+    # Sandbox namespace shared by this task's run_python_code calls
+    code_namespace = uuid.uuid4().hex
+    # Prefetched results are only served to this task's tools
+    prefetcher = Prefetcher()
+    prefetch_token = bind_prefetcher(prefetcher)
+    task_token = bind_task(code_namespace[:12])
+    try:
+        async with span("task", url=task_url, retrying=retrying):
+            return await _solve_task(page, task_hint, task_url, message_history, code_namespace, retrying,
+                                     prefetcher, deadline)
+    finally:
+        prefetcher.cancel()
+        unbind_prefetcher(prefetch_token)
+        get_sandbox_pool().drop_namespace(code_namespace)
+        unbind_task(task_token)
+
+async def _solve_task(page: Page, task_hint: str, task_url: str, message_history: ConversationHistory,
+                      code_namespace: str, retrying: bool, prefetcher: Prefetcher, deadline: Deadline):
+    compactor = PageCompactor()
+    readiness = PageReadiness()
+    touched_page = False
+    urgent_notified = False
+    last_index_summary = ""
+    gateway = get_llm_gateway()
+    # Steps go to the fast model until it fails; a retry after a wrong answer starts escalated
+    escalated = False
+    if retrying:
+        _escalate(gateway.fast_model or gateway.strong_model, "wrong_answer")
+        escalated = True
+
     for i in range(15):
-        print(f"\n[SOLVER] --- Loop {i+1} / 15 ---")
-        
-        print("[SOLVER]  👀 Seeing (Extracting page content)...")
-        await page.wait_for_load_state("domcontentloaded", timeout=10000)
-        
-        # On first iteration, extract rendered quiz content; on subsequent iterations, get current page state
-        if i == 0:
-            page_content = await extract_rendered_quiz_content(page)
-        else:
-            await asyncio.sleep(0.5)
-            page_content = await page.content()
-        
-        # Extract submission URL from page content to help the LLM
-        detected_submission_url = extract_submission_url(page_content)
-        
-        formatted_prompt = SYSTEM_PROMPT.format(task_hint=task_hint, html_content=page_content)
-        
-        if detected_submission_url:
-            formatted_prompt += f"\n\n**HINT:** I found a likely submission URL on the page: {detected_submission_url}\nPlease use this URL for the 'submission_url' field in the submit_answer tool."
-        
-        if not message_history:
-            message_history.append({"role": "system", "content": "You must respond with a single valid JSON tool command."})
-            message_history.append({"role": "user", "content": formatted_prompt})
-        else:
-            message_history.append({"role": "user", "content": f"New Page Content:\n{page_content}"})
+        log.info(f"--- Loop {i+1} / 15 ---")
+        if deadline.exhausted:
+            log.warning(f"Out of time ({deadline.remaining():.0f}s left); giving up on this task.")
+            TIMEOUTS_TOTAL.inc(scope="task")
+            return {"correct": False, "reason": "Deadline reached before an answer was submitted.", "url": None}
+        async with span("loop", iteration=i + 1):
+            async with span("see") as see:
+                log.debug("Seeing (Extracting page content)...")
+                await page.wait_for_load_state("domcontentloaded", timeout=deadline.timeout(10.0) * 1000)
 
+                # On first iteration, wait for the rendered quiz content; on subsequent iterations, get current page state
+                if i == 0:
+                    rendered_text = await extract_rendered_quiz_content(page)
+                    await readiness.observe(page)
+                else:
+                    # Skips the wait entirely when the last action did not touch an unchanged page
+                    see.set(waited=await readiness.wait(page, touched_page))
+                    rendered_text = None
 
-        try:
-            llm_client = get_llm_client()
-            model_name = os.environ.get("LLM_MODEL", "google/gemini-2.5-pro")
-            print(f"[SOLVER]  🧠 Thinking (Calling {model_name})...")
-            response = await llm_client.chat.completions.create(
-                model=model_name,
-                messages=message_history,
-                response_format={"type": "json_object"}
-            )
-            llm_response_text = response.choices[0].message.content
-            print(f"[SOLVER]  LLM response: {llm_response_text}")
-            message_history.append({"role": "assistant", "content": llm_response_text})
-        except Exception as e:
-            print(f"[SOLVER] ❌ LLM call failed: {traceback.format_exc()}")
-            message_history.append({"role": "user", "content": f"LLM Error: {e}. Please try again."})
-            continue
+                # Compact the DOM (or diff it against the last snapshot) to stay within the token budget
+                page_content = compactor.render(await page.content())
+                see.set(page_tokens=estimate_tokens(page_content))
+                log.debug(f"Page content: {len(page_content)} chars (~{estimate_tokens(page_content)} tokens)")
 
-        try:
-            try:
-                # Clean up markdown code blocks if present
-                cleaned_json = llm_response_text.strip()
-                
-                # Try to find JSON object boundaries
-                start_idx = cleaned_json.find('{')
-                end_idx = cleaned_json.rfind('}')
-                
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    cleaned_json = cleaned_json[start_idx:end_idx+1]
-                
-                action_json = json.loads(cleaned_json)
-            except json.JSONDecodeError:
-                raise ValueError(f"LLM returned invalid JSON: {llm_response_text}")
-
-            tool = action_json.get("tool")
-            result = f"Error: Unknown tool '{tool}'."
-
-            if tool == "click":
-                result = await tool_click(page, action_json.get("selector"))
-            elif tool == "fill_text":
-                result = await tool_fill_text(page, action_json.get("selector"), action_json.get("text"))
-            elif tool == "call_api":
-                result = await tool_call_api(action_json.get("url"), action_json.get("headers"))
-            elif tool == "read_file":
-                result = await tool_read_file(action_json.get("url"), base_url=page.url)
-            elif tool == "run_python_code":
-                result = await tool_run_python_code(action_json.get("code"))
-            elif tool == "take_screenshot_and_analyze":
-                result = await tool_take_screenshot_and_analyze(page, action_json.get("analysis_prompt"))
-            
-            elif tool == "submit_answer":
-                submission_payload = {
-                    "email": os.environ.get("STUDENT_EMAIL", "default@email.com"),
-                    "secret": os.environ.get("SECRET_KEY"),
-                    "url": task_url, # Use the original task URL, not current page.url
-                    "answer": action_json.get("answer_json", {}).get("answer")
-                }
-                result = await tool_submit_answer(
-                    action_json.get("submission_url"), 
-                    submission_payload,
-                    base_url=page.url
-                )
-                print(f"[SOLVER] ✅ Task submission complete.")
-                return result
+                # One indexing pass per DOM version feeds the prefetcher, the hint and the prompt
+                index = await index_page(page)
+
+                # Start downloading linked data files/APIs while the LLM thinks
+                prefetcher.start(index)
+
+                if index is not None:
+                    detected_submission_url = index.submit_url
+                    index_summary = index.summary()
+                else:
+                    detected_submission_url = extract_submission_url(rendered_text or compactor.last_snapshot)
+                    index_summary = ""
+
+            formatted_prompt = SYSTEM_PROMPT.format(task_hint=task_hint, html_content=page_content)
+
+            if index_summary:
+                formatted_prompt += f"\n\n**PAGE INDEX:**\n{index_summary}"
+
+            if detected_submission_url:
+                formatted_prompt += f"\n\n**HINT:** I found a likely submission URL on the page: {detected_submission_url}\nPlease use this URL for the 'submission_url' field in the submit_answer tool."
+
+            if not message_history:
+                message_history.pin("system", "You must respond with a single valid JSON tool command.")
+                message_history.pin("user", formatted_prompt)
             else:
-                result = f"Error: LLM returned an unknown tool: '{tool}'."
+                page_message = f"New Page Content:\n{page_content}"
+                if index_summary and index_summary != last_index_summary:
+                    page_message += f"\n\nPage index:\n{index_summary}"
+                message_history.add("user", page_message, kind="page")
+            last_index_summary = index_summary
+
+            if deadline.urgent and not urgent_notified:
+                log.warning(f"{deadline.usable():.0f}s left; switching to submit-now mode.")
+                message_history.add("user", URGENT_MESSAGE.format(seconds=int(deadline.usable())))
+                urgent_notified = True
+
+            try:
+                async with span("think") as think:
+                    llm_client = get_llm_client()
+                    model_name = gateway.choose_model(escalated, deadline)
+                    messages = message_history.render()
+                    think.set(history_tokens=message_history.token_count(), model=model_name)
+                    log.info(f"Thinking (Calling {model_name}, ~{message_history.token_count()} tokens)...")
+                    llm_response_text, cache_key = await asyncio.wait_for(
+                        cached_chat_completion(
+                            llm_client,
+                            model_name,
+                            messages,
+                            bypass=retrying,
+                            completion_fn=gateway.wrap(
+                                make_streaming_completion(page.url) if LLM_STREAMING else create_completion,
+                                deadline
+                            ),
+                            response_format={"type": "json_object"}
+                        ),
+                        timeout=deadline.timeout(LLM_CALL_TIMEOUT)
+                    )
+                log.info("LLM response", extra={"response": llm_response_text})
+                message_history.add("assistant", llm_response_text, kind="assistant")
+            except asyncio.TimeoutError:
+                log.warning(f"LLM call timed out ({deadline.remaining():.0f}s left in the job).")
+                TIMEOUTS_TOTAL.inc(scope="llm")
+                message_history.add("user", "LLM Error: the previous call timed out. Please respond faster.", kind="error")
+                touched_page = False
+                continue
+            except Exception as e:
+                log.exception("LLM call failed")
+                _escalate(model_name, "error")
+                escalated = True
+                message_history.add("user", f"LLM Error: {e}. Please try again.", kind="error")
+                touched_page = False
+                continue
+
+            touched_page = False
+            try:
+                async with span("act") as act:
+                    try:
+                        # Clean up markdown code blocks if present
+                        cleaned_json = llm_response_text.strip()
+
+                        # Try to find JSON object boundaries
+                        start_idx = cleaned_json.find('{')
+                        end_idx = cleaned_json.rfind('}')
+
+                        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+                            cleaned_json = cleaned_json[start_idx:end_idx+1]
+
+                        action_json = json.loads(cleaned_json)
+                    except json.JSONDecodeError:
+                        if cache_key:
+                            # Never replay a response we could not use
+                            await asyncio.to_thread(get_llm_cache().delete, cache_key)
+                        _escalate(model_name, "invalid_output")
+                        escalated = True
+                        raise ValueError(f"LLM returned invalid JSON: {llm_response_text}")
+
+                    actions = action_json.get("actions")
+                    if isinstance(actions, list) and actions:
+                        actions = [a for a in actions[:MAX_BATCH_ACTIONS] if isinstance(a, dict)]
+                    else:
+                        actions = [action_json]
+                    act.set(actions=len(actions))
+
+                    touched_page = any(a.get("tool") in PAGE_MUTATING_TOOLS for a in actions)
+                    submit = next((a for a in actions if a.get("tool") == "submit_answer"), None)
+                    others = [a for a in actions if a.get("tool") != "submit_answer"]
+                    if submit is not None and others and deadline.urgent:
+                        # No time for the extra steps: submit what the LLM already has
+                        log.warning(f"Skipping {len(others)} actions to submit in time.")
+                        others = []
+
+                    result = "Error: No valid action found in the response."
+                    if len(others) == 1:
+                        result = await execute_action(page, others[0], code_namespace, deadline)
+                    elif others:
+                        log.info(f"Running batch of {len(others)} actions...")
+                        result = await execute_batch(page, others, code_namespace, deadline)
+
+                    if submit is not None and others:
+                        # The answer was written before these results existed: show them and let
+                        # the LLM submit again on its own instead of posting a stale answer
+                        log.info(f"Held back submit_answer batched with {len(others)} other actions.")
+                        result = (f"{result}\n\nNOTE: submit_answer was NOT sent because it was batched with "
+                                  "other actions. Review the results above, then send submit_answer on its own.")
+                    elif submit is not None:
+                        result = await submit_action(page, submit, task_url, deadline)
+                        log.info("Task submission complete.")
+                        return result
+
+                log.info("Tool output", extra={"output": result})
+                message_history.add("user", f"Tool Output: {result}", kind="tool")
+
+            except Exception as e:
+                log.exception("Error in agent loop (ACT phase)")
+                message_history.add("user", f"Error: {e}. Please try again.", kind="error")
 
-            print(f"[SOLVER]  Tool output: {result[:500]}...")
-            message_history.append({"role": "user", "content": f"Tool Output: {result}"})
-            
-        except Exception as e:
-            print(f"[SOLVER] ❌ Error in agent loop (ACT phase): {traceback.format_exc()}")
-            message_history.append({"role": "user", "content": f"Error: {e}. Please try again."})
-            
     return {"correct": False, "reason": "Solver reached max 15 loops.", "url": None}
 
-async def solve_quiz_task(task_data: dict):
+async def solve_quiz_task(task_data: dict, deadline: Deadline = None, resume: dict = None,
+                          checkpoint: Optional[Callable[..., Awaitable[bool]]] = None):
     """
     This is the "Outer Loop" (Supervisor).
-    It manages the entire 180s session and task chain.
+    It manages the entire 180s session and task chain within `deadline`.
+    Progress (current URL, attempt) is saved through `checkpoint` before
+    every attempt; a chain taken over from a crashed worker starts from `resume`.
+    Returns the outcome: whether the chain completed (last answer correct, no
+    next URL), why it stopped otherwise, and the last submission response.
+    Errors are raised to the caller.
     """
+    deadline = deadline or Deadline(DEFAULT_BUDGET_SECONDS)
+    resume = resume or {}
     
     os.environ["STUDENT_EMAIL"] = task_data.get("email", "default@email.com")
 
-    current_url = task_data.get("url")
+    current_url = resume.get("current_url") or task_data.get("url")
     # task_hint will be extracted from the quiz page, not from request
-    task_hint = None
+    task_hint = resume.get("task_hint")
+    retrying = resume.get("retrying", False)
+    attempt = resume.get("attempt", 0)
+    if resume:
+        supervisor_log.info(f"Resuming chain at {current_url} after {attempt} attempt(s).")
+    outcome = {"completed": False, "reason": "Stopped before an answer was submitted.", "last_response": None}
+
+    async def save_progress() -> bool:
+        if checkpoint is None:
+            return True
+        return await checkpoint(current_url=current_url, attempt=attempt, retrying=retrying, task_hint=task_hint)
     
     if not current_url:
-        print("[SUPERVISOR] ❌ FAILED: No 'url' field in initial task_data.")
-        return
+        supervisor_log.error("FAILED: No 'url' field in initial task_data.")
+        return {**outcome, "reason": "No 'url' field in the request."}
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True, args=['--no-sandbox'])
-            page = await browser.new_page(user_agent=USER_AGENT)
-            
+        pool = await get_browser_pool()
+        async with pool.page(user_agent=USER_AGENT) as page:
             while current_url:
-                print(f"\n[SUPERVISOR] ➡️ Loading new task URL: {current_url}")
-                await page.goto(current_url, wait_until="domcontentloaded", timeout=10000)
+                supervisor_log.info(f"Loading new task URL: {current_url}")
+                async with span("navigate"):
+                    await page.goto(current_url, wait_until="domcontentloaded", timeout=deadline.timeout(10.0) * 1000)
                 
                 # Extract task hint from the quiz page if not set
                 if task_hint is None:
                     quiz_content = await extract_rendered_quiz_content(page)
                     # Use the quiz content as the task hint (first 500 chars for brevity)
                     task_hint = quiz_content[:500] if quiz_content else "Solve the task on the page."
-                    print(f"[SUPERVISOR] Extracted task hint from quiz page ({len(task_hint)} chars)")
+                    supervisor_log.info(f"Extracted task hint from quiz page ({len(task_hint)} chars)")
 
-                submission_response = await run_single_task_loop(page, task_hint, current_url)
+                task_url = current_url
+                attempt += 1
+                if not await save_progress():
+                    supervisor_log.warning("Another worker took over this chain. Stopping.")
+                    outcome["reason"] = "Another worker took over this chain."
+                    break
+                attempt_started = time.monotonic()
+                submission_response = await run_single_task_loop(
+                    page, task_hint, current_url, retrying=retrying, deadline=deadline
+                )
+                attempt_seconds = time.monotonic() - attempt_started
                 
-                print(f"[SUPERVISOR]  Submission response: {submission_response}")
+                supervisor_log.info("Submission response", extra={"response": submission_response})
+                outcome["last_response"] = submission_response
                 
                 current_url = submission_response.get("url")
                 
                 if current_url:
-                    print(f"[SUPERVISOR]  Chain continues. Next URL: {current_url}")
+                    if deadline.exhausted:
+                        supervisor_log.warning(f"No time left for the next task ({current_url}). Stopping.")
+                        outcome["reason"] = f"No time left for the next task ({current_url})."
+                        break
+                    supervisor_log.info(f"Chain continues. Next URL: {current_url}")
                     # Reset task_hint so it will be extracted from the new page
                     task_hint = None
+                    retrying = False
+                    attempt = 0
+                    await save_progress()
                 
                 elif submission_response.get("correct") == True:
-                    print("[SUPERVISOR] ✅ Chain complete. No new URL provided.")
+                    supervisor_log.info("Chain complete. No new URL provided.")
+                    outcome.update(completed=True, reason="Chain complete.")
+                    break
+                
+                elif not deadline.can_attempt(attempt_seconds):
+                    supervisor_log.warning(f"Answer incorrect, but {deadline.usable():.0f}s cannot cover another "
+                          f"attempt (last one took {attempt_seconds:.0f}s). Stopping.")
+                    outcome["reason"] = "Answer incorrect, with no time left for another attempt."
                     break
                 
                 else:
-                    print("[SUPERVISOR] ⚠️ Answer incorrect. Retrying same URL.")
+                    supervisor_log.warning("Answer incorrect. Retrying same URL.")
+                    current_url = task_url
                     task_hint = f"Previous attempt was wrong: {submission_response.get('reason')}. Please try again."
+                    retrying = True
+                    await save_progress()
+
+        supervisor_log.info("Browser context released. Session complete.")
             
-            await browser.close()
-            print("[SUPERVISOR]  Browser closed. Session complete.")
-            
-    except Exception as e:
-        print(f"[SUPERVISOR] ❌ CRITICAL FAILURE in task: {traceback.format_exc()}")
+    except Exception:
+        supervisor_log.error("CRITICAL FAILURE in task")
+        raise
     finally:
-        print(f"--------------------------------------------------")
\ No newline at end of file
+        supervisor_log.info("Supervisor finished.")
+    return outcome
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Cold-start check: imports the app (`main`) in fresh interpreters and fails
+when the import takes longer than the budget or loads modules that must only
+be imported on first use (pandas, playwright, openai, ...).
+
+    python -m bench.import_budget
+    python -m bench.import_budget --budget-ms 800 --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules the app must not import just to start serving /health
+LAZY_MODULES = ("pandas", "numpy", "pdfplumber", "playwright", "openai", "PIL", "matplotlib", "pyarrow", "httpx")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def _slowest_imports(stderr: str, limit: int) -> list[tuple[str, int]]:
+    """Top-level packages by cumulative time from `python -X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the one that triggered them
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            rows.append((name.strip(), int(cumulative)))
+    return sorted(rows, key=lambda row: -row[1])[:limit]
+
+
+def probe(root: str) -> tuple[dict, str]:
+    env = dict(os.environ, SECRET_KEY=os.environ.get("SECRET_KEY", "import-budget"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=root, env=env, capture_output=True, text=True, check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the app's import time and lazy imports.")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Fail when importing main takes longer.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to time; the fastest run counts.")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list.")
+    args = parser.parse_args(argv)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    runs = [probe(root) for _ in range(max(1, args.runs))]
+    best, stderr = min(runs, key=lambda run: run[0]["seconds"])
+    best_ms = best["seconds"] * 1000
+
+    print(f"import main: {best_ms:.0f} ms (fastest of {len(runs)}, budget {args.budget_ms:.0f} ms)")
+    print("\nslowest top-level imports (cumulative ms):")
+    for name, micros in _slowest_imports(stderr, args.top):
+        print(f"  {name:<30} {micros / 1000:>8.1f}")
+
+    problems = []
+    if best_ms > args.budget_ms:
+        problems.append(f"import took {best_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if best["loaded"]:
+        problems.append(f"imported at startup instead of on first use: {', '.join(best['loaded'])}")
+    if problems:
+        print("\n❌ " + "\n❌ ".join(problems))
+        return 1
+    print("\n✅ Within budget; heavy modules are imported lazily.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+OpenAI-compatible mock LLM (`POST /v1/chat/completions`, streaming or not).
+Answers the bench quiz chains with scripted tool commands after a
+configurable latency, so runs need no real model or API key.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from bench.scenarios import build_chains, find_step
+
+_STEP_PATTERN = re.compile(r"BENCH-STEP:(c\d+-s\d+)")
+_SUBMIT_PATTERN = re.compile(r"Post your answer to (https?://\S+?)/submit")
+
+
+def _text_of(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content or [] if isinstance(part, dict))
+
+
+def script_for(step, base_url: str) -> list[dict]:
+    """Tool commands that solve `step`, one per LLM turn; the last one submits."""
+    submit = {
+        "tool": "submit_answer",
+        "submission_url": f"{base_url}/submit",
+        "answer_json": {"answer": step.answer},
+    }
+    data_url = step.data_url(base_url)
+    if step.kind == "csv":
+        return [
+            {"tool": "read_file", "url": data_url},
+            {"tool": "run_python_code",
+             "code": f"import pandas as pd\nprint(pd.read_csv({data_url!r})['value'].sum())"},
+            submit,
+        ]
+    if step.kind == "api":
+        return [{"tool": "call_api", "url": data_url}, submit]
+    if step.kind == "pdf":
+        return [{"tool": "read_file", "url": data_url, "pages": "1", "tables": True}, submit]
+    return [submit]
+
+
+def next_command(chains, messages: list[dict]) -> str:
+    """Picks the scripted command for the step named in the conversation."""
+    step, base_url = None, ""
+    for message in messages:
+        text = _text_of(message)
+        for match in _STEP_PATTERN.finditer(text):
+            step = find_step(chains, match.group(1)) or step
+        submit_match = _SUBMIT_PATTERN.search(text)
+        if submit_match:
+            base_url = submit_match.group(1)
+    if step is None:
+        return json.dumps({"tool": "click", "selector": "body"})
+    script = script_for(step, base_url)
+    turns = sum(1 for message in messages if message.get("role") == "assistant")
+    return json.dumps(script[min(turns, len(script) - 1)])
+
+
+class MockLLMStats:
+    def __init__(self):
+        self.requests = 0
+        self.streamed = 0
+        self.prompt_chars = 0
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "streamed": self.streamed, "prompt_chars": self.prompt_chars}
+
+
+def create_app(chain_count: int, chain_length: int = 4, latency_ms: float = 300.0,
+               jitter_ms: float = 100.0, tokens_per_second: float = 200.0) -> FastAPI:
+    chains = build_chains(chain_count, chain_length)
+    stats = MockLLMStats()
+    app = FastAPI(title="Bench mock LLM")
+    app.state.stats = stats
+
+    async def think():
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "bench-model")
+        prompt_chars = sum(len(_text_of(message)) for message in messages)
+        stats.requests += 1
+        stats.prompt_chars += prompt_chars
+
+        if body.get("response_format", {}).get("type") == "json_object":
+            text = next_command(chains, messages)
+        else:
+            # Vision and other free-text calls
+            text = "Mock analysis: nothing notable on the page."
+        await think()
+
+        created = int(time.time())
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_chars // 4,
+                    "completion_tokens": len(text) // 4,
+                    "total_tokens": (prompt_chars + len(text)) // 4,
+                },
+            }
+
+        stats.streamed += 1
+
+        async def events():
+            # Roughly one token (4 chars) per chunk
+            for start in range(0, len(text), 4):
+                chunk = {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text[start:start + 4]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / tokens_per_second)
+            done = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def read_stats():
+        return stats.to_dict()
+
+    return app
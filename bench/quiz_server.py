@@ -0,0 +1,138 @@
+"""
+Local stand-in for the quiz site: JS-rendered task pages, CSV/PDF files, JSON
+APIs and a submit endpoint that returns the next `url` of the chain.
+"""
+import base64
+import io
+import json
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+
+from bench.scenarios import build_chains, find_step
+
+# The instructions are rendered client-side, like on the real quiz pages
+_PAGE_TEMPLATE = """<!doctype html>
+<html>
+<head><title>Bench quiz {step_id}</title></head>
+<body>
+<h1>Quiz</h1>
+<div id="result"></div>
+<script>
+setTimeout(() => {{
+    document.querySelector('#result').innerHTML = atob('{encoded}');
+}}, {render_delay_ms});
+</script>
+</body>
+</html>
+"""
+
+
+class QuizStats:
+    def __init__(self):
+        self.correct = 0
+        self.incorrect = 0
+        self.chains_completed = 0
+        self.downloads = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "correct": self.correct,
+            "incorrect": self.incorrect,
+            "chains_completed": self.chains_completed,
+            "downloads": self.downloads,
+        }
+
+
+def _render_pdf(step) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table
+
+    buffer = io.BytesIO()
+    rows = [["row", "value"]] + [[str(i + 1), str(value)] for i, value in enumerate(step.values)]
+    SimpleDocTemplate(buffer, pagesize=A4).build([Table(rows)])
+    return buffer.getvalue()
+
+
+def _answers_match(expected, given) -> bool:
+    if isinstance(expected, (int, float)):
+        try:
+            return abs(float(given) - expected) < 1e-6
+        except (TypeError, ValueError):
+            return False
+    return str(given).strip() == str(expected)
+
+
+def create_app(chain_count: int, chain_length: int = 4, render_delay_ms: int = 50) -> FastAPI:
+    chains = build_chains(chain_count, chain_length)
+    stats = QuizStats()
+    pdf_cache: dict[str, bytes] = {}
+    app = FastAPI(title="Bench quiz server")
+    app.state.chains = chains
+    app.state.stats = stats
+
+    def base_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    def step_or_404(step_id: str):
+        step = find_step(chains, step_id)
+        if step is None:
+            raise HTTPException(status_code=404, detail="Unknown step.")
+        return step
+
+    @app.get("/quiz/{step_id}", response_class=HTMLResponse)
+    def quiz_page(step_id: str, request: Request):
+        step = step_or_404(step_id)
+        base = base_url(request)
+        instructions = (
+            f"<p>BENCH-STEP:{step.id}</p>"
+            f"<p>{step.question(base)}</p>"
+            f"<p>Post your answer to {base}/submit with this JSON payload: "
+            f'{{"email": "...", "secret": "...", "url": "{base}/quiz/{step.id}", "answer": ...}}</p>'
+        )
+        encoded = base64.b64encode(instructions.encode("utf-8")).decode("ascii")
+        return _PAGE_TEMPLATE.format(step_id=step.id, encoded=encoded, render_delay_ms=render_delay_ms)
+
+    @app.get("/data/{step_id}.csv")
+    def csv_file(step_id: str):
+        step = step_or_404(step_id)
+        stats.downloads += 1
+        body = "row,value\n" + "".join(f"{i + 1},{value}\n" for i, value in enumerate(step.values))
+        return Response(body, media_type="text/csv")
+
+    @app.get("/data/{step_id}.pdf")
+    def pdf_file(step_id: str):
+        step = step_or_404(step_id)
+        stats.downloads += 1
+        if step.id not in pdf_cache:
+            pdf_cache[step.id] = _render_pdf(step)
+        return Response(pdf_cache[step.id], media_type="application/pdf")
+
+    @app.get("/api/{step_id}")
+    def api(step_id: str):
+        step = step_or_404(step_id)
+        return {"step": step.id, "values": step.values}
+
+    @app.post("/submit")
+    async def submit(request: Request):
+        try:
+            payload = await request.json()
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+        step_id = str(payload.get("url", "")).rstrip("/").rsplit("/", 1)[-1]
+        step = step_or_404(step_id)
+        if not _answers_match(step.answer, payload.get("answer")):
+            stats.incorrect += 1
+            return JSONResponse({"correct": False, "reason": "Wrong answer.", "url": None})
+        stats.correct += 1
+        chain = chains[step.chain]
+        if step.index + 1 < len(chain):
+            return {"correct": True, "reason": None, "url": f"{base_url(request)}/quiz/{chain[step.index + 1].id}"}
+        stats.chains_completed += 1
+        return {"correct": True, "reason": None, "url": None}
+
+    @app.get("/stats")
+    def read_stats():
+        return stats.to_dict()
+
+    return app
@@ -0,0 +1,320 @@
+"""
+Offline end-to-end benchmark.
+
+Starts the local quiz server, the mock LLM and the agent app in one process,
+replays quiz payloads at a fixed concurrency and reports chain latency
+percentiles, throughput, peak RSS and a per-phase breakdown.
+
+    python -m bench.run --jobs 12 --concurrency 4
+    python -m bench.run --baseline bench/baseline.json      # exit 1 on regression
+    python -m bench.run --save-baseline bench/baseline.json
+
+Payloads can be replayed from a JSONL file (`--payloads`), one
+{"email", "url"} object per line; "{quiz}" in a url is replaced by the local
+quiz server's address.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+SECRET = "bench-secret"
+# Finished job statuses reported by GET /jobs/{id}
+_FINAL_STATUSES = {"done", "timeout", "failed", "cancelled"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _configure_agent_env(args, llm_port: int, workdir: str):
+    """Points the agent at the mock LLM. Must run before the agent modules are imported."""
+    os.environ.update({
+        "SECRET_KEY": SECRET,
+        "AIPIPE_API_KEY": "bench",
+        "AIPIPE_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "LLM_MODEL": "bench-model",
+        "JOB_CONCURRENCY": str(args.concurrency),
+        "JOB_QUEUE_DEPTH": str(max(args.jobs, 1)),
+        "LLM_CACHE_ENABLED": "0",
+        # Jobs left over from earlier runs must not be picked up
+        "JOB_STORE_URL": "memory://",
+        "DOWNLOAD_DIR": os.path.join(workdir, "downloads"),
+    })
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _process_tree_rss() -> int:
+    """RSS of this process plus all descendants (browsers, sandbox and PDF workers)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the ppid follows the closing paren
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree = {os.getpid()}
+    grew = True
+    while grew:
+        children = {pid for pid, ppid in parents.items() if ppid in tree and pid not in tree}
+        tree |= children
+        grew = bool(children)
+    return sum(_rss_bytes(pid) for pid in tree)
+
+
+class RSSSampler:
+    """Samples the RSS of the whole process tree and keeps the peak."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, await asyncio.to_thread(self.sample))
+            await asyncio.sleep(self.interval)
+
+    def sample(self) -> int:
+        if os.path.isdir("/proc"):
+            return _process_tree_rss()
+        import resource
+        # ru_maxrss is in KiB on Linux; only covers this process
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_payloads(args, quiz_base: str, chains) -> list[dict]:
+    if args.payloads:
+        payloads = []
+        with open(args.payloads) as f:
+            for line in f:
+                if line.strip():
+                    payload = json.loads(line)
+                    payload["url"] = payload["url"].replace("{quiz}", quiz_base)
+                    payloads.append(payload)
+        return payloads
+    return [
+        {"email": f"bench{i}@example.com", "url": f"{quiz_base}/quiz/{chains[i % len(chains)][0].id}"}
+        for i in range(args.jobs)
+    ]
+
+
+async def _start_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def _wait_ready(client, agent_base: str, timeout: float = 180.0):
+    deadline = time.monotonic() + timeout
+    # "degraded" (a warm-up step failed) is not waited out: the run then shows the failures
+    while (await client.get(f"{agent_base}/ready")).json()["status"] == "warming":
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Agent not ready after {timeout:.0f}s.")
+        await asyncio.sleep(0.2)
+
+
+async def _run_job(client, agent_base: str, payload: dict, semaphore: asyncio.Semaphore, poll: float) -> dict:
+    async with semaphore:
+        submitted = time.perf_counter()
+        response = await client.post(f"{agent_base}/quiz", json={"secret": SECRET, **payload})
+        if response.status_code != 200:
+            return {"status": f"http_{response.status_code}", "latency": 0.0, "url": payload.get("url")}
+        job_id = response.json()["job_id"]
+        while True:
+            await asyncio.sleep(poll)
+            job = (await client.get(f"{agent_base}/jobs/{job_id}")).json()
+            if job["status"] in _FINAL_STATUSES:
+                job["latency"] = time.perf_counter() - submitted
+                return job
+
+
+def phase_breakdown() -> dict:
+    from agent.core.metrics import SPAN_SECONDS
+
+    phases = {}
+    for key, (total, count) in SPAN_SECONDS.snapshot().items():
+        name = dict(key).get("span", "?")
+        phases[name] = {"count": count, "total_s": round(total, 3), "mean_s": round(total / count, 4) if count else 0.0}
+    return dict(sorted(phases.items(), key=lambda item: -item[1]["total_s"]))
+
+
+async def run_benchmark(args) -> dict:
+    from bench import mock_llm, quiz_server
+    from bench.scenarios import build_chains
+
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    quiz_port, llm_port, agent_port = _free_port(), _free_port(), _free_port()
+    _configure_agent_env(args, llm_port, workdir)
+    os.chdir(workdir)
+
+    # Imported only now: the agent reads its configuration at import time
+    import httpx
+    from main import app as agent_app
+
+    chains = build_chains(args.chains, args.chain_length)
+    quiz_app = quiz_server.create_app(args.chains, args.chain_length)
+    llm_app = mock_llm.create_app(args.chains, args.chain_length, latency_ms=args.llm_latency_ms,
+                                  jitter_ms=args.llm_jitter_ms)
+    quiz_base, agent_base = f"http://127.0.0.1:{quiz_port}", f"http://127.0.0.1:{agent_port}"
+
+    servers = [
+        await _start_server(quiz_app, quiz_port),
+        await _start_server(llm_app, llm_port),
+        await _start_server(agent_app, agent_port),
+    ]
+    sampler = RSSSampler()
+    sampler.start()
+    try:
+        payloads = load_payloads(args, quiz_base, chains)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            # Warm-up runs in the background; measure from a warm agent as before
+            await _wait_ready(client, agent_base)
+            started = time.perf_counter()
+            jobs = await asyncio.gather(*(
+                _run_job(client, agent_base, payload, semaphore, args.poll_interval) for payload in payloads
+            ))
+        wall = time.perf_counter() - started
+    finally:
+        await sampler.stop()
+        for server, _ in reversed(servers):
+            server.should_exit = True
+        await asyncio.gather(*(task for _, task in servers), return_exceptions=True)
+
+    latencies = [job["latency"] for job in jobs if job.get("status") == "done"]
+    statuses = {}
+    for job in jobs:
+        statuses[job.get("status")] = statuses.get(job.get("status"), 0) + 1
+    quiz_stats = quiz_app.state.stats.to_dict()
+    return {
+        "jobs": len(jobs),
+        "concurrency": args.concurrency,
+        "statuses": statuses,
+        "chains_completed": quiz_stats["chains_completed"],
+        "answers": {"correct": quiz_stats["correct"], "incorrect": quiz_stats["incorrect"]},
+        "llm_requests": llm_app.state.stats.requests,
+        "wall_seconds": round(wall, 3),
+        "latency_p50_s": round(percentile(latencies, 0.50), 3),
+        "latency_p95_s": round(percentile(latencies, 0.95), 3),
+        "jobs_per_minute": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+        "phases": phase_breakdown(),
+    }
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Compares a report with a saved baseline; returns one message per regression."""
+    problems = []
+    if report["chains_completed"] < report["jobs"]:
+        problems.append(f"only {report['chains_completed']}/{report['jobs']} chains completed")
+    for key in ("latency_p50_s", "latency_p95_s", "peak_rss_mb"):
+        limit = baseline.get(key, 0) * (1 + tolerance)
+        if baseline.get(key) and report[key] > limit:
+            problems.append(f"{key} {report[key]} > {limit:.3f} (baseline {baseline[key]})")
+    floor = baseline.get("jobs_per_minute", 0) * (1 - tolerance)
+    if baseline.get("jobs_per_minute") and report["jobs_per_minute"] < floor:
+        problems.append(f"jobs_per_minute {report['jobs_per_minute']} < {floor:.2f} (baseline {baseline['jobs_per_minute']})")
+    return problems
+
+
+def print_report(report: dict):
+    print("\n=== Benchmark ===")
+    print(f"jobs: {report['jobs']} (concurrency {report['concurrency']}), statuses: {report['statuses']}")
+    print(f"chains completed: {report['chains_completed']}, answers: {report['answers']}")
+    print(f"chain latency p50 {report['latency_p50_s']}s, p95 {report['latency_p95_s']}s")
+    print(f"throughput: {report['jobs_per_minute']} jobs/min over {report['wall_seconds']}s")
+    print(f"peak RSS: {report['peak_rss_mb']} MB, LLM requests: {report['llm_requests']}")
+    print("\nphase                          count    total_s   mean_s")
+    for name, phase in report["phases"].items():
+        print(f"{name:<30} {phase['count']:>5} {phase['total_s']:>10} {phase['mean_s']:>8}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end agent benchmark.")
+    parser.add_argument("--jobs", type=int, default=8, help="Quiz chains to run (ignored with --payloads).")
+    parser.add_argument("--concurrency", type=int, default=2, help="Jobs in flight at once.")
+    parser.add_argument("--chains", type=int, default=4, help="Distinct chains served by the quiz server.")
+    parser.add_argument("--chain-length", type=int, default=4, help="Steps per chain.")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Mock LLM time to respond.")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0, help="Random +/- jitter on the mock latency.")
+    parser.add_argument("--payloads", help="JSONL file of {email, url} payloads to replay.")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="Seconds between job status polls.")
+    parser.add_argument("--report", help="Write the JSON report to this file.")
+    parser.add_argument("--baseline", help="Fail (exit 1) when the run regresses against this report.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slack against the baseline.")
+    parser.add_argument("--save-baseline", help="Write the report as the new baseline.")
+    args = parser.parse_args(argv)
+
+    # Paths are resolved before the run switches to its scratch directory
+    for name in ("payloads", "report", "baseline", "save_baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+
+    for path in (args.report, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = find_regressions(report, baseline, args.tolerance)
+        if problems:
+            print("\n❌ Regressions against the baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print("\n✅ No regressions against the baseline.")
+    elif report["chains_completed"] < report["jobs"]:
+        print(f"\n❌ Only {report['chains_completed']}/{report['jobs']} chains completed.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Quiz chains served by the bench quiz server and answered by the mock LLM.
+Both sides build the same deterministic chains, so the mock "knows" each answer.
+"""
+import random
+
+# Step kinds, each exercising a different part of the agent
+STEP_KINDS = ("html", "csv", "api", "pdf")
+
+
+class Step:
+    def __init__(self, chain: int, index: int, kind: str, seed: int):
+        self.chain = chain
+        self.index = index
+        self.kind = kind
+        rng = random.Random(seed)
+        self.values = [rng.randint(1, 500) for _ in range(rng.randint(20, 60))]
+        self.code = f"{rng.getrandbits(32):08x}"
+
+    @property
+    def id(self) -> str:
+        return f"c{self.chain}-s{self.index}"
+
+    @property
+    def answer(self):
+        if self.kind == "html":
+            return self.code
+        return sum(self.values)
+
+    def question(self, base_url: str) -> str:
+        if self.kind == "html":
+            return f"The secret code for this step is {self.code}. Submit the secret code as the answer."
+        if self.kind == "csv":
+            return f"Download {base_url}/data/{self.id}.csv and submit the sum of the value column."
+        if self.kind == "api":
+            return f"Call the API at {base_url}/api/{self.id} and submit the sum of the values it returns."
+        return f"Read the table in {base_url}/data/{self.id}.pdf and submit the sum of the value column."
+
+    def data_url(self, base_url: str) -> str:
+        if self.kind == "csv":
+            return f"{base_url}/data/{self.id}.csv"
+        if self.kind == "api":
+            return f"{base_url}/api/{self.id}"
+        if self.kind == "pdf":
+            return f"{base_url}/data/{self.id}.pdf"
+        return ""
+
+
+def build_chains(count: int, length: int = 4, seed: int = 7) -> list[list[Step]]:
+    """Builds `count` chains of `length` steps, cycling through every step kind."""
+    chains = []
+    for chain in range(count):
+        chains.append([
+            Step(chain, index, STEP_KINDS[(chain + index) % len(STEP_KINDS)], seed * 100003 + chain * 101 + index)
+            for index in range(length)
+        ])
+    return chains
+
+
+def find_step(chains: list[list[Step]], step_id: str):
+    """Returns the step with `step_id` ("c<chain>-s<index>") or None."""
+    try:
+        chain, index = (int(part[1:]) for part in step_id.split("-"))
+        return chains[chain][index]
+    except (ValueError, IndexError):
+        return None
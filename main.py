@@ -1,10 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
-from agent.api.endpoints import router as api_router
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="LLM Router Agent")
+from agent.core.log import setup_logging, shutdown_logging
 
-app.include_router(api_router)
\ No newline at end of file
+# Structured, non-blocking logs for every "agent.*" logger
+setup_logging()
+
+from agent.api.endpoints import router as api_router, scheduler
+from agent.core.browser_pool import stop_browser_pool
+from agent.core.http_client import close_http_client
+from agent.core.pdf_engine import shutdown_pdf_executor
+from agent.core.sandbox import stop_sandbox_pool
+from agent.core.warmup import start_warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy resources (browser, sandbox workers, LLM connection) warm up in the background,
+    # so the port opens at once; GET /ready reports when they are up
+    warmup = start_warmup()
+    scheduler.start()
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+            await asyncio.gather(warmup, return_exceptions=True)
+        await scheduler.stop()
+        await stop_browser_pool()
+        await stop_sandbox_pool()
+        await close_http_client()
+        shutdown_pdf_executor()
+        shutdown_logging()
+
+
+app = FastAPI(title="LLM Router Agent", lifespan=lifespan)
+
+app.include_router(api_router)
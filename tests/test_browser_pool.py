@@ -0,0 +1,127 @@
+import asyncio
+
+from agent.core.browser_pool import BrowserPool
+
+
+class _FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def new_page(self):
+        return self
+
+    async def close(self):
+        pass
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        return _FakeContext(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakePlaywright:
+    def __init__(self):
+        self.launched: list[_FakeBrowser] = []
+        self.chromium = self
+
+    async def launch(self, **options):
+        browser = _FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+    async def stop(self):
+        pass
+
+
+async def _started_pool(**options) -> tuple[BrowserPool, _FakePlaywright]:
+    pool = BrowserPool(**options)
+    playwright = _FakePlaywright()
+    pool._playwright = playwright
+    await pool.start()
+    return pool, playwright
+
+
+def test_jobs_reuse_the_warm_browser_until_recycled():
+    async def scenario():
+        pool, playwright = await _started_pool(size=1, max_size=2, max_jobs=2)
+        browsers = []
+        for _ in range(3):
+            async with pool.page() as page:
+                browsers.append(page.browser)
+        await asyncio.sleep(0.01)  # Let the background top-up run
+        return browsers, playwright.launched, pool.stats
+
+    browsers, launched, stats = asyncio.run(scenario())
+    assert browsers[0] is browsers[1] is launched[0]
+    assert launched[0].closed
+    assert browsers[2] is launched[1]
+    assert stats == {"total": 1, "idle": 1, "in_use": 0, "max": 2}
+
+
+def test_jobs_wait_when_max_browsers_are_busy():
+    async def scenario():
+        pool, playwright = await _started_pool(size=0, max_size=1)
+        release = asyncio.Event()
+        order = []
+
+        async def job(name):
+            async with pool.page():
+                order.append(f"{name} start")
+                if name == "first":
+                    await release.wait()
+                order.append(f"{name} end")
+
+        first = asyncio.create_task(job("first"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(job("second"))
+        await asyncio.sleep(0.01)
+        assert order == ["first start"]
+        release.set()
+        await asyncio.gather(first, second)
+        return order, len(playwright.launched)
+
+    order, launched = asyncio.run(scenario())
+    assert order == ["first start", "first end", "second start", "second end"]
+    assert launched == 2  # Above the warm floor (0), each browser is closed after its job
+
+
+def test_idle_browser_that_crashed_is_replaced():
+    async def scenario():
+        pool, playwright = await _started_pool(size=1, max_size=1)
+        playwright.launched[0].connected = False
+        async with pool.page() as page:
+            browser = page.browser
+        await asyncio.sleep(0.01)
+        return browser, playwright.launched
+
+    browser, launched = asyncio.run(scenario())
+    assert browser is launched[1]
+    assert launched[0].closed
+
+
+def test_error_in_job_recycles_a_disconnected_browser():
+    async def scenario():
+        pool, playwright = await _started_pool(size=1, max_size=1)
+        try:
+            async with pool.page() as page:
+                page.browser.connected = False
+                raise RuntimeError("Target closed")
+        except RuntimeError:
+            pass
+        await asyncio.sleep(0.01)
+        return playwright.launched, pool.stats
+
+    launched, stats = asyncio.run(scenario())
+    assert launched[0].closed
+    assert len(launched) == 2
+    assert stats["idle"] == 1
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+from agent.core import deadline as deadline_module
+from agent.core.deadline import Deadline, step_timeout
+
+
+def test_usable_time_excludes_submit_reserve():
+    deadline = Deadline(100, submit_reserve=10)
+    assert 89 < deadline.usable() <= 90
+    assert 99 < deadline.remaining() <= 100
+    assert not deadline.exhausted and not deadline.expired
+
+
+def test_started_at_counts_time_already_spent():
+    deadline = Deadline(100, started_at=time.time() - 40, submit_reserve=0)
+    assert 59 < deadline.remaining() <= 60
+
+
+def test_timeout_is_capped_by_usable_time():
+    deadline = Deadline(30, submit_reserve=10)
+    assert deadline.timeout(5) == 5
+    assert 19 < deadline.timeout(60) <= 20
+    assert 19 < deadline.timeout() <= 20
+    # The submission may spend the reserve
+    assert 29 < deadline.submit_timeout(60) <= 30
+
+
+def test_exhausted_budget_still_hands_out_a_minimal_timeout():
+    deadline = Deadline(5, submit_reserve=10)
+    assert deadline.exhausted and deadline.urgent
+    assert deadline.timeout(60) == 0.5
+    spent = Deadline(1, started_at=time.time() - 10)
+    assert spent.expired
+    assert spent.submit_timeout() == 0.5
+
+
+def test_urgent_and_can_attempt(monkeypatch):
+    monkeypatch.setattr(deadline_module, "DEADLINE_MIN_ATTEMPT_SECONDS", 30)
+    deadline = Deadline(50, submit_reserve=10, urgent_seconds=25)
+    assert not deadline.urgent
+    assert deadline.can_attempt()
+    assert not deadline.can_attempt(expected_seconds=45)
+    short = Deadline(30, submit_reserve=10, urgent_seconds=25)
+    assert short.urgent
+    assert not short.can_attempt()
+
+
+def test_step_timeout_without_deadline_keeps_cap():
+    assert step_timeout(None, 5.0) == 5.0
+    assert step_timeout(None, None) is None
+    assert step_timeout(Deadline(100, submit_reserve=0), 5.0) == 5.0
+
+
+def test_run_times_out():
+    deadline = Deadline(100, submit_reserve=0)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(deadline.run(asyncio.sleep(5), cap=0.01))
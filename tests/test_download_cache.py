@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from agent.core import download_cache
+from agent.core.download_cache import DownloadCache, DownloadError, fetch_to_cache, local_filename
+
+
+def _store(cache: DownloadCache, url: str, body: bytes, headers: dict = None):
+    tmp_path = cache.temp_path()
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    return cache.store_file(url, tmp_path, hashlib.sha256(body).hexdigest(), len(body), headers or {})
+
+
+def test_local_filename():
+    sha = "0123456789abcdef" * 4
+    assert local_filename("https://example.com/files/data.csv?x=1", sha) == "data_0123456789ab.csv"
+    assert local_filename("https://example.com/", sha) == "downloaded_file_0123456789ab.txt"
+
+
+def test_identical_bodies_share_one_file(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    first = _store(cache, "https://example.com/a.csv", b"x,y\n1,2\n")
+    second = _store(cache, "https://example.com/b.csv?v=2", b"x,y\n1,2\n")
+    assert second.path == first.path
+    assert cache.stats["files"] == 1 and cache.stats["entries"] == 2
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_conditional_headers_from_validators(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    entry = _store(cache, "https://example.com/a.csv", b"data",
+                   {"etag": '"v1"', "last-modified": "Tue, 01 Oct 2024 00:00:00 GMT", "content-type": "Text/CSV"})
+    assert entry.content_type == "text/csv"
+    assert cache.conditional_headers(entry) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Tue, 01 Oct 2024 00:00:00 GMT",
+    }
+    assert cache.conditional_headers(None) == {}
+
+
+def test_lookup_forgets_entries_whose_file_is_gone(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    entry = _store(cache, "https://example.com/a.csv", b"data")
+    os.remove(entry.path)
+    assert cache.lookup("https://example.com/a.csv") is None
+    assert cache.stats["files"] == 0
+
+
+def test_index_survives_a_restart(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    entry = _store(cache, "https://example.com/a.csv", b"data", {"etag": '"v1"'})
+    reloaded = DownloadCache(str(tmp_path)).lookup("https://example.com/a.csv")
+    assert (reloaded.sha256, reloaded.path, reloaded.etag) == (entry.sha256, entry.path, '"v1"')
+
+
+def test_extractions_are_keyed_by_content_hash(tmp_path):
+    cache = DownloadCache(str(tmp_path))
+    entry = _store(cache, "https://example.com/a.pdf", b"%PDF")
+    assert cache.get_extraction(entry.sha256, "pdf:all") is None
+    cache.put_extraction(entry.sha256, "pdf:all", "page text")
+    assert cache.get_extraction(entry.sha256, "pdf:all") == "page text"
+    assert cache.get_extraction(entry.sha256, "pdf:page:1") is None
+
+
+def test_evicts_least_recently_used_with_extractions(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=10)
+    old = _store(cache, "https://example.com/old", b"123456")
+    cache.put_extraction(old.sha256, "text", "old text")
+    recent = _store(cache, "https://example.com/recent", b"abcdef")
+    assert cache.lookup("https://example.com/old") is None
+    assert not os.path.exists(old.path)
+    assert cache.get_extraction(old.sha256, "text") is None
+    assert cache.lookup("https://example.com/recent").path == recent.path
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, body: bytes, headers: dict):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+    async def aiter_bytes(self, chunk_size: int):
+        for i in range(0, len(self.body), 4):
+            await asyncio.sleep(0)
+            yield self.body[i:i + 4]
+
+
+class _FakeStream:
+    def __init__(self, response: _FakeResponse):
+        self.response = response
+
+    async def __aenter__(self):
+        return self.response
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeClient:
+    """Serves one body; answers 304 when the request carries its ETag."""
+
+    def __init__(self, body: bytes, headers: dict = None):
+        self.body = body
+        self.headers = {"etag": '"v1"', **(headers or {})}
+        self.requests = []
+
+    def stream(self, method: str, url: str, headers: dict, timeout: float):
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == self.headers["etag"]:
+            return _FakeStream(_FakeResponse(304, b"", {}))
+        return _FakeStream(_FakeResponse(200, self.body, self.headers))
+
+
+@pytest.fixture
+def fake_download(tmp_path, monkeypatch):
+    def install(body: bytes, headers: dict = None) -> _FakeClient:
+        client = _FakeClient(body, headers)
+        monkeypatch.setattr(download_cache, "_download_cache", DownloadCache(str(tmp_path)))
+        monkeypatch.setattr(download_cache, "get_http_client", lambda: client)
+        return client
+    return install
+
+
+def test_fetch_streams_to_disk_and_revalidates(fake_download, monkeypatch):
+    body = b"a,b\n1,2\n3,4\n"
+    client = fake_download(body)
+    entry = asyncio.run(fetch_to_cache("https://example.com/data.csv"))
+    assert entry.sha256 == hashlib.sha256(body).hexdigest()
+    with open(entry.path, "rb") as f:
+        assert f.read() == body
+    # Fresh: served without a request
+    asyncio.run(fetch_to_cache("https://example.com/data.csv"))
+    assert len(client.requests) == 1
+    # Stale: a conditional GET answered 304 keeps the cached file
+    monkeypatch.setattr(download_cache, "DOWNLOAD_FRESH_SECONDS", 0)
+    again = asyncio.run(fetch_to_cache("https://example.com/data.csv"))
+    assert client.requests[-1] == {"If-None-Match": '"v1"'}
+    assert again.path == entry.path
+    assert download_cache.get_download_cache().revalidated == 1
+
+
+def test_concurrent_fetches_share_one_download(fake_download):
+    client = fake_download(b"x" * 100)
+
+    async def scenario():
+        return await asyncio.gather(*(fetch_to_cache("https://example.com/big.bin") for _ in range(3)))
+
+    entries = asyncio.run(scenario())
+    assert len(client.requests) == 1
+    assert len({entry.path for entry in entries}) == 1
+
+
+def test_oversized_download_is_aborted(fake_download, tmp_path):
+    fake_download(b"x" * 100)
+    with pytest.raises(DownloadError, match="aborted"):
+        asyncio.run(fetch_to_cache("https://example.com/big.bin", max_bytes=10))
+    assert not any(name.startswith(".partial_") for name in os.listdir(tmp_path))
+
+
+def test_declared_length_over_limit_is_rejected(fake_download):
+    fake_download(b"x" * 100, {"content-length": "100"})
+    with pytest.raises(DownloadError, match="over the 10 byte limit"):
+        asyncio.run(fetch_to_cache("https://example.com/big.bin", max_bytes=10))
@@ -0,0 +1,55 @@
+from agent.core.history import STALE_OUTPUT_TOKENS, ConversationHistory
+
+
+def test_under_budget_messages_are_sent_verbatim():
+    history = ConversationHistory(token_budget=1000)
+    history.pin("system", "You are a solver.")
+    history.add("user", "<p>page</p>", kind="page")
+    history.add("assistant", '{"tool": "click"}', kind="assistant")
+    assert history.render() == [
+        {"role": "system", "content": "You are a solver."},
+        {"role": "user", "content": "<p>page</p>"},
+        {"role": "assistant", "content": '{"tool": "click"}'},
+    ]
+
+
+def test_stale_tool_output_is_shrunk_before_summarising():
+    history = ConversationHistory(token_budget=1200, keep_recent=2)
+    history.pin("system", "prompt")
+    history.add("user", "x" * 8000, kind="tool")
+    history.add("assistant", "step 2", kind="assistant")
+    history.add("user", "recent", kind="tool")
+    rendered = history.render()
+    assert not history.summary
+    assert len(rendered) == 4
+    assert rendered[1]["content"].startswith("x" * STALE_OUTPUT_TOKENS * 4)
+    assert "chars of stale output dropped" in rendered[1]["content"]
+    assert history.token_count() <= 1200
+
+
+def test_oldest_turns_fold_into_a_summary():
+    history = ConversationHistory(token_budget=400, keep_recent=2)
+    history.pin("system", "prompt")
+    history.pin("user", "task")
+    for i in range(10):
+        history.add("assistant", f'{{"tool": "click", "selector": "#b{i}"}}\n' + "z" * 300, kind="assistant")
+    rendered = history.render()
+    assert rendered[:2] == [{"role": "system", "content": "prompt"}, {"role": "user", "content": "task"}]
+    assert rendered[2]["content"].startswith("Summary of earlier steps:\n- Action: {\"tool\": \"click\"")
+    # The most recent messages are kept word for word
+    assert rendered[-1]["content"] == '{"tool": "click", "selector": "#b9"}\n' + "z" * 300
+    assert len(rendered) < 2 + 10
+    assert history.token_count() <= 400
+
+
+def test_newest_message_is_never_shrunk():
+    history = ConversationHistory(token_budget=100, keep_recent=2)
+    history.add("user", "y" * 4000, kind="tool")
+    assert history.render()[-1]["content"] == "y" * 4000
+
+
+def test_empty_history_is_falsy():
+    history = ConversationHistory()
+    assert not history
+    history.pin("system", "prompt")
+    assert history
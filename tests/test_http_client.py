@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+from agent.core import http_client
+from agent.core.http_client import close_http_client, get_http_client
+
+pytest.importorskip("httpx")
+
+
+def test_client_is_shared_and_recreated_after_close():
+    async def scenario():
+        first = get_http_client()
+        assert get_http_client() is first
+        await close_http_client()
+        assert http_client._http_client is None
+        second = get_http_client()
+        await close_http_client()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is not second
+    assert first.is_closed and second.is_closed
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("dotenv")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use, so the port opens without paying for them
+LAZY_MODULES = ("pandas", "numpy", "pdfplumber", "playwright", "openai", "httpx", "pyarrow")
+
+
+def test_importing_main_skips_heavy_modules():
+    script = (
+        "import json, sys\n"
+        "import main\n"
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
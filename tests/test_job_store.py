@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from agent.core import job_store
+from agent.core.job_store import Job, JobStore, MemoryJobStore, SQLiteJobStore, request_fingerprint
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+
+def test_fingerprint_normalises_url_and_email():
+    base = request_fingerprint("a@b.com", "https://Example.com/quiz?x=1&y=2")
+    assert request_fingerprint(" A@B.com ", "https://example.com:443/quiz/?y=2&x=1#top") == base
+    assert request_fingerprint("a@b.com", "https://example.com/quiz?x=2&y=2") != base
+    assert request_fingerprint("c@b.com", "https://example.com/quiz?x=1&y=2") != base
+
+
+def test_claims_oldest_queued_job_first(store):
+    first = store.add(Job({"url": "a"}, created_at=time.time() - 10))
+    store.add(Job({"url": "b"}))
+    job = store.claim("w1")
+    assert job.id == first.id
+    assert (job.status, job.worker_id, job.claims) == ("running", "w1", 1)
+    assert store.count("running") == 1 and store.count("queued") == 1
+
+
+def test_claim_returns_none_when_empty(store):
+    assert store.claim("w1") is None
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_locked_out(store):
+    store.add(Job({"url": "a"}))
+    stale = store.claim("w1", lease_seconds=-1)
+    job = store.claim("w2")
+    assert job.id == stale.id
+    assert (job.worker_id, job.claims) == ("w2", 2)
+    if isinstance(store, SQLiteJobStore):
+        # The first worker's copy no longer owns the row
+        assert not store.heartbeat(stale)
+        assert not store.checkpoint(stale)
+    assert store.heartbeat(job)
+
+
+def test_job_fails_after_max_claims(store, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_MAX_CLAIMS", 2)
+    added = store.add(Job({"url": "a"}))
+    store.claim("w1", lease_seconds=-1)
+    store.claim("w2", lease_seconds=-1)
+    assert store.claim("w3") is None
+    job = store.get(added.id)
+    assert job.status == "failed"
+    assert job.error == "Abandoned after 2 claims."
+
+
+def test_checkpoint_is_saved_with_the_job(store):
+    added = store.add(Job({"url": "a"}))
+    job = store.claim("w1")
+    job.progress.update(current_url="https://example.com/2", attempt=1)
+    assert store.checkpoint(job)
+    assert store.get(added.id).progress == {"current_url": "https://example.com/2", "attempt": 1}
+
+
+def test_release_requeues_keeping_checkpoint(store):
+    store.add(Job({"url": "a"}))
+    job = store.claim("w1")
+    job.progress["current_url"] = "https://example.com/3"
+    store.checkpoint(job)
+    assert store.release(job)
+    resumed = store.claim("w2")
+    assert resumed.id == job.id
+    assert resumed.claims == 1
+    assert resumed.progress["current_url"] == "https://example.com/3"
+
+
+def test_add_returns_active_job_with_same_fingerprint(store):
+    first = store.add(Job({"url": "a"}, fingerprint="fp"))
+    second = store.add(Job({"url": "a"}, fingerprint="fp"))
+    assert second.id == first.id
+    assert store.count("queued") == 1
+
+
+def test_find_returns_recently_done_job_only(store):
+    store.add(Job({"url": "a"}, fingerprint="fp"))
+    job = store.claim("w1")
+    job.status = "done"
+    assert store.finish(job)
+    assert store.find("fp", time.time() - 60).id == job.id
+    assert store.find("fp", time.time() + 1) is None
+    # A finished fingerprint can be submitted again
+    again = store.add(Job({"url": "a"}, fingerprint="fp"))
+    assert again.id != job.id
+    assert store.find("fp", time.time() - 60).id == again.id
+
+
+def test_prune_drops_old_finished_jobs(store):
+    added = store.add(Job({"url": "a"}))
+    job = store.claim("w1")
+    job.status = "failed"
+    store.finish(job)
+    store.prune(time.time() + 1)
+    assert store.get(added.id) is None
@@ -0,0 +1,51 @@
+import json
+
+from agent.core.json_stream import IncrementalJSONObject
+
+
+def _feed(text: str, size: int = 3) -> IncrementalJSONObject:
+    parser = IncrementalJSONObject()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def test_completes_on_closing_brace_and_strips_surroundings():
+    text = 'Sure!\n```json\n{"tool": "click", "selector": "#go"}\n```\ntrailing'
+    parser = _feed(text)
+    assert parser.complete
+    assert json.loads(parser.text) == {"tool": "click", "selector": "#go"}
+
+
+def test_incomplete_object_returns_received_text():
+    parser = _feed('{"tool": "read_file", "url": "https://exa')
+    assert not parser.complete
+    assert parser.text == '{"tool": "read_file", "url": "https://exa'
+    assert parser.fields == {"tool": "read_file"}
+
+
+def test_braces_and_escapes_inside_strings_are_ignored():
+    text = '{"tool": "run_python_code", "code": "print(\\"}{\\")\\nx = {1: [2]}"}'
+    parser = _feed(text, size=1)
+    assert parser.complete
+    assert json.loads(parser.text)["code"] == 'print("}{")\nx = {1: [2]}'
+    assert parser.fields["code"] == 'print("}{")\nx = {1: [2]}'
+
+
+def test_only_top_level_string_fields_are_exposed():
+    text = '{"actions": [{"tool": "a"}], "headers": {"x": "y"}, "count": 2, "tool": "call_api"}'
+    parser = _feed(text)
+    assert parser.fields == {"tool": "call_api"}
+
+
+def test_text_after_the_object_is_not_parsed():
+    parser = IncrementalJSONObject()
+    parser.feed('{"tool": "click"}')
+    parser.feed(' {"tool": "other"}')
+    assert parser.text == '{"tool": "click"}'
+    assert parser.fields == {"tool": "click"}
+
+
+def test_leading_array_is_skipped():
+    parser = _feed('[1, 2] {"tool": "click"}')
+    assert json.loads(parser.text) == {"tool": "click"}
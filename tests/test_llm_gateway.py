@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from agent.core import llm_gateway
+from agent.core.deadline import Deadline
+from agent.core.llm_gateway import LLMGateway, ModelLatency, backoff_delay
+
+
+@pytest.fixture(autouse=True)
+def fast_gateway(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_LATENCY_MIN_SAMPLES", 3)
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(llm_gateway, "_is_retryable", lambda exc: isinstance(exc, ConnectionError))
+
+
+def _observe(gateway: LLMGateway, model: str, seconds: float, count: int = 3):
+    for _ in range(count):
+        gateway.latency(model).observe(seconds)
+
+
+def test_latency_percentile_needs_enough_samples():
+    stats = ModelLatency()
+    stats.observe(1.0)
+    assert stats.percentile(0.5) is None
+    for seconds in (2.0, 3.0, 4.0):
+        stats.observe(seconds)
+    assert stats.percentile(0.5) == 3.0
+    assert stats.percentile(0.99) == 4.0
+
+
+def test_backoff_delay_is_bounded(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_BASE_DELAY", 1.0)
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_MAX_DELAY", 4.0)
+    assert all(0 <= backoff_delay(0) <= 1.0 for _ in range(50))
+    assert all(0 <= backoff_delay(10) <= 4.0 for _ in range(50))
+
+
+def test_backoff_delay_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_MAX_DELAY", 4.0)
+
+    class Response:
+        headers = {"retry-after": "3"}
+
+    class RateLimited(Exception):
+        response = Response()
+
+    assert 3.0 <= backoff_delay(0, RateLimited()) <= 4.0
+
+
+def test_choose_model_cascade():
+    assert LLMGateway("strong", "").choose_model() == "strong"
+    gateway = LLMGateway("strong", "fast")
+    assert gateway.choose_model() == "fast"
+    assert gateway.choose_model(escalated=True) == "strong"
+    # The fast model is skipped once it is measured to be no faster
+    _observe(gateway, "fast", 5.0)
+    _observe(gateway, "strong", 2.0)
+    assert gateway.choose_model() == "strong"
+
+
+def test_choose_model_fits_the_deadline():
+    gateway = LLMGateway("strong", "fast")
+    _observe(gateway, "fast", 1.0)
+    _observe(gateway, "strong", 40.0)
+    deadline = Deadline(30, submit_reserve=0)
+    assert gateway.choose_model(escalated=True, deadline=deadline) == "fast"
+    assert gateway.choose_model(escalated=True, deadline=Deadline(100, submit_reserve=0)) == "strong"
+
+
+def test_hedged_request_wins_over_slow_primary():
+    gateway = LLMGateway("strong")
+    _observe(gateway, "strong", 0.01)
+    calls = []
+
+    async def completion(client, model, messages, **params):
+        calls.append(model)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+            return "primary"
+        return "hedge"
+
+    async def scenario():
+        return await gateway.complete(completion, None, "strong", [])
+
+    assert asyncio.run(scenario()) == "hedge"
+    assert len(calls) == 2
+
+
+def test_no_hedge_without_latency_history():
+    gateway = LLMGateway("strong")
+    calls = []
+
+    async def completion(client, model, messages, **params):
+        calls.append(params)
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    assert asyncio.run(gateway.complete(completion, None, "strong", [], max_tokens=5)) == "ok"
+    assert calls == [{"max_tokens": 5}]
+
+
+def test_retries_retryable_errors():
+    gateway = LLMGateway("strong")
+    attempts = []
+
+    async def completion(client, model, messages, **params):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert asyncio.run(gateway.complete(completion, None, "strong", [])) == "ok"
+    assert len(attempts) == 3
+    assert gateway.latency("strong").failures == 2
+
+
+def test_does_not_retry_other_errors_or_past_the_deadline():
+    gateway = LLMGateway("strong")
+    attempts = []
+
+    async def bad_request(client, model, messages, **params):
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.complete(bad_request, None, "strong", []))
+    assert len(attempts) == 1
+
+    async def unreachable(client, model, messages, **params):
+        attempts.append(1)
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(gateway.complete(unreachable, None, "strong", [], deadline=Deadline(5, submit_reserve=10)))
+    assert len(attempts) == 2
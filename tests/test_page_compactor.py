@@ -0,0 +1,67 @@
+from agent.core.page_compactor import PageCompactor, compact_html, fit_to_budget
+
+
+def test_drops_head_with_void_elements():
+    html = ('<html><head><base href="/"><meta charset="utf-8"><link rel="stylesheet" href="s.css">'
+            '<title>t</title></head><body><p>Question 1</p><a href="data.csv">data</a></body></html>')
+    assert compact_html(html) == 'Question 1\n<a href="data.csv">data</a>'
+
+
+def test_void_element_inside_skipped_subtree():
+    html = ('<p>before</p><object data="x.swf"><param name="a" value="b"><embed src="y">'
+            '<p>fallback</p></object><p>after</p>')
+    assert compact_html(html) == "before\nafter"
+
+
+def test_nested_skip_tags():
+    html = "<svg><svg><path/></svg><text>hidden</text></svg><p>visible</p>"
+    assert compact_html(html) == "visible"
+
+
+def test_keeps_actionable_elements_and_json_scripts():
+    html = ('<script>var x = 1;</script><script type="application/json">{"answer": 42}</script>'
+            '<form action="/submit" method="post"><input name="answer" type="text"><button>Go</button></form>'
+            '<div id="result">pending</div>')
+    text = compact_html(html)
+    assert "var x" not in text
+    assert '<script type=json>{"answer": 42}</script>' in text
+    assert '<form action="/submit" method="post">' in text
+    assert '<input name="answer" type="text">' in text
+    assert '<div id="result">pending</div>' in text
+
+
+def test_table_cells_are_separated():
+    html = "<table><tr><th>a</th><th>b</th></tr><tr><td>1</td><td>2</td></tr></table>"
+    assert compact_html(html) == "| a | b\n| 1 | 2"
+
+
+def test_fit_to_budget_keeps_head_and_tail():
+    text = "x" * 1000 + "END"
+    fitted = fit_to_budget(text, token_budget=50)
+    assert fitted.startswith("x" * 100)
+    assert fitted.endswith("END")
+    assert "chars truncated" in fitted
+
+
+def test_render_unchanged_page():
+    compactor = PageCompactor()
+    html = "<p>Question</p><a href='/next'>next</a>"
+    assert compactor.render(html) == 'Question\n<a href="/next">next</a>'
+    assert compactor.render(html) == "(Page unchanged since the last snapshot.)"
+
+
+def test_render_sends_diff_for_small_change():
+    compactor = PageCompactor(diff_threshold=0.6)
+    rows = "".join(f"<p>row {i} with some text</p>" for i in range(30))
+    compactor.render(f"{rows}<div id='status'>pending</div>")
+    rendered = compactor.render(f"{rows}<div id='status'>done</div>")
+    assert rendered.startswith("(Page changed slightly; diff against the last snapshot)")
+    assert '-<div id="status">pending</div>' in rendered
+    assert '+<div id="status">done</div>' in rendered
+    assert compactor.last_snapshot.endswith('<div id="status">done</div>')
+
+
+def test_render_sends_full_snapshot_for_new_page():
+    compactor = PageCompactor()
+    compactor.render("<p>first page</p>")
+    assert compactor.render("<h1>Another</h1><p>completely different</p>") == "Another\ncompletely different"
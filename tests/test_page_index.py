@@ -0,0 +1,69 @@
+import asyncio
+
+from agent.core.page_index import PageIndex, PageIndexCache
+
+_DATA = {
+    "url": "https://example.com/quiz/1",
+    "title": "Quiz",
+    "text": "Download the file and post the sum.",
+    "links": [{"href": "https://example.com/data.csv", "text": "data"}],
+    "forms": [{"method": "post", "action": "/submit", "inputs": [
+        {"selector": "#answer", "tag": "input", "type": "text"},
+        {"selector": "", "tag": "textarea", "type": ""},
+    ]}],
+    "urls": ["https://example.com/data.csv", "https://example.com/api/items", "https://example.com/about"],
+    "selectors": ["#answer", "button.go"],
+    "submitTargets": ["https://example.com/submit"],
+}
+
+
+class _FakePage:
+    """Answers the DOM-version probe with `version` and the index script with `_DATA`."""
+
+    def __init__(self):
+        self.url = _DATA["url"]
+        self.version = 1
+        self.index_calls = 0
+
+    async def evaluate(self, script, arg=None):
+        if arg is None:
+            return self.version
+        self.index_calls += 1
+        return dict(_DATA)
+
+
+def test_page_index_fields_and_summary():
+    index = PageIndex(_DATA)
+    assert index.submit_url == "https://example.com/submit"
+    assert index.data_urls == [("https://example.com/data.csv", "file"), ("https://example.com/api/items", "api")]
+    assert index.summary().split("\n") == [
+        "Submit targets: https://example.com/submit",
+        "Data files / APIs:",
+        "- https://example.com/data.csv (file)",
+        "- https://example.com/api/items (api)",
+        "Form POST /submit: #answer (text), textarea (textarea)",
+        "Interactive elements: #answer, button.go",
+    ]
+
+
+def test_empty_page_has_empty_summary():
+    index = PageIndex({})
+    assert index.submit_url is None
+    assert index.summary() == ""
+
+
+def test_cache_indexes_each_dom_version_once():
+    async def scenario():
+        cache = PageIndexCache(max_entries=1)
+        page = _FakePage()
+        first = await cache.get(page)
+        assert await cache.get(page) is first
+        page.version = 2
+        await cache.get(page)
+        page.version = 1
+        await cache.get(page)  # Evicted by version 2
+        return cache.stats, page.index_calls
+
+    stats, index_calls = asyncio.run(scenario())
+    assert index_calls == 3
+    assert stats == {"hits": 1, "misses": 3, "entries": 1}
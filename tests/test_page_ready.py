@@ -0,0 +1,46 @@
+import asyncio
+
+from agent.core.page_ready import PageReadiness, wait_for_dom_quiescent
+
+
+class _FakePage:
+    """Reports `version` to the DOM-version probe; quiescence waits resolve at once (or fail `failures` times)."""
+
+    def __init__(self, failures: int = 0):
+        self.url = "https://example.com/quiz"
+        self.version = 1
+        self.failures = failures
+        self.waits = 0
+
+    async def wait_for_load_state(self, state, timeout):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        if arg is None:
+            return self.version
+        self.waits += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Execution context was destroyed")
+        return {"reason": "quiet", "elapsed": 10}
+
+
+def test_quiescence_wait_survives_one_navigation():
+    assert asyncio.run(wait_for_dom_quiescent(_FakePage(failures=1))) == "quiet"
+    assert asyncio.run(wait_for_dom_quiescent(_FakePage(failures=2))) == "error"
+
+
+def test_readiness_skips_wait_for_unchanged_page():
+    async def scenario():
+        readiness = PageReadiness()
+        page = _FakePage()
+        await readiness.observe(page)
+        results = [await readiness.wait(page, touched_page=False)]
+        page.version = 2  # A script changed the DOM on its own
+        results.append(await readiness.wait(page, touched_page=False))
+        results.append(await readiness.wait(page, touched_page=True))
+        return results, page.waits
+
+    results, waits = asyncio.run(scenario())
+    assert results == [False, True, True]
+    assert waits == 2
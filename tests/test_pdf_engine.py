@@ -0,0 +1,39 @@
+import pytest
+
+from agent.core import pdf_engine
+from agent.core.pdf_engine import _format_page, parse_page_range
+
+
+@pytest.fixture(autouse=True)
+def small_limits(monkeypatch):
+    monkeypatch.setattr(pdf_engine, "PDF_DEFAULT_PAGES", 3)
+    monkeypatch.setattr(pdf_engine, "PDF_MAX_PAGES_PER_CALL", 5)
+
+
+@pytest.mark.parametrize("spec, pages", [
+    (None, [1, 2, 3]),
+    ("", [1, 2, 3]),
+    ("4", [4]),
+    (4, [4]),
+    ("2-4", [2, 3, 4]),
+    ("1,3-4,9", [1, 3, 4, 9]),
+    ("9-", [9, 10]),
+    ("-2", [1, 2]),
+    ([7, "2"], [2, 7]),
+    ("0,11,8-20", [8, 9, 10]),
+    ("1-10", [1, 2, 3, 4, 5]),
+])
+def test_parse_page_range(spec, pages):
+    assert parse_page_range(spec, page_count=10) == pages
+
+
+def test_parse_page_range_on_short_document():
+    assert parse_page_range(None, page_count=2) == [1, 2]
+
+
+def test_format_page_labels_stored_tables():
+    result = {"page": 2, "text": "Totals", "tables": [[["a", "b"], ["1", None]], [["x"]]]}
+    text = _format_page(result, {"p2t1": "tbl_abc_p2t1"})
+    assert text == ("--- Page 2 ---\nTotals\n"
+                    "[Table 1] (load_table('tbl_abc_p2t1'))\na,b\n1,\n"
+                    "[Table 2]\nx\n")
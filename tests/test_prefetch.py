@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent.core import prefetch, tools
+from agent.core.prefetch import Prefetcher, bind_prefetcher, classify_url, take_prefetched, unbind_prefetcher
+
+
+@pytest.mark.parametrize("url, kind", [
+    ("https://example.com/data/sales.csv", "file"),
+    ("https://example.com/report.PDF.", "file"),
+    ("https://example.com/api/items?page=2", "api"),
+    ("https://example.com/items?format=json", "api"),
+    ("https://example.com/submit/answer.json", None),
+    ("https://example.com/about", None),
+    ("ftp://example.com/data.csv", None),
+])
+def test_classify_url(url, kind):
+    assert classify_url(url) == kind
+
+
+@pytest.fixture
+def fake_fetches(monkeypatch):
+    """Downloads that fill their whole byte cap; records the caps requested."""
+    caps = []
+
+    async def fetch_to_cache(url, max_bytes):
+        caps.append(max_bytes)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(size=max_bytes)
+
+    async def tool_read_file(url, use_prefetch=True):
+        return f"parsed {url}"
+
+    monkeypatch.setattr(prefetch, "fetch_to_cache", fetch_to_cache)
+    monkeypatch.setattr(tools, "tool_read_file", tool_read_file)
+    return caps
+
+
+def _index(*urls):
+    return SimpleNamespace(data_urls=[(url, "file") for url in urls])
+
+
+def test_results_are_scoped_to_the_bound_prefetcher(fake_fetches):
+    async def scenario():
+        prefetcher = Prefetcher(concurrency=1, max_bytes=1000)
+        prefetcher.start(_index("https://example.com/a.csv"))
+        assert take_prefetched("https://example.com/a.csv", "file") is None
+        token = bind_prefetcher(prefetcher)
+        try:
+            task = take_prefetched("https://example.com/a.csv", "file")
+            assert take_prefetched("https://example.com/a.csv", "api") is None
+            assert await task == "parsed https://example.com/a.csv"
+        finally:
+            unbind_prefetcher(token)
+        prefetcher.cancel()
+        assert prefetcher.take("https://example.com/a.csv", "file") is None
+
+    asyncio.run(scenario())
+
+
+def test_parallel_fetches_stay_within_the_byte_budget(fake_fetches):
+    async def scenario():
+        prefetcher = Prefetcher(concurrency=2, max_bytes=100)
+        urls = [f"https://example.com/{name}.csv" for name in "abc"]
+        prefetcher.start(_index(*urls))
+        results = await asyncio.gather(*(prefetcher.take(url, "file") for url in urls[:2]))
+        third = prefetcher._store[urls[2]][2]
+        with pytest.raises(RuntimeError, match="budget exhausted"):
+            await third
+        return results, prefetcher.bytes_used
+
+    results, bytes_used = asyncio.run(scenario())
+    assert len(results) == 2
+    assert fake_fetches == [50, 50]
+    assert bytes_used == 100
+
+
+def test_url_limit_and_repeats(fake_fetches):
+    async def scenario():
+        prefetcher = Prefetcher(max_urls=2)
+        prefetcher.start(_index("https://example.com/a.csv", "https://example.com/b.csv"))
+        prefetcher.start(_index("https://example.com/a.csv", "https://example.com/c.csv"))
+        started = sorted(prefetcher._store)
+        prefetcher.cancel()
+        return started
+
+    assert asyncio.run(scenario()) == ["https://example.com/a.csv", "https://example.com/b.csv"]
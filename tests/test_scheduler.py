@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from agent.core.job_store import MemoryJobStore
+from agent.core.scheduler import JobFailed, JobScheduler, QueueFullError
+
+
+async def _wait_for(predicate, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < expires, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def _scheduler(runner, concurrency: int = 1, queue_depth: int = 1) -> JobScheduler:
+    return JobScheduler(runner, concurrency=concurrency, queue_depth=queue_depth, store=MemoryJobStore())
+
+
+def test_rejects_jobs_beyond_the_queue_depth():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+
+        scheduler = _scheduler(runner)
+        try:
+            running, created = await scheduler.submit({"url": "a"})
+            assert created
+            await _wait_for(lambda: running.status == "running")
+            queued, _ = await scheduler.submit({"url": "b"})
+            with pytest.raises(QueueFullError):
+                await scheduler.submit({"url": "c"})
+            release.set()
+            await _wait_for(lambda: running.status == "done" and queued.status == "done")
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_busy_without_a_queue():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+
+        scheduler = _scheduler(runner, queue_depth=0)
+        try:
+            running, _ = await scheduler.submit({"url": "a"})
+            await _wait_for(lambda: running.status == "running")
+            with pytest.raises(QueueFullError, match="busy"):
+                await scheduler.submit({"url": "b"})
+            release.set()
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(scenario())
+
+
+def test_records_how_a_job_ended():
+    async def runner(job):
+        if job.data["url"] == "wrong":
+            raise JobFailed("Wrong answer.")
+        if job.data["url"] == "slow":
+            raise asyncio.TimeoutError()
+        if job.data["url"] == "crash":
+            raise RuntimeError("boom")
+
+    async def scenario():
+        scheduler = _scheduler(runner, concurrency=2, queue_depth=8)
+        try:
+            jobs = [(await scheduler.submit({"url": url}))[0] for url in ("ok", "wrong", "slow", "crash")]
+            await _wait_for(lambda: all(job.finished_at for job in jobs))
+            return [(job.status, job.error) for job in jobs]
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(scenario()) == [
+        ("done", None),
+        ("failed", "Wrong answer."),
+        ("timeout", "Task chain timed out."),
+        ("failed", "boom"),
+    ]
+
+
+def test_stop_releases_running_job_for_resume():
+    async def scenario():
+        async def runner(job):
+            await job.checkpoint(current_url="https://example.com/2")
+            await asyncio.Event().wait()
+
+        scheduler = _scheduler(runner)
+        job, _ = await scheduler.submit({"url": "a"})
+        await _wait_for(lambda: job.progress.get("current_url"))
+        await scheduler.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "queued"
+    assert job.worker_id is None
+    assert job.progress == {"current_url": "https://example.com/2"}
+
+
+def test_duplicate_request_attaches_to_running_job():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+
+        scheduler = _scheduler(runner, queue_depth=0)
+        try:
+            first, created = await scheduler.submit({"url": "a"}, fingerprint="fp")
+            await _wait_for(lambda: first.status == "running")
+            # Attaching needs no free slot, so a full scheduler does not reject it
+            again, created_again = await scheduler.submit({"url": "a"}, fingerprint="fp")
+            release.set()
+            return created, first.id, created_again, again.id
+        finally:
+            await scheduler.stop()
+
+    created, first_id, created_again, again_id = asyncio.run(scenario())
+    assert created and not created_again
+    assert again_id == first_id
+
+
+def test_done_job_is_returned_and_failed_job_rerun():
+    async def runner(job):
+        if job.data.get("fail"):
+            raise JobFailed("Wrong answer.")
+
+    async def scenario():
+        scheduler = _scheduler(runner, queue_depth=8)
+        try:
+            done, _ = await scheduler.submit({"url": "a"}, fingerprint="done")
+            failed, _ = await scheduler.submit({"url": "b", "fail": True}, fingerprint="failed")
+            await _wait_for(lambda: done.finished_at and failed.finished_at)
+            cached, cached_created = await scheduler.submit({"url": "a"}, fingerprint="done")
+            rerun, rerun_created = await scheduler.submit({"url": "b"}, fingerprint="failed")
+            return (cached.id == done.id, cached_created), (rerun.id == failed.id, rerun_created)
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(scenario()) == ((True, False), (False, True))
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from agent.core.table_store import _json_records, ingest_file, ingest_rows, load_table, table_handle, tabular_kind
+
+
+@pytest.mark.parametrize("content_type, url, kind", [
+    ("text/csv", "https://example.com/data", "csv"),
+    ("application/octet-stream", "https://example.com/Data.CSV?x=1", "csv"),
+    ("text/tab-separated-values", "https://example.com/data", "tsv"),
+    ("", "https://example.com/a.tsv", "tsv"),
+    ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "https://example.com/x", "excel"),
+    ("", "https://example.com/book.xls", "excel"),
+    ("", "https://example.com/t.parquet", "parquet"),
+    ("application/json; charset=utf-8", "https://example.com/api", "json"),
+    ("text/html", "https://example.com/page", None),
+    ("application/pdf", "https://example.com/report.pdf", None),
+])
+def test_tabular_kind(content_type, url, kind):
+    assert tabular_kind(content_type, url) == kind
+
+
+def test_table_handle():
+    sha = "0123456789abcdef" * 4
+    assert table_handle(sha) == "tbl_0123456789ab"
+    assert table_handle(sha, "p2_t1") == "tbl_0123456789ab_p2_t1"
+
+
+def test_json_records_list_of_objects():
+    rows = [{"a": 1}, {"a": 2}]
+    assert _json_records(rows) == (rows, {})
+
+
+def test_json_records_keeps_fields_next_to_rows():
+    data = {"instructions": "Sum column a", "page": 1, "items": [{"a": 1}], "empty": []}
+    records, others = _json_records(data)
+    assert records == [{"a": 1}]
+    assert others == {"instructions": "Sum column a", "page": 1, "empty": []}
+
+
+def test_json_records_column_oriented():
+    data = {"a": [1, 2], "b": ["x", "y"]}
+    assert _json_records(data) == (data, {})
+
+
+@pytest.mark.parametrize("data", [
+    {"a": [1, 2], "b": [3]},  # Ragged columns of scalars
+    {"a": [{"x": 1}], "b": [{"y": 2}, {"y": 3}]},  # Two candidate row lists
+    {"answer": 42},
+    [1, 2, 3],
+    [],
+])
+def test_json_records_not_tabular(data):
+    assert _json_records(data) == (None, {})
+
+
+def test_ingest_json_round_trip(tmp_path):
+    pytest.importorskip("pandas")
+    sha = "ab" * 32
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"note": "use column v", "rows": [{"k": "x", "v": 1}, {"k": "y", "v": 2}]}))
+    summary = ingest_file(str(tmp_path), sha, str(path), "json")
+    assert summary.startswith("Other top-level fields of the document (not in the table):\n")
+    assert '"note": "use column v"' in summary
+    assert "2 rows x 2 columns" in summary
+    df = load_table(table_handle(sha), directory=str(tmp_path))
+    assert list(df.columns) == ["k", "v"]
+    assert df["v"].sum() == 3
+
+
+def test_ingest_json_without_rows_is_skipped(tmp_path):
+    pytest.importorskip("pandas")
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"answer": 42}))
+    assert ingest_file(str(tmp_path), "cd" * 32, str(path), "json") is None
+
+
+def test_ingest_rows_parses_numbers(tmp_path):
+    pytest.importorskip("pandas")
+    sha = "ef" * 32
+    handle = ingest_rows(str(tmp_path), sha, "p1_t1", [["city", "sales"], ["A", "1,200"], ["B", "300"]])
+    df = load_table(handle, directory=str(tmp_path))
+    assert df["sales"].tolist() == [1200, 300]
+
+
+def test_load_unknown_table(tmp_path):
+    with pytest.raises(KeyError):
+        load_table("tbl_missing", directory=str(tmp_path))